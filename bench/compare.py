@@ -0,0 +1,57 @@
+"""
+对比两次基准测试结果
+
+    python -m bench.compare bench/results/旧.json bench/results/新.json
+"""
+import argparse
+import json
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(old, new):
+    """返回每个阶段的对比行：(阶段, 旧中位数, 新中位数, 耗时变化%, 旧峰值内存, 新峰值内存)"""
+    rows = []
+    for name in list(dict.fromkeys(list(old['stages']) + list(new['stages']))):
+        before = old['stages'].get(name, {})
+        after = new['stages'].get(name, {})
+        old_median = before.get('median_s')
+        new_median = after.get('median_s')
+        # 条目数不同（素材变化）时按单条耗时对比
+        if before.get('items') != after.get('items'):
+            old_median, new_median = before.get('per_item_ms'), after.get('per_item_ms')
+        change = None
+        if old_median and new_median:
+            change = round((new_median - old_median) * 100 / old_median, 1)
+        rows.append((name, old_median, new_median, change, before.get('peak_rss_mb'), after.get('peak_rss_mb')))
+    return rows
+
+
+def print_comparison(old, new):
+    print(f"旧：{old.get('git_commit')} {old.get('timestamp')}  新：{new.get('git_commit')} {new.get('timestamp')}")
+    if old.get('fixtures') != new.get('fixtures'):
+        print("注意：两次测试的素材参数不同，结果仅供参考")
+    print(f"{'阶段':<16}{'旧(s)':>10}{'新(s)':>10}{'变化':>10}{'旧内存MB':>12}{'新内存MB':>12}")
+    for name, old_median, new_median, change, old_rss, new_rss in compare(old, new):
+        change_text = f"{change:+.1f}%" if change is not None else '-'
+        print(f"{name:<16}{_text(old_median):>10}{_text(new_median):>10}{change_text:>10}"
+              f"{_text(old_rss):>12}{_text(new_rss):>12}")
+
+
+def _text(value):
+    return '-' if value is None else str(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.compare', description='对比两次基准测试结果')
+    parser.add_argument('old', help='旧结果JSON')
+    parser.add_argument('new', help='新结果JSON')
+    args = parser.parse_args(argv)
+    print_comparison(load_results(args.old), load_results(args.new))
+
+
+if __name__ == "__main__":
+    main()
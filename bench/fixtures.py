@@ -0,0 +1,200 @@
+"""
+基准测试用的合成素材（固定随机种子，保证每次生成的内容一致）
+
+- 商品照片：带/不带二维码
+- 得力xq长图
+- 带字幕与提示音的短视频（需要ffmpeg合成音轨）
+- FLAC音频（需要ffmpeg）
+"""
+import json
+import os
+import shutil
+import subprocess
+import wave
+
+import cv2
+import numpy as np
+
+# 素材参数变化时递增，触发重新生成
+FIXTURE_VERSION = 1
+SEED = 20260101
+
+PHOTO_SIZE = (3024, 4032)  # 宽, 高（手机竖拍）
+XQ_SIZE = (790, 9000)
+VIDEO_SIZE = (1280, 720)
+VIDEO_FPS = 25
+VIDEO_SECONDS = 12
+AUDIO_RATE = 16000
+CAPTIONS = [
+    "Deli 71065 eraser",
+    "SALE 19.9 RMB",
+    "Free shipping today",
+    "Scan QR for coupon",
+    "Office supplies",
+    "Thank you",
+]
+
+
+def has_ffmpeg():
+    return shutil.which('ffmpeg') is not None
+
+
+def _write_image(path, img):
+    cv2.imencode(os.path.splitext(path)[1], img)[1].tofile(path)
+
+
+def make_qr_code(text, size):
+    """生成指定边长的二维码图像（BGR）"""
+    matrix = cv2.QRCodeEncoder.create().encode(text)
+    # 加4格静区，否则检测器难以识别
+    matrix = cv2.copyMakeBorder(matrix, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=255)
+    matrix = cv2.resize(matrix, (size, size), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(matrix, cv2.COLOR_GRAY2BGR)
+
+
+def make_photo(rng, with_qr, size=PHOTO_SIZE):
+    """模拟商品照片：渐变背景 + 噪点 + 若干色块 + 文字，可选贴一个二维码"""
+    width, height = size
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    base = np.stack([180 + 60 * x + 0 * y, 170 + 50 * y + 0 * x, 160 + 40 * (x * y)], axis=2)
+    noise = rng.standard_normal((height, width, 3), dtype=np.float32) * 6
+    img = np.clip(base + noise, 0, 255).astype(np.uint8)
+
+    for _ in range(6):
+        x1, y1 = int(rng.integers(0, width - 600)), int(rng.integers(0, height - 600))
+        x2, y2 = x1 + int(rng.integers(200, 600)), y1 + int(rng.integers(200, 600))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, -1)
+
+    cv2.putText(img, "Deli 71065", (120, height - 300), cv2.FONT_HERSHEY_SIMPLEX, 6, (20, 20, 20), 12)
+
+    if with_qr:
+        qr = make_qr_code(f"https://shop.example.com/sku/{int(rng.integers(10000, 99999))}", 480)
+        qx, qy = width - 480 - 150, 150
+        img[qy:qy + 480, qx:qx + 480] = qr
+    return img
+
+
+def make_xq_strip(rng, size=XQ_SIZE):
+    """模拟得力xq详情长图：白底分段图文，中间夹一个二维码，结尾留白"""
+    width, height = size
+    img = np.full((height, width, 3), 255, dtype=np.uint8)
+    section = width
+    content_height = height - section  # 最后一段为留白
+    for top in range(0, content_height, section):
+        color = tuple(int(c) for c in rng.integers(60, 220, 3))
+        cv2.rectangle(img, (40, top + 40), (width - 40, top + section // 2), color, -1)
+        for line in range(4):
+            cv2.putText(img, f"Spec {top // section + 1}-{line + 1}: 120mm x 45mm",
+                        (50, top + section // 2 + 60 + line * 60), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (30, 30, 30), 2)
+    qr = make_qr_code("https://www.deli.com/product/71065", 300)
+    img[section * 2 + 100:section * 2 + 400, width - 350:width - 50] = qr
+    return img
+
+
+def write_tone_wav(path, seconds, rate=AUDIO_RATE):
+    """生成提示音：每2秒一段 0.8 秒的正弦音（音高轮换），其余静音"""
+    t = np.arange(int(seconds * rate)) / rate
+    freq = 440 + 110 * ((t // 2.0) % 3)
+    samples = 8000 * np.sin(2 * np.pi * freq * t) * ((t % 2.0) < 0.8)
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(samples.astype('<i2').tobytes())
+
+
+def make_caption_video(path, seconds=VIDEO_SECONDS, size=VIDEO_SIZE, fps=VIDEO_FPS):
+    """生成带字幕的视频，每2秒切换一条字幕；有ffmpeg时再合成提示音音轨"""
+    width, height = size
+    silent_path = path if not has_ffmpeg() else path + '.silent.mp4'
+    writer = cv2.VideoWriter(silent_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    for index in range(seconds * fps):
+        t = index / fps
+        frame = np.full((height, width, 3), (90, 60, 30), dtype=np.uint8)
+        # 移动的色块，避免帧间完全相同
+        x = int((t / seconds) * (width - 200))
+        cv2.rectangle(frame, (x, 150), (x + 200, 350), (40, 160, 220), -1)
+        caption = CAPTIONS[int(t // 2) % len(CAPTIONS)]
+        cv2.putText(frame, caption, (80, height - 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 4)
+        writer.write(frame)
+    writer.release()
+
+    if silent_path != path:
+        wav_path = path + '.wav'
+        write_tone_wav(wav_path, seconds)
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', silent_path, '-i', wav_path,
+                        '-c:v', 'copy', '-c:a', 'aac', '-shortest', path], check=True)
+        os.remove(silent_path)
+        os.remove(wav_path)
+    return has_ffmpeg()
+
+
+def make_flac(path, seconds=30):
+    wav_path = path + '.wav'
+    write_tone_wav(wav_path, seconds, rate=44100)
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-i', wav_path, path], check=True)
+    os.remove(wav_path)
+
+
+def make_logo(path, size=256):
+    """带透明通道的logo，用于去水印流程"""
+    logo = np.zeros((size, size, 4), dtype=np.uint8)
+    cv2.circle(logo, (size // 2, size // 2), size // 2 - 4, (0, 0, 220, 255), -1)
+    cv2.putText(logo, "DA", (size // 5, size * 2 // 3), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255, 255), 8)
+    _write_image(path, logo)
+
+
+def ensure_fixtures(directory, photos=8, strips=3, videos=1, flacs=2):
+    """
+    生成（或复用已生成的）基准素材，返回素材清单
+
+    清单中记录生成参数，参数变化时重新生成
+    """
+    params = {'version': FIXTURE_VERSION, 'seed': SEED, 'photos': photos, 'strips': strips,
+              'videos': videos, 'flacs': flacs, 'ffmpeg': has_ffmpeg()}
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('params') == params:
+            return manifest
+
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    rng = np.random.default_rng(SEED)
+
+    manifest = {'params': params, 'photos_qr': [], 'photos_plain': [], 'xq': [], 'videos': [], 'flac': []}
+    for i in range(photos):
+        with_qr = i % 2 == 0
+        path = os.path.join(directory, f"photo_{i:02d}{'_qr' if with_qr else ''}.jpg")
+        _write_image(path, make_photo(rng, with_qr))
+        manifest['photos_qr' if with_qr else 'photos_plain'].append(path)
+
+    for i in range(strips):
+        strip_dir = os.path.join(directory, f"xq_{i:02d}")
+        os.makedirs(strip_dir)
+        path = os.path.join(strip_dir, 'xq.jpg')
+        _write_image(path, make_xq_strip(rng))
+        manifest['xq'].append(path)
+
+    manifest['video_has_audio'] = False
+    for i in range(videos):
+        path = os.path.join(directory, f"caption_{i:02d}.mp4")
+        manifest['video_has_audio'] = make_caption_video(path)
+        manifest['videos'].append(path)
+
+    if has_ffmpeg():
+        for i in range(flacs):
+            path = os.path.join(directory, f"tone_{i:02d}.flac")
+            make_flac(path)
+            manifest['flac'].append(path)
+
+    manifest['logo'] = os.path.join(directory, 'logo.png')
+    make_logo(manifest['logo'])
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
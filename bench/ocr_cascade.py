@@ -0,0 +1,175 @@
+"""
+两级OCR对比：候选区域识别（img/ocr_cascade.py）与 EasyOCR 完整检测的耗时与文字一致性
+
+在项目根目录执行：
+    python -m bench.ocr_cascade
+    python -m bench.ocr_cascade --groups frames --repeat 3 --output bench/results/ocr_cascade.json
+
+素材为 bench/fixtures.py 生成的视频字幕帧（与 mp4_text 相同缩小到640）、商品照片与xq长图，按组统计：
+- 候选区域数量、找候选区域的耗时、退回完整检测的张数
+- 完整检测与两级识别的耗时中位数与加速比
+- 一致率：完整检测识别出的词在两级识别结果中出现的比例
+没有安装 easyocr 或模型目录不存在时只统计候选区域
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+
+import cv2
+
+from bench.fixtures import ensure_fixtures
+from bench.run_bench import DEFAULT_FIXTURE_DIR, _decode_all
+from config import easyocr_model_path
+from img.ocr_cascade import propose_text_regions, cascade_readtext
+
+# 与视频画面识别相同的缩小尺寸
+FRAME_MAX_SIZE = 640
+
+
+def _video_frames(path):
+    """每条字幕各取中间一帧"""
+    frames = []
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if index % int(fps * 2) == int(fps):
+            height, width = frame.shape[:2]
+            scale = min(1.0, FRAME_MAX_SIZE / max(height, width))
+            frames.append(cv2.resize(frame, (int(width * scale), int(height * scale))))
+        index += 1
+    cap.release()
+    return frames
+
+
+def load_groups(fixtures):
+    """返回 {组名: [(名称, 灰度图), ...]}"""
+    groups = {'frames': [], 'photos': [], 'xq': []}
+    for path in fixtures['videos']:
+        name = os.path.relpath(path, DEFAULT_FIXTURE_DIR)
+        groups['frames'] += [(f"{name}:{index}", frame) for index, frame in enumerate(_video_frames(path))]
+    for group, paths in (('photos', fixtures['photos_qr'] + fixtures['photos_plain']), ('xq', fixtures['xq'])):
+        for path, img in zip(paths, _decode_all(paths)):
+            groups[group].append((os.path.relpath(path, DEFAULT_FIXTURE_DIR), img))
+    return {group: [(name, cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)) for name, img in samples]
+            for group, samples in groups.items()}
+
+
+def _words(ocr_result):
+    return set(word for _, text, _ in ocr_result for word in re.findall(r'\w+', text.lower()))
+
+
+def _median_ms(timings):
+    return round(statistics.median(timings) * 1000, 2) if timings else None
+
+
+def _timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def measure_group(samples, reader=None, repeat=1):
+    """统计一组样本；reader 为None时只统计候选区域"""
+    region_counts, propose_timings, full_timings, cascade_timings = [], [], [], []
+    fallbacks = matched = expected = 0
+    for _, gray in samples:
+        regions, timings = _timed(lambda: propose_text_regions(gray), repeat)
+        region_counts.append(len(regions))
+        propose_timings += timings
+        fallbacks += not regions
+        if reader is None:
+            continue
+        full, timings = _timed(lambda: reader.readtext(gray, detail=1), repeat)
+        full_timings += timings
+        cascade, timings = _timed(lambda: cascade_readtext(reader, gray), repeat)
+        cascade_timings += timings
+        full_words = _words(full)
+        expected += len(full_words)
+        matched += len(full_words & _words(cascade))
+
+    result = {
+        'samples': len(samples),
+        'regions_mean': round(statistics.mean(region_counts), 1) if region_counts else 0,
+        'fallbacks': fallbacks,
+        'propose_p50_ms': _median_ms(propose_timings),
+    }
+    if reader is not None:
+        full_ms, cascade_ms = _median_ms(full_timings), _median_ms(cascade_timings)
+        result.update({
+            'full_p50_ms': full_ms,
+            'cascade_p50_ms': cascade_ms,
+            'speedup': round(sum(full_timings) / sum(cascade_timings), 2) if cascade_timings else None,
+            'agreement': round(matched / expected, 3) if expected else None,
+        })
+    return result
+
+
+def print_results(results):
+    print(f"{'分组':<10}{'样本':>6}{'平均区域':>10}{'退回完整':>10}{'候选p50ms':>12}"
+          f"{'完整p50ms':>12}{'两级p50ms':>12}{'加速比':>8}{'一致率':>8}")
+    for group, result in results.items():
+        line = (f"{group:<10}{result['samples']:>6}{result['regions_mean']:>10}{result['fallbacks']:>10}"
+                f"{result['propose_p50_ms'] or 0:>12.1f}")
+        if 'full_p50_ms' in result:
+            agreement = result['agreement']
+            line += (f"{result['full_p50_ms'] or 0:>12.1f}{result['cascade_p50_ms'] or 0:>12.1f}"
+                     f"{result['speedup'] or 0:>8.2f}{'-' if agreement is None else f'{agreement:.1%}':>8}")
+        print(line)
+
+
+def _load_reader(model_dir):
+    """加载 EasyOCR，不可用时返回 (None, 原因)"""
+    try:
+        from img.get_text_app import create_easyocr_reader
+    except ImportError as e:
+        return None, f"缺少依赖: {e}"
+    if not os.path.isdir(model_dir):
+        return None, f"EasyOCR模型目录不存在: {model_dir}"
+    return create_easyocr_reader(model_dir), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.ocr_cascade', description='对比两级OCR与完整检测的耗时与一致率')
+    parser.add_argument('--groups', default='frames,photos,xq', help='逗号分隔：frames / photos / xq')
+    parser.add_argument('--repeat', type=int, default=1, help='每张图片重复识别次数')
+    parser.add_argument('--easyocr-model-dir', default=easyocr_model_path)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR, help='素材目录')
+    parser.add_argument('--output', help='结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    groups = load_groups(ensure_fixtures(args.fixtures))
+    names = args.groups.split(',')
+    unknown = [name for name in names if name not in groups]
+    if unknown:
+        parser.error(f"未知分组: {', '.join(unknown)}（可选：{', '.join(groups)}）")
+
+    reader, reason = _load_reader(args.easyocr_model_dir)
+    if reader is None:
+        print(f"只统计候选区域（{reason}）")
+    results = {}
+    for name in names:
+        print(f"测试分组 {name} ...", flush=True)
+        results[name] = measure_group(groups[name], reader, args.repeat)
+    print_results(results)
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'cv2': cv2.__version__, 'easyocr': reader is not None, 'groups': results},
+                      f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
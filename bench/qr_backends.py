@@ -0,0 +1,179 @@
+"""
+二维码检测后端对比：在基准素材上统计各后端的检出率与耗时，用于选择 config.qr_backend
+
+在项目根目录执行：
+    python -m bench.qr_backends
+    python -m bench.qr_backends --backends opencv,zxing --repeat 3 --output bench/results/qr.json
+
+素材为 bench/fixtures.py 生成的商品照片与xq长图（带二维码的为正样本，不带的为负样本），
+另外生成缩小、旋转、低质量JPEG三种变体模拟供应商图片，统计：
+- 单轮：后端直接检测原图一次（检出率、解码率、耗时）
+- 完整：detect_qr_boxes 的多轮检测（原图/预处理/灰度），即模糊流程实际使用的方式
+最后给出完整检出率不低于 --min-recall 的最快后端
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import cv2
+
+from bench.fixtures import ensure_fixtures
+from bench.run_bench import DEFAULT_FIXTURE_DIR, _decode_all
+from file.file_utils import silent_log
+from img.ImageScale import detect_qr_boxes
+from img.qr_backends import QR_BACKENDS, available_backends, get_qr_backend
+
+
+def _rotate(img, angle):
+    """旋转并扩大画布，避免靠近角落的二维码被裁掉"""
+    height, width = img.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    cos, sin = abs(matrix[0, 0]), abs(matrix[0, 1])
+    new_width, new_height = int(width * cos + height * sin), int(width * sin + height * cos)
+    matrix[0, 2] += (new_width - width) / 2
+    matrix[1, 2] += (new_height - height) / 2
+    return cv2.warpAffine(img, matrix, (new_width, new_height), borderValue=(255, 255, 255))
+
+
+def _recompress(img, quality):
+    return cv2.imdecode(cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])[1], cv2.IMREAD_COLOR)
+
+
+VARIANTS = {
+    'original': lambda img: img,
+    'small': lambda img: cv2.resize(img, None, fx=1 / 3, fy=1 / 3, interpolation=cv2.INTER_AREA),
+    'rotated': lambda img: _rotate(img, 20),
+    'jpeg_q35': lambda img: _recompress(img, 35),
+}
+
+
+def load_samples(fixtures):
+    """返回 [(名称, 图片, 是否含二维码), ...]"""
+    sources = [(path, True) for path in fixtures['photos_qr'] + fixtures['xq']]
+    sources += [(path, False) for path in fixtures['photos_plain']]
+    images = _decode_all([path for path, _ in sources])
+    samples = []
+    for (path, has_qr), img in zip(sources, images):
+        name = os.path.relpath(path, DEFAULT_FIXTURE_DIR)
+        for variant, transform in VARIANTS.items():
+            samples.append((f"{name}:{variant}", transform(img), has_qr))
+    return samples
+
+
+def _median_ms(timings):
+    return round(statistics.median(timings) * 1000, 2)
+
+
+def measure_backend(name, samples, repeat=1):
+    """统计一个后端在全部样本上的表现"""
+    backend = get_qr_backend(name)
+    # 预热（加载模型、分配内存）
+    backend.detect(samples[0][1])
+
+    positives = sum(1 for _, _, has_qr in samples if has_qr)
+    single_found = decoded = single_false = full_found = full_false = 0
+    single_timings, full_timings = [], []
+    missed = []
+    for sample_name, img, has_qr in samples:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            codes = backend.detect(img)
+            single_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            boxes = detect_qr_boxes(img, log=silent_log, backend=name)
+            full_timings.append(time.perf_counter() - start)
+
+        if has_qr:
+            single_found += bool(codes)
+            decoded += any(code.data for code in codes)
+            full_found += bool(boxes)
+            if not boxes:
+                missed.append(sample_name)
+        else:
+            single_false += bool(codes)
+            full_false += bool(boxes)
+
+    return {
+        'samples': len(samples),
+        'positives': positives,
+        'single_recall': round(single_found / positives, 3),
+        'decode_rate': round(decoded / positives, 3),
+        'single_false_positives': single_false,
+        'single_p50_ms': _median_ms(single_timings),
+        'full_recall': round(full_found / positives, 3),
+        'full_false_positives': full_false,
+        'full_p50_ms': _median_ms(full_timings),
+        'full_mean_ms': round(statistics.mean(full_timings) * 1000, 2),
+        'missed': missed,
+    }
+
+
+def recommend(results, min_recall):
+    """完整检出率达标的后端中平均耗时最短的一个，都不达标时返回None"""
+    passed = [(result['full_mean_ms'], name) for name, result in results.items()
+              if 'error' not in result and result['full_recall'] >= min_recall]
+    return min(passed)[1] if passed else None
+
+
+def print_results(results):
+    print(f"{'后端':<14}{'单轮检出':>10}{'解码率':>8}{'单轮误检':>10}{'单轮p50ms':>12}"
+          f"{'完整检出':>10}{'完整误检':>10}{'完整p50ms':>12}{'完整平均ms':>12}")
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name:<14}出错：{result['error']}")
+            continue
+        print(f"{name:<14}{result['single_recall']:>10.1%}{result['decode_rate']:>8.1%}"
+              f"{result['single_false_positives']:>10}{result['single_p50_ms']:>12.1f}"
+              f"{result['full_recall']:>10.1%}{result['full_false_positives']:>10}"
+              f"{result['full_p50_ms']:>12.1f}{result['full_mean_ms']:>12.1f}")
+        if result['missed']:
+            print(f"  漏检：{', '.join(result['missed'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.qr_backends', description='对比二维码检测后端的检出率与耗时')
+    parser.add_argument('--backends', help=f"逗号分隔，默认为当前可用的全部后端（{', '.join(QR_BACKENDS)}）")
+    parser.add_argument('--repeat', type=int, default=1, help='每张图片重复检测次数')
+    parser.add_argument('--threads', type=int, help='cv2.setNumThreads')
+    parser.add_argument('--min-recall', type=float, default=0.95, help='推荐后端要求的最低完整检出率')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR, help='素材目录')
+    parser.add_argument('--output', help='结果写入JSON文件')
+    args = parser.parse_args(argv)
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+    names = args.backends.split(',') if args.backends else available_backends()
+    unavailable = [name for name in names if name not in available_backends()]
+    if unavailable:
+        parser.error(f"后端不可用或不存在：{', '.join(unavailable)}（可用：{', '.join(available_backends())}）")
+
+    samples = load_samples(ensure_fixtures(args.fixtures))
+    results = {}
+    for name in names:
+        print(f"测试后端 {name} ...", flush=True)
+        try:
+            results[name] = measure_backend(name, samples, args.repeat)
+        except Exception as e:
+            results[name] = {'error': str(e)}
+
+    print_results(results)
+    best = recommend(results, args.min_recall)
+    if best:
+        print(f"推荐：{best}（完整检出率 ≥ {args.min_recall:.0%} 中最快），在 config.py 中设置 qr_backend = '{best}'")
+    else:
+        print(f"没有后端的完整检出率达到 {args.min_recall:.0%}")
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'cv2': cv2.__version__, 'variants': list(VARIANTS), 'recommended': best,
+                       'backends': results}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
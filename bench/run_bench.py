@@ -0,0 +1,500 @@
+"""
+图片、OCR、音频、视频流水线基准测试
+
+在项目根目录执行：
+    python -m bench.run_bench                         # 运行全部阶段
+    python -m bench.run_bench --stages decode,detect_qr --repeat 5
+    python -m bench.run_bench --compare bench/results/上一次.json
+
+每个阶段在独立子进程中运行，分别统计耗时（中位数/最快）、吞吐量与峰值内存（RSS），
+结果写入JSON文件，可用 bench/compare.py 对比两次运行
+缺少依赖（easyocr、whisper、ffmpeg等）的阶段记为 skipped
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import metrics
+from bench.fixtures import ensure_fixtures
+from config import img_width, img_height, easyocr_model_path, whisper_model_path, asr_backend
+from file.file_utils import silent_log
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE_DIR = os.path.join(BENCH_DIR, '.fixtures')
+DEFAULT_RESULT_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+class StageSkipped(Exception):
+    """当前环境无法运行该阶段（缺少依赖或素材）"""
+
+
+def _decode_all(paths):
+    from file.file_utils import read_chinese_path_image
+    return [read_chinese_path_image(path) for path in paths]
+
+
+def _fit_size(img):
+    height, width = img.shape[:2]
+    scale = min(img_width / width, img_height / height)
+    return int(width * scale), int(height * scale)
+
+
+# ========== 各阶段：准备数据（不计时），返回 (计时函数, 单位) ==========
+# 计时函数返回本次处理的条目数
+def stage_decode(fixtures, options):
+    paths = fixtures['photos_qr'] + fixtures['photos_plain']
+
+    def run():
+        _decode_all(paths)
+        return len(paths)
+
+    return run, 'images'
+
+
+def _stage_detect(paths):
+    from img.ImageScale import blur_qrcode_opencv
+    images = _decode_all(paths)
+
+    def run():
+        for img in images:
+            blur_qrcode_opencv(img, log=silent_log)
+        return len(images)
+
+    return run, 'images'
+
+
+def stage_detect_qr(fixtures, options):
+    """带二维码的图片：通常第一次检测即命中"""
+    return _stage_detect(fixtures['photos_qr'])
+
+
+def stage_detect_plain(fixtures, options):
+    """无二维码的图片：三种检测方式全部执行，是最慢的情况"""
+    return _stage_detect(fixtures['photos_plain'])
+
+
+def stage_resize(fixtures, options):
+    images = _decode_all(fixtures['photos_qr'] + fixtures['photos_plain'])
+
+    def run():
+        for img in images:
+            cv2.resize(img, _fit_size(img), interpolation=cv2.INTER_LANCZOS4)
+        return len(images)
+
+    return run, 'images'
+
+
+def _stage_encode(fixtures, options, ext):
+    from file.file_utils import cv2_imwrite_chinese
+    images = [cv2.resize(img, _fit_size(img), interpolation=cv2.INTER_LANCZOS4)
+              for img in _decode_all(fixtures['photos_qr'] + fixtures['photos_plain'])]
+    output_dir = tempfile.mkdtemp(prefix='bench_encode_')
+
+    def run():
+        for index, img in enumerate(images):
+            cv2_imwrite_chinese(os.path.join(output_dir, f"{index}{ext}"), img)
+        return len(images)
+
+    return run, 'images'
+
+
+def stage_encode_jpg(fixtures, options):
+    return _stage_encode(fixtures, options, '.jpg')
+
+
+def stage_encode_png(fixtures, options):
+    return _stage_encode(fixtures, options, '.png')
+
+
+def stage_encode_profiles(fixtures, options):
+    """各输出编码方案的编码耗时与体积：缩放后的商品照片、xq切分片段（仅编码，不写盘）"""
+    from file.image_encoding import ENCODING_PROFILES, encode_image
+    samples = {
+        'photo': [cv2.resize(img, _fit_size(img), interpolation=cv2.INTER_LANCZOS4)
+                  for img in _decode_all(fixtures['photos_qr'] + fixtures['photos_plain'])],
+        'tile': [strip[top:top + strip.shape[1]] for strip in _decode_all(fixtures['xq'])
+                 for top in range(0, strip.shape[0], strip.shape[1])],
+    }
+
+    def run():
+        items = 0
+        for profile in ENCODING_PROFILES:
+            for kind, images in samples.items():
+                for img in images:
+                    with metrics.timer(f'profile.{profile}.{kind}'):
+                        buffer = encode_image(img, profile)
+                    metrics.count(f'profile.{profile}.{kind}.bytes', buffer.size)
+                    items += 1
+        return items
+
+    return run, 'encodes'
+
+
+def profile_report(result):
+    """从 encode_profiles 阶段的结果整理出 (方案, 类型, 单张耗时ms, 单张体积KB)"""
+    breakdown = result.get('breakdown', {})
+    rows = []
+    for name, stage in breakdown.get('stages', {}).items():
+        if not name.startswith('profile.'):
+            continue
+        _, profile, kind = name.split('.')
+        size = breakdown['counters'].get(f'{name}.bytes', 0) / stage['count']
+        rows.append((profile, kind, stage['p50_ms'], round(size / 1024, 1)))
+    return rows
+
+
+def stage_qr_cache(fixtures, options):
+    """二维码区域缓存命中：计算感知哈希 + 查询（缓存为临时文件，预先写入全部照片）"""
+    from img.ImageScale import QR_DETECT_PARAMS, detect_qr_boxes
+    from img.qr_cache import QrRegionCache
+    images = _decode_all(fixtures['photos_qr'] + fixtures['photos_plain'])
+    cache = QrRegionCache(os.path.join(tempfile.mkdtemp(prefix='bench_qr_cache_'), 'cache.sqlite3'),
+                          QR_DETECT_PARAMS)
+    for img in images:
+        cache.put(cache.key(img), detect_qr_boxes(img, log=silent_log))
+
+    def run():
+        for img in images:
+            cache.get(cache.key(img))
+        return len(images)
+
+    return run, 'images'
+
+
+def stage_scale_pipeline(fixtures, options):
+    """完整缩放流程：读取 + 二维码模糊 + 旋转缩放 + 保存"""
+    from img.ImageScale import resize_image
+    paths = fixtures['photos_qr'] + fixtures['photos_plain']
+    output_dir = tempfile.mkdtemp(prefix='bench_scale_')
+
+    def run():
+        for index, path in enumerate(paths):
+            resize_image(path, os.path.join(output_dir, f"{index}.jpg"), log=silent_log)
+        return len(paths)
+
+    return run, 'images'
+
+
+def stage_split(fixtures, options):
+    """xq长图切分（不含二维码检测）"""
+    from img.image_split import split_image_into_squares
+    images = _decode_all(fixtures['xq'])
+    output_dir = tempfile.mkdtemp(prefix='bench_split_')
+
+    def run():
+        for index, img in enumerate(images):
+            split_image_into_squares(img, output_dir, f"xq{index}")
+        return len(images)
+
+    return run, 'strips'
+
+
+def _stage_ocr(fixtures, options, adaptive, runtime='torch'):
+    try:
+        from img.get_text_app import create_easyocr_reader, recognize_image_text
+    except ImportError as e:
+        raise StageSkipped(f"缺少依赖: {e}")
+    if not os.path.isdir(options['easyocr_model_dir']):
+        raise StageSkipped(f"EasyOCR模型目录不存在: {options['easyocr_model_dir']}")
+    if runtime == 'onnx':
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError as e:
+            raise StageSkipped(f"缺少依赖: {e}")
+    reader = create_easyocr_reader(options['easyocr_model_dir'], runtime=runtime)
+
+    frame_dir = tempfile.mkdtemp(prefix='bench_ocr_')
+    frame_paths = []
+    cap = cv2.VideoCapture(fixtures['videos'][0])
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        # 每条字幕持续2秒，取每段中间的一帧
+        if index % int(fps * 2) == int(fps):
+            path = os.path.join(frame_dir, f"frame_{index}.png")
+            cv2.imwrite(path, frame)
+            frame_paths.append(path)
+        index += 1
+    cap.release()
+
+    def run():
+        for path in frame_paths:
+            recognize_image_text(path, reader, adaptive=adaptive)
+        return len(frame_paths)
+
+    return run, 'frames'
+
+
+def stage_ocr(fixtures, options):
+    """对视频中每条字幕各取一帧做OCR（自适应输入尺寸：先低分辨率探测，只识别字幕区域）"""
+    return _stage_ocr(fixtures, options, adaptive=True)
+
+
+def stage_ocr_fixed(fixtures, options):
+    """同 ocr，整帧按固定的 canvas_size=1280、mag_ratio=1.5 识别，用于对比"""
+    return _stage_ocr(fixtures, options, adaptive=False)
+
+
+def stage_ocr_onnx(fixtures, options):
+    """同 ocr，检测、识别模型用 ONNX Runtime 推理（config.ocr_onnx_*，首次运行时导出模型不计入耗时）"""
+    return _stage_ocr(fixtures, options, adaptive=True, runtime='onnx')
+
+
+def _stage_asr(fixtures, options, backend, chunk_workers=0):
+    """吞吐量单位为音频秒数/秒，即实时率的倒数"""
+    try:
+        from video.asr_backends import ASR_BACKENDS
+        from video.mp4_text import load_whisper_with_mps, transcribe_mp4
+    except ImportError as e:
+        raise StageSkipped(f"缺少依赖: {e}")
+    if not ASR_BACKENDS[backend].available():
+        raise StageSkipped(f"语音识别后端 {backend} 不可用（缺少依赖）")
+    if not fixtures.get('video_has_audio'):
+        raise StageSkipped("测试视频没有音轨（需要ffmpeg生成）")
+    model = load_whisper_with_mps(options['whisper_model'], backend=backend, chunk_workers=chunk_workers)
+    video = fixtures['videos'][0]
+    duration = _video_seconds(video)
+
+    def run():
+        transcribe_mp4(video, model)
+        return duration
+
+    return run, 'audio_seconds'
+
+
+def stage_asr(fixtures, options):
+    return _stage_asr(fixtures, options, 'whisper')
+
+
+def stage_asr_faster_whisper(fixtures, options):
+    """同 asr，使用 faster-whisper（CTranslate2 INT8），首次运行时转换模型不计入耗时"""
+    return _stage_asr(fixtures, options, 'faster_whisper')
+
+
+def stage_asr_chunked(fixtures, options):
+    """同 asr，按VAD分段后由2个模型实例并行识别（后端按 config.asr_backend）"""
+    return _stage_asr(fixtures, options, asr_backend, chunk_workers=2)
+
+
+def stage_audio(fixtures, options):
+    try:
+        from video.flac2mp3 import convert_audio_to_mp3
+    except ImportError as e:
+        raise StageSkipped(f"缺少依赖: {e}")
+    if not fixtures['flac']:
+        raise StageSkipped("没有FLAC测试素材（需要ffmpeg生成）")
+    output_dir = tempfile.mkdtemp(prefix='bench_audio_')
+
+    def run():
+        for index, path in enumerate(fixtures['flac']):
+            convert_audio_to_mp3(path, os.path.join(output_dir, f"{index}.mp3"))
+        return len(fixtures['flac'])
+
+    return run, 'files'
+
+
+def stage_watermark(fixtures, options):
+    """VideoProcessor.process_video_frames：逐帧去水印 + 加logo + 编码"""
+    try:
+        from video.video_watermark_remove import VideoProcessor
+    except ImportError as e:
+        raise StageSkipped(f"缺少依赖: {e}")
+    video = fixtures['videos'][0]
+    output_path = os.path.join(tempfile.mkdtemp(prefix='bench_watermark_'), 'out.mp4')
+
+    def run():
+        processor = VideoProcessor(video, fixtures['logo'], watermark_size=(212, 66), output_path=output_path)
+        try:
+            processor.process_video_frames()
+        finally:
+            processor.clean_temp_files()
+        return processor.total_frames
+
+    return run, 'frames'
+
+
+def _video_seconds(path):
+    cap = cv2.VideoCapture(path)
+    seconds = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return seconds
+
+
+STAGES = {
+    'decode': stage_decode,
+    'detect_qr': stage_detect_qr,
+    'detect_plain': stage_detect_plain,
+    'qr_cache': stage_qr_cache,
+    'resize': stage_resize,
+    'encode_jpg': stage_encode_jpg,
+    'encode_png': stage_encode_png,
+    'encode_profiles': stage_encode_profiles,
+    'scale_pipeline': stage_scale_pipeline,
+    'split': stage_split,
+    'ocr': stage_ocr,
+    'ocr_fixed': stage_ocr_fixed,
+    'ocr_onnx': stage_ocr_onnx,
+    'asr': stage_asr,
+    'asr_faster_whisper': stage_asr_faster_whisper,
+    'asr_chunked': stage_asr_chunked,
+    'audio': stage_audio,
+    'watermark': stage_watermark,
+}
+
+
+# ========== 子进程中执行单个阶段 ==========
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位为字节，Linux 为KB
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_stage(name, fixtures, options):
+    if options.get('threads'):
+        cv2.setNumThreads(options['threads'])
+    # 预热会写入二维码区域缓存，计时时需关闭，否则测到的是缓存命中（缓存单独由 qr_cache 阶段测试）
+    from img.qr_cache import enable_qr_cache
+    enable_qr_cache(False)
+    try:
+        run, unit = STAGES[name](fixtures, options)
+    except StageSkipped as e:
+        return {'skipped': str(e)}
+
+    # 预热一次（加载动态库、分配内存），不计入结果
+    if options['warmup']:
+        run()
+
+    # 只统计正式运行部分的分阶段耗时
+    metrics.reset()
+    metrics.enable()
+    timings = []
+    items = 0
+    for _ in range(options['repeat']):
+        start = time.perf_counter()
+        items = run()
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    return {
+        'unit': unit,
+        'items': items,
+        'repeat': len(timings),
+        'median_s': round(median, 4),
+        'best_s': round(min(timings), 4),
+        'per_item_ms': round(median * 1000 / items, 2) if items else None,
+        'throughput': round(items / median, 3) if median else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'breakdown': metrics.snapshot(),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=BENCH_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_all(stage_names, fixtures, options):
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'options': options,
+        'fixtures': fixtures['params'],
+        'stages': {},
+    }
+    # spawn：每个阶段使用全新进程，峰值内存互不影响
+    context = multiprocessing.get_context('spawn')
+    for name in stage_names:
+        print(f"运行阶段 {name} ...", flush=True)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                result = executor.submit(run_stage, name, fixtures, options).result()
+            except Exception as e:
+                result = {'error': str(e)}
+        results['stages'][name] = result
+        print(f"  {_format_result(result)}", flush=True)
+        if name == 'encode_profiles' and 'breakdown' in result:
+            print(f"  {'方案':<16}{'类型':<8}{'耗时ms':>10}{'体积KB':>10}")
+            for profile, kind, p50_ms, size_kb in profile_report(result):
+                print(f"  {profile:<16}{kind:<8}{p50_ms:>10.1f}{size_kb:>10.1f}", flush=True)
+    return results
+
+
+def _format_result(result):
+    if 'skipped' in result:
+        return f"跳过：{result['skipped']}"
+    if 'error' in result:
+        return f"出错：{result['error']}"
+    return (f"{result['items']} {result['unit']}，中位数 {result['median_s']:.3f}s，"
+            f"{result['throughput']} {result['unit']}/s，峰值内存 {result['peak_rss_mb']}MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.run_bench', description='流水线基准测试')
+    parser.add_argument('--stages', default=','.join(STAGES), help='逗号分隔的阶段名，默认全部')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段重复次数（取中位数）')
+    parser.add_argument('--no-warmup', action='store_true', help='不做预热运行')
+    parser.add_argument('--threads', type=int, default=None, help='OpenCV线程数（默认由OpenCV决定）')
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR, help='测试素材目录（不存在时自动生成）')
+    parser.add_argument('--output', default=None, help='结果JSON路径，默认 bench/results/<时间>.json')
+    parser.add_argument('--compare', default=None, help='与之前的结果JSON对比')
+    parser.add_argument('--easyocr-model-dir', default=easyocr_model_path)
+    parser.add_argument('--whisper-model', default=whisper_model_path)
+    args = parser.parse_args(argv)
+
+    stage_names = [name.strip() for name in args.stages.split(',') if name.strip()]
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        parser.error(f"未知阶段: {', '.join(unknown)}（可选：{', '.join(STAGES)}）")
+
+    print(f"准备测试素材：{args.fixtures}", flush=True)
+    fixtures = ensure_fixtures(args.fixtures)
+
+    options = {
+        'repeat': args.repeat,
+        'warmup': not args.no_warmup,
+        'threads': args.threads,
+        'easyocr_model_dir': args.easyocr_model_dir,
+        'whisper_model': args.whisper_model,
+    }
+    results = run_all(stage_names, fixtures, options)
+
+    output = args.output or os.path.join(DEFAULT_RESULT_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至：{output}")
+
+    if args.compare:
+        from bench.compare import load_results, print_comparison
+        print_comparison(load_results(args.compare), results)
+
+
+if __name__ == "__main__":
+    main()
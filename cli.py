@@ -0,0 +1,568 @@
+"""
+命令行批处理入口（无界面，适合在Linux服务器上通过cron按全部核数调度）
+
+在项目根目录执行，示例：
+    python -m cli scale /data/素材 --workers 8
+    python -m cli split /data/素材 --output /data/切分
+    python -m cli heic /data/iphone --delete-source
+    python -m cli ocr /data/进货单 --output /data/ocr --model-dir /models/easyOCR
+    python -m cli ocr /data/进货单 --table xlsx
+    python -m cli asr /data/视频 --model /models/whisper/medium.pt --frames
+    python -m cli watermark /data/视频 --logo /data/logo/da.png --watermark-size 212x66
+    python -m cli audio /data/music --output /data/mp3 --bitrate 320k
+    python -m cli qr /data/素材 --report qr_audit.csv --output /data/qr缩略图
+
+公共参数：
+    -o/--output  输出目录，保持输入目录的相对结构；不指定时输出到源文件所在目录
+    --workers    并行进程数，默认CPU核数（ocr/asr 每个进程单独加载模型，默认1）
+    --dry-run    只列出将要处理的文件及输出路径，不做任何处理
+    --jsonl      在标准输出按行打印JSON进度事件，处理过程中的日志改为输出到标准错误
+    --metrics    统计各处理阶段耗时（p50/p95/max）与计数，写出报告（.prom/.txt为Prometheus格式，其余为JSON）
+
+ocr 加 --table csv/xlsx 时按表格识别：检测框线后逐单元格批量识别，结果保存为表格文件（没有框线时按文字坐标还原）
+
+qr 为二维码审计：只检测不修改图片，结果写入 --report（.jsonl 或 .csv），-o 指定时在该目录输出检测到二维码的图片的标注缩略图
+
+处理逻辑与界面窗口共用同一套函数（img/ImageScale.py、img/image_split.py 等）
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+
+import metrics
+from config import img_width, img_height, logo_path, easyocr_model_path, whisper_model_path, output_profiles, \
+    blank_tile_mode, trim_trailing_blank, qr_audit_thumbnail_size, ocr_runtime, asr_backend, \
+    asr_chunk_workers
+from file.file_utils import get_non_hidden_files_pathlib, get_non_hidden_files_deli_xq, get_non_hidden_files_video, \
+    HEIC_SUFFIXES
+from file.image_encoding import ENCODING_PROFILES
+from img.qr_backends import QR_BACKENDS
+from video.subtitles import FRAME_TEXT_FORMAT, parse_timed_formats
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+AUDIO_SUFFIXES = ('.flac', '.ogg')
+
+# 工作进程中已加载的模型（ocr/asr），每个进程只加载一次
+_MODELS = {}
+
+
+# ========== 各流水线的单文件处理函数（在工作进程中执行） ==========
+def _scale_job(src, dst, options):
+    from img.ImageScale import resize_image
+    ok = resize_image(src, dst, options['width'], options['height'], profile=options['profile'])
+    if ok and options['delete_source']:
+        os.remove(src)
+    return ok
+
+
+def _split_job(src, dst, options):
+    from img.image_split import split_xq_image
+    split_xq_image(src, dst, profile=options['profile'], blank_mode=options['blank'], trim=options['trim'])
+    return True
+
+
+def _heic_job(src, dst, options):
+    from img.image_heic_jpg import convert_heic_to_jpg
+    ok = convert_heic_to_jpg(src, jpg_path=dst, quality=options['quality'])
+    if ok and options['delete_source']:
+        os.remove(src)
+    return ok
+
+
+def _ocr_job(src, dst, options):
+    if options['table']:
+        from img.image_ocr import recognize_table_cells, write_table
+        table_data = recognize_table_cells(src, _MODELS['reader'])
+        if table_data is None:
+            return False
+        write_table(table_data, dst)
+        return True
+    from img.get_text_app import recognize_image_text, group_ocr_by_lines
+    results = recognize_image_text(src, _MODELS['reader'])
+    if results is None:
+        return False
+    _write_text(dst, "\n".join(group_ocr_by_lines(results, line_threshold=10)))
+    return True
+
+
+def _asr_job(src, dst, options):
+    from video.mp4_text import transcribe_mp4_result, video_text_timeline
+    from video.subtitles import SUBTITLE_FORMATS, FRAME_TEXT_FORMAT, SubtitleWriter, FrameTextWriter, \
+        timed_output_path
+    # 带时间的输出与文字稿放在一起，边识别边写入
+    base_path = os.path.splitext(dst)[0]
+    with ExitStack() as stack:
+        writers = [stack.enter_context(SubtitleWriter(timed_output_path(base_path, fmt)))
+                   for fmt in options['timed'] if fmt in SUBTITLE_FORMATS]
+        result = transcribe_mp4_result(src, _MODELS['asr'], on_segment=(
+            lambda segment: [writer.write(segment) for writer in writers]) if writers else None)
+    text = result.text
+    if options['frames']:
+        with ExitStack() as stack:
+            on_text = None
+            if FRAME_TEXT_FORMAT in options['timed']:
+                on_text = stack.enter_context(FrameTextWriter(timed_output_path(base_path, FRAME_TEXT_FORMAT))).write
+            frame_texts = [frame_text for _, frame_text in
+                           video_text_timeline(src, reader=_MODELS['reader'], on_text=on_text)]
+        text = text + "\n\n=== 画面识别文字 ===\n" + "\n".join(frame_texts)
+    _write_text(dst, text)
+    return True
+
+
+def _watermark_job(src, dst, options):
+    from video.video_watermark_remove import VideoProcessor
+    processor = VideoProcessor(src, options['logo'], watermark_size=options['watermark_size'], output_path=dst)
+    return processor.run()
+
+
+def _audio_job(src, dst, options):
+    from video.flac2mp3 import convert_audio_to_mp3
+    return convert_audio_to_mp3(src, dst, options['bitrate'])
+
+
+def _qr_job(src, dst, options):
+    from img.image_detect_qr import audit_image
+    codes = audit_image(src, thumbnail_path=dst, backend=options['backend'], thumbnail_size=options['thumbnail_size'])
+    return {'codes': codes}
+
+
+def _write_text(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+# ========== 输入文件与输出路径 ==========
+def _list_scale_files(directory):
+    from img.ImageScale import get_scale_files, is_scaled_file
+    # 与单个文件输入一样只处理图片（目录中常混有视频、清单等文件）
+    return [item for item in get_scale_files(directory)
+            if Path(item).suffix.lower() in IMAGE_SUFFIXES + HEIC_SUFFIXES and not is_scaled_file(item)]
+
+
+def _list_files_with_suffix(suffixes):
+    def list_files(directory):
+        return [item for item in get_non_hidden_files_pathlib(directory) if Path(item).suffix.lower() in suffixes]
+
+    return list_files
+
+
+def _list_heic_files(directory):
+    # 按文件头筛选，扩展名为HEIC但实际是JPEG等格式的文件不送入转换
+    from img.image_heic_jpg import list_heic_files
+    return list_heic_files(directory)
+
+
+def _mirror_path(src, base_dir, output_dir, name):
+    """指定输出目录时保持相对 base_dir 的目录结构，否则与源文件同目录"""
+    if not output_dir:
+        return os.path.join(os.path.dirname(src), name)
+    rel_parent = os.path.relpath(os.path.dirname(src), base_dir)
+    return os.path.normpath(os.path.join(output_dir, rel_parent, name))
+
+
+def _scale_output(src, base_dir, args):
+    from img.ImageScale import get_file_new_path
+    return _mirror_path(src, base_dir, args.output, os.path.basename(get_file_new_path(src, args.width, args.height, profile=args.profile)))
+
+
+def _split_output(src, base_dir, args):
+    # 切分结果为多个片段，输出路径为片段所在目录
+    if not args.output:
+        return os.path.dirname(src)
+    return os.path.normpath(os.path.join(args.output, os.path.relpath(os.path.dirname(src), base_dir)))
+
+
+def _replace_suffix_output(suffix):
+    def output(src, base_dir, args):
+        return _mirror_path(src, base_dir, args.output, Path(src).stem + suffix)
+
+    return output
+
+
+def _ocr_output(src, base_dir, args):
+    # 表格识别时按 --table 指定的格式输出
+    suffix = '.' + args.table if args.table else '.txt'
+    return _mirror_path(src, base_dir, args.output, Path(src).stem + suffix)
+
+
+def _qr_output(src, base_dir, args):
+    # 只在指定输出目录时生成标注缩略图
+    if not args.output:
+        return None
+    return _mirror_path(src, base_dir, args.output, Path(src).stem + '_qr.jpg')
+
+
+def _qr_report(args):
+    from img.image_detect_qr import QrAuditReport
+    return QrAuditReport(args.report, include_clean=args.include_clean)
+
+
+def _watermark_output(src, base_dir, args):
+    return _mirror_path(src, base_dir, args.output, f"{Path(src).stem}_logo{Path(src).suffix}")
+
+
+PIPELINES = {
+    'scale': {
+        'help': '图片缩放为正方形并模糊二维码（可直接处理HEIC）',
+        'job': _scale_job,
+        'list_files': _list_scale_files,
+        'suffixes': IMAGE_SUFFIXES + HEIC_SUFFIXES,
+        'output': _scale_output,
+    },
+    'split': {
+        'help': '得力xq详情图模糊二维码后按宽度切分为正方形',
+        'job': _split_job,
+        'list_files': get_non_hidden_files_deli_xq,
+        'suffixes': None,
+        'output': _split_output,
+    },
+    'heic': {
+        'help': 'HEIC/HEIF 转 JPG',
+        'job': _heic_job,
+        'list_files': _list_heic_files,
+        'suffixes': HEIC_SUFFIXES,
+        'output': _replace_suffix_output('.jpg'),
+    },
+    'ocr': {
+        'help': '图片文字识别（EasyOCR），结果保存为txt',
+        'job': _ocr_job,
+        'list_files': _list_files_with_suffix(IMAGE_SUFFIXES),
+        'suffixes': IMAGE_SUFFIXES,
+        'output': _ocr_output,
+        'default_workers': 1,
+    },
+    'asr': {
+        'help': '视频语音转文字（Whisper），可选识别画面文字',
+        'job': _asr_job,
+        'list_files': get_non_hidden_files_video,
+        'suffixes': ('.mp4',),
+        'output': _replace_suffix_output('.txt'),
+        'default_workers': 1,
+    },
+    'watermark': {
+        'help': '视频去除右上角水印并添加logo',
+        'job': _watermark_job,
+        'list_files': get_non_hidden_files_video,
+        'suffixes': ('.mp4',),
+        'output': _watermark_output,
+    },
+    'audio': {
+        'help': 'flac/ogg 转 mp3',
+        'job': _audio_job,
+        'list_files': _list_files_with_suffix(AUDIO_SUFFIXES),
+        'suffixes': AUDIO_SUFFIXES,
+        'output': _replace_suffix_output('.mp3'),
+    },
+    'qr': {
+        'help': '二维码审计：批量检测图片中的二维码，输出CSV/JSONL报告',
+        'job': _qr_job,
+        'list_files': _list_files_with_suffix(IMAGE_SUFFIXES),
+        'suffixes': IMAGE_SUFFIXES,
+        'output': _qr_output,
+        # 汇总每个文件结果的报告（主进程中写入）
+        'report': _qr_report,
+    },
+}
+
+
+def collect_inputs(pipeline, inputs):
+    """展开输入路径，返回 [(文件路径, 计算相对路径用的根目录), ...]"""
+    items = []
+    for target in inputs:
+        if os.path.isdir(target):
+            items.extend((item, target) for item in pipeline['list_files'](target))
+        elif os.path.isfile(target):
+            suffixes = pipeline['suffixes']
+            if suffixes and Path(target).suffix.lower() not in suffixes:
+                raise ValueError(f"不支持的文件格式: {target}")
+            items.append((target, os.path.dirname(target)))
+        else:
+            raise ValueError(f"输入路径不存在: {target}")
+    return items
+
+
+# ========== 执行 ==========
+def _init_worker(name, options, jsonl, collect_metrics=False, workers=1):
+    """
+    工作进程初始化：加载模型；JSON进度模式下把处理日志重定向到标准错误
+
+    ocr/asr 的计算线程数按 CPU核数 / 进程数 分配（config.model_threads 可固定），避免各进程按全部核数开线程
+    """
+    if jsonl:
+        sys.stdout = sys.stderr
+    if collect_metrics:
+        metrics.enable()
+    if options.get('no_qr_cache'):
+        from img.qr_cache import enable_qr_cache
+        enable_qr_cache(False)
+
+    if name in ('ocr', 'asr'):
+        from model_runtime import configure_threads, thread_budget
+        configure_threads(thread_budget(workers))
+    if name == 'ocr' or (name == 'asr' and options['frames']):
+        from img.ocr_runtime import create_reader
+        _MODELS['reader'] = create_reader(model_dir=options['model_dir'], runtime=options['ocr_runtime'])
+    if name == 'asr':
+        from video.mp4_text import load_whisper_with_mps
+        _MODELS['asr'] = load_whisper_with_mps(options['model'], backend=options['asr_backend'],
+                                               chunk_workers=options['chunk_workers'])
+
+
+def _run_task(name, src, dst, options):
+    start = time.time()
+    # 处理函数返回布尔值表示成功与否；返回字典时视为成功，字典内容随结果带回主进程
+    details = {}
+    try:
+        value = PIPELINES[name]['job'](src, dst, options)
+        if isinstance(value, dict):
+            ok, details = True, value
+        else:
+            ok = bool(value)
+        error = None
+    except Exception as e:
+        ok = False
+        error = str(e)
+    elapsed = time.time() - start
+    result = {'input': src, 'output': dst, 'ok': ok, 'error': error, 'elapsed': round(elapsed, 3)}
+    result.update(details)
+    if metrics.is_enabled():
+        # 工作进程的统计随结果带回主进程汇总
+        metrics.observe(f'cli.{name}.file', elapsed)
+        result['metrics'] = metrics.drain()
+    return result
+
+
+class ProgressReporter:
+    """输出进度：--jsonl 时每个事件一行JSON，否则输出可读文本"""
+
+    def __init__(self, jsonl):
+        self.jsonl = jsonl
+        # 记录原始标准输出，避免被处理日志的重定向影响
+        self.out = sys.stdout
+
+    def emit(self, event, **fields):
+        if self.jsonl:
+            record = {'event': event, 'time': round(time.time(), 3)}
+            record.update(fields)
+            self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            self.out.write(self._format(event, fields) + "\n")
+        self.out.flush()
+
+    def _format(self, event, fields):
+        if event == 'start':
+            return (f"===== {fields['pipeline']}：共 {fields['total']} 个文件，"
+                    f"{fields['workers']} 个进程{'（演练模式）' if fields['dry_run'] else ''} =====")
+        if event == 'plan':
+            return f"[{fields['index']}/{fields['total']}] {fields['input']} -> {fields['output']}"
+        if event == 'file':
+            mark = '✅' if fields['ok'] else '❌'
+            error = f" {fields['error']}" if fields.get('error') else ''
+            codes = f" 二维码{len(fields['codes'])}个" if fields.get('codes') else ''
+            return (f"[{fields['index']}/{fields['total']}] {mark} {fields['input']} "
+                    f"({fields['elapsed']:.2f}s){codes}{error}")
+        if event == 'report':
+            return (f"===== 二维码审计：{fields['images_with_qr']} 张图片检测到 {fields['codes']} 个二维码，"
+                    f"读取失败 {fields['errors']} 张，报告：{fields['path']} =====")
+        if event == 'metrics':
+            return f"===== 阶段耗时（报告：{fields['path']}） =====\n{metrics.format_summary()}"
+        return f"===== 完成：成功 {fields['succeeded']} 个，失败 {fields['failed']} 个，耗时 {fields['elapsed']:.2f}s ====="
+
+
+def run_pipeline(name, args, options):
+    pipeline = PIPELINES[name]
+    reporter = ProgressReporter(args.jsonl)
+
+    tasks = [(src, pipeline['output'](src, base_dir, args)) for src, base_dir in collect_inputs(pipeline, args.inputs)]
+    total = len(tasks)
+    workers = args.workers or pipeline.get('default_workers') or os.cpu_count() or 1
+    workers = max(1, min(workers, total or 1))
+
+    start = time.time()
+    reporter.emit('start', pipeline=name, total=total, workers=workers, dry_run=args.dry_run)
+
+    if args.dry_run:
+        for index, (src, dst) in enumerate(tasks, 1):
+            reporter.emit('plan', index=index, total=total, input=src, output=dst)
+        reporter.emit('done', pipeline=name, succeeded=0, failed=0, elapsed=round(time.time() - start, 3))
+        return 0
+
+    succeeded = failed = 0
+    summary = pipeline['report'](args) if 'report' in pipeline else None
+
+    def report(index, result):
+        nonlocal succeeded, failed
+        metrics.merge(result.pop('metrics', None))
+        if result['ok']:
+            succeeded += 1
+        else:
+            failed += 1
+        if summary is not None:
+            summary.add(result['input'], result.get('codes', []), result['error'] or (None if result['ok'] else '处理失败'))
+        reporter.emit('file', index=index, total=total, **result)
+
+    if args.metrics:
+        metrics.reset()
+        metrics.enable()
+    try:
+        if workers == 1:
+            _init_worker(name, options, args.jsonl, bool(args.metrics), workers)
+            for index, (src, dst) in enumerate(tasks, 1):
+                report(index, _run_task(name, src, dst, options))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(name, options, args.jsonl, bool(args.metrics), workers)) as executor:
+                futures = [executor.submit(_run_task, name, src, dst, options) for src, dst in tasks]
+                for index, future in enumerate(as_completed(futures), 1):
+                    report(index, future.result())
+    finally:
+        if summary is not None:
+            summary.close()
+
+    reporter.emit('done', pipeline=name, succeeded=succeeded, failed=failed, elapsed=round(time.time() - start, 3))
+    if summary is not None:
+        reporter.emit('report', path=summary.path, images_with_qr=summary.images_with_qr, codes=summary.codes,
+                      errors=summary.errors)
+    if args.metrics:
+        metrics.write_report(args.metrics)
+        reporter.emit('metrics', path=args.metrics, **metrics.snapshot())
+    return 0 if failed == 0 else 1
+
+
+# ========== 参数解析 ==========
+def _parse_size(value):
+    """解析 宽x高，none 表示不处理"""
+    if value.lower() == 'none':
+        return None
+    try:
+        width, height = value.lower().split('x')
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸格式应为 宽x高 或 none：{value}")
+
+
+def _parse_timed_formats(value):
+    try:
+        return parse_timed_formats(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('inputs', nargs='+', help='输入文件或目录')
+    common.add_argument('-o', '--output', help='输出目录（默认与源文件同目录）')
+    common.add_argument('--workers', type=int, default=None, help='并行进程数（默认CPU核数）')
+    common.add_argument('--dry-run', action='store_true', help='只列出待处理文件，不执行')
+    common.add_argument('--jsonl', action='store_true', help='以JSON Lines输出进度')
+    common.add_argument('--metrics', metavar='PATH', help='写出各阶段耗时统计（.prom/.txt为Prometheus格式，其余为JSON）')
+
+    parser = argparse.ArgumentParser(prog='python -m cli', description='电商素材批处理（无界面）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add(name):
+        return subparsers.add_parser(name, parents=[common], help=PIPELINES[name]['help'])
+
+    scale = add('scale')
+    scale.add_argument('--width', type=int, default=img_width)
+    scale.add_argument('--height', type=int, default=img_height)
+    scale.add_argument('--delete-source', action='store_true', help='处理成功后删除原图（与界面行为一致）')
+    scale.add_argument('--profile', choices=list(ENCODING_PROFILES), default=output_profiles['scale'],
+                       help='输出编码方案（默认沿用原图格式）')
+    scale.add_argument('--no-qr-cache', action='store_true', help='不使用二维码区域缓存，每张图都重新检测')
+
+    split = add('split')
+    split.add_argument('--profile', choices=list(ENCODING_PROFILES), default=output_profiles['split'],
+                       help=f"片段编码方案（默认{output_profiles['split']}）")
+    split.add_argument('--blank', choices=['keep', 'shared', 'drop'], default=blank_tile_mode,
+                       help='纯色片段：keep 照常编码 / shared 复用缓存的编码结果 / drop 不输出')
+    split.add_argument('--trim', action=argparse.BooleanOptionalAction, default=trim_trailing_blank,
+                       help=f"切分前裁掉末尾留白（--no-trim 关闭，默认{'开启' if trim_trailing_blank else '关闭'}）")
+    split.add_argument('--no-qr-cache', action='store_true', help='不使用二维码区域缓存，每张图都重新检测')
+
+    heic = add('heic')
+    heic.add_argument('--quality', type=int, default=95)
+    heic.add_argument('--delete-source', action='store_true', help='转换成功后删除HEIC原图')
+
+    ocr = add('ocr')
+    ocr.add_argument('--model-dir', default=easyocr_model_path, help='EasyOCR模型目录')
+    ocr.add_argument('--ocr-runtime', choices=['torch', 'onnx'], default=ocr_runtime,
+                     help='EasyOCR推理运行时（onnx 首次使用时导出模型）')
+    ocr.add_argument('--table', choices=['csv', 'xlsx'], default=None,
+                     help='按表格识别（检测框线后逐单元格批量识别），输出为CSV或Excel')
+
+    asr = add('asr')
+    asr.add_argument('--model', default=whisper_model_path, help='Whisper模型路径或名称')
+    asr.add_argument('--asr-backend', choices=['whisper', 'faster_whisper'], default=asr_backend,
+                     help='语音识别后端（faster_whisper 首次使用时把模型转换为CTranslate2 INT8）')
+    asr.add_argument('--chunk-workers', type=int, default=asr_chunk_workers,
+                     help='按VAD切分语音段并行识别的模型实例数，0为整段识别（每个实例单独占用内存）')
+    asr.add_argument('--frames', action='store_true', help='同时识别视频画面中的文字')
+    asr.add_argument('--timed', type=_parse_timed_formats, default=[], metavar='FORMATS',
+                     help='同时输出带时间的文件，逗号分隔：srt / vtt（语音字幕）、jsonl（画面文字，需--frames）')
+    asr.add_argument('--model-dir', default=easyocr_model_path, help='EasyOCR模型目录（--frames时使用）')
+    asr.add_argument('--ocr-runtime', choices=['torch', 'onnx'], default=ocr_runtime,
+                     help='EasyOCR推理运行时（--frames时使用）')
+
+    watermark = add('watermark')
+    watermark.add_argument('--logo', default=logo_path, help='logo图片路径')
+    watermark.add_argument('--watermark-size', type=_parse_size, default=None,
+                           help='右上角水印区域 宽x高，默认none（不去水印，只加logo）')
+
+    audio = add('audio')
+    audio.add_argument('--bitrate', default='320k', help='mp3比特率')
+
+    qr = add('qr')
+    qr.add_argument('--report', default='qr_audit.csv', help='审计报告路径（.jsonl 或 .csv，默认 qr_audit.csv）')
+    qr.add_argument('--include-clean', action='store_true', help='报告中也记录没有二维码的图片')
+    qr.add_argument('--backend', choices=list(QR_BACKENDS), default=None,
+                    help='二维码检测后端（默认 config.qr_backend）')
+    qr.add_argument('--thumbnail-size', type=int, default=qr_audit_thumbnail_size, help='标注缩略图最长边')
+
+    return parser
+
+
+def build_options(args):
+    """提取传给工作进程的参数（需可序列化）"""
+    if args.command == 'scale':
+        return {'width': args.width, 'height': args.height, 'delete_source': args.delete_source,
+                'profile': args.profile, 'no_qr_cache': args.no_qr_cache}
+    if args.command == 'split':
+        return {'profile': args.profile, 'blank': args.blank, 'trim': args.trim, 'no_qr_cache': args.no_qr_cache}
+    if args.command == 'heic':
+        return {'quality': args.quality, 'delete_source': args.delete_source}
+    if args.command == 'ocr':
+        return {'model_dir': args.model_dir, 'table': args.table, 'ocr_runtime': args.ocr_runtime}
+    if args.command == 'asr':
+        return {'model': args.model, 'asr_backend': args.asr_backend, 'chunk_workers': args.chunk_workers,
+                'frames': args.frames, 'timed': args.timed, 'model_dir': args.model_dir,
+                'ocr_runtime': args.ocr_runtime}
+    if args.command == 'watermark':
+        return {'logo': args.logo, 'watermark_size': args.watermark_size}
+    if args.command == 'audio':
+        return {'bitrate': args.bitrate}
+    if args.command == 'qr':
+        return {'backend': args.backend, 'thumbnail_size': args.thumbnail_size}
+    return {}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'asr' and FRAME_TEXT_FORMAT in args.timed and not args.frames:
+        parser.error(f"--timed {FRAME_TEXT_FORMAT}（画面文字）需要同时指定 --frames")
+    try:
+        return run_pipeline(args.command, args, build_options(args))
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+import os
+
 img_width = 1024
 img_height = 1024
 
@@ -7,3 +9,95 @@ logo_path = '/Users/tyrtao/QcHelper/电商/logo/da.png'
 video_path = '/Users/tyrtao/QcHelper/电商'
 video_target_path = '/Users/tyrtao/QcHelper/测试/视频'
 wav_text_path = '/Users/tyrtao/AI/文字识别/语音识别/cmusphinx-zh-cn-5.2'
+
+# 模型路径
+easyocr_model_path = '/Users/tyrtao/AI/文字识别/easyOCR'
+whisper_model_path = '/Users/tyrtao/AI/文字识别/语音识别/whisper/medium.pt'
+# 图片文字识别窗口的后台识别线程数（共用同一个EasyOCR模型，PyTorch推理本身已多线程，一般1~2即可）
+ocr_gui_workers = 1
+# 图片文字识别先以 ocr_probe_canvas 低分辨率探测文字大小与位置，再按字高（检测输入中不低于 ocr_min_char_height 像素）
+# 选择最小的检测尺寸，并只识别文字所在区域（见 img/ocr_sizing.py）；False 时沿用固定的 canvas_size=1280、mag_ratio=1.5
+ocr_adaptive_sizing = True
+ocr_probe_canvas = 640
+ocr_min_char_height = 16
+# 两级OCR（见 img/ocr_cascade.py）：先用形态学梯度找候选文字区域，只识别这些区域（跳过整图检测），没有候选区域时完整检测
+# image：图片文字识别（进货单等密集文字建议关闭），video：视频画面文字（字幕区域小，收益大）
+ocr_cascade = {'image': False, 'video': True}
+# EasyOCR 推理运行时（见 img/ocr_runtime.py）：torch（默认）/ onnx（首次使用时导出ONNX模型，用 ONNX Runtime 在CPU上推理）
+ocr_runtime = 'torch'
+# ONNX模型目录，为空时为 easyocr_model_path 下的 onnx 目录
+ocr_onnx_dir = ''
+# INT8 动态量化（模型更小、CPU推理更快，精度略有下降）
+ocr_onnx_quantize = False
+# ONNX Runtime 单次推理的线程数，0 为按物理核数；多进程批处理时设为 核数/进程数
+ocr_onnx_threads = 0
+# 执行后端，安装 onnxruntime-openvino 后可在前面加 'OpenVINOExecutionProvider'
+ocr_onnx_providers = ['CPUExecutionProvider']
+# 语音识别后端（见 video/asr_backends.py）：whisper（openai-whisper，默认）/ faster_whisper（CTranslate2，CPU上通常快数倍）
+asr_backend = 'whisper'
+# faster_whisper 的CTranslate2模型目录，为空时由 whisper_model_path 在旁边自动转换一次（<名称>_ct2_<精度>）
+asr_ct2_model_path = ''
+# faster_whisper 推理精度：int8（默认）/ int8_float32 / float32
+asr_compute_type = 'int8'
+# 束搜索宽度，1 为贪心解码（最快），5 接近 openai-whisper 命令行默认的精度
+asr_beam_size = 1
+# 用VAD跳过静音、纯音乐段（仅 faster_whisper）
+asr_vad = True
+# faster_whisper 推理线程数，0 为按本进程的线程预算（见 model_threads，分段识别、批量识别的多个实例平分）
+asr_cpu_threads = 0
+# 长视频分段并行识别（见 video/asr_chunking.py）：大于0时按能量VAD切出语音段，加载这么多个模型实例并行识别；
+# 0 为整段顺序识别。每个实例单独占用内存（medium 约1.5GB，faster_whisper INT8 约0.5GB）
+asr_chunk_workers = 0
+# 分段时短于该秒数的静音不切开；语音段最长秒数（Whisper 单个窗口为30秒）
+asr_vad_min_silence = 0.5
+asr_max_chunk_seconds = 30
+# 视频转文字时语音识别与画面文字识别在两个进程中同时进行（见 video/video_text.py），各自的计算线程数；
+# 0 为按CPU核数自动分配（语音约占2/3）
+video_text_threads = {'asr': 0, 'ocr': 0}
+# 视频转文字时边识别边写出的带时间文件（见 video/subtitles.py）：srt / vtt 为语音字幕，jsonl 为画面文字（时间、帧号、文字框）
+video_text_outputs = ['srt', 'jsonl']
+# 批量语音识别窗口（video/mp4_wav_text.py）的识别线程数，每个线程单独加载一个模型实例（注意内存）；
+# 音频提取在单独的线程中与识别重叠进行。已有文字稿（doc/<名称>_语音识别.txt）的文件是否跳过
+asr_batch_workers = 1
+asr_batch_skip_existing = True
+# 模型运行设备（见 model_runtime.py）：auto（依次尝试 CUDA、MPS）/ cpu / cuda / mps，指定的设备不可用时使用CPU；
+# faster_whisper 不支持 mps，onnx 运行时的OCR按 ocr_onnx_providers
+model_devices = {'asr': 'auto', 'ocr': 'cpu'}
+# 每个进程的 PyTorch / OpenCV 计算线程数，0 为 CPU核数 / 进程数；interop 线程数（算子间并行）
+model_threads = 0
+model_interop_threads = 1
+# 模型加载后先用合成的图片/音频推理一次，首个文件不承担初始化开销
+model_warmup = True
+
+# 日志窗口最多保留的行数；完整日志可落盘到 log_spool_dir（为空则不落盘）
+log_max_lines = 2000
+log_spool_dir = ''
+
+# 图片输出编码方案（见 file/image_encoding.py 中的 ENCODING_PROFILES）
+# 未指定方案时按输出扩展名选择
+default_profiles = {'.png': 'png_fast', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.webp': 'webp'}
+# 各流水线的输出方案，None 表示沿用原图格式
+output_profiles = {'scale': None, 'split': 'png_fast', 'split_width': 'png_fast'}
+# 后台编码写入线程数，以及最多积压的待写入图片数（达到后切图线程等待）
+image_write_workers = 4
+image_write_queue = 16
+# xq切分：纯色片段（如结尾留白）的处理方式
+# keep 照常编码 / shared 复用缓存的纯色编码结果 / drop 不输出（片段编号保持连续）
+blank_tile_mode = 'shared'
+# 判定为纯色的最大像素差（0-255，jpg原图有压缩噪点）
+blank_tile_tolerance = 3
+# 切分前裁掉图片末尾与底色相同的留白行
+trim_trailing_blank = False
+
+# 二维码检测后端（见 img/qr_backends.py）：opencv / opencv_aruco / pyzbar / zxing
+# 可用 python -m bench.qr_backends 对比各后端的检出率与耗时；opencv_aruco 需要OpenCV 4.8+，不可用时退回 opencv
+qr_backend = 'opencv_aruco'
+
+# 二维码审计（python -m cli qr）标注缩略图的最长边
+qr_audit_thumbnail_size = 512
+
+# 二维码区域缓存（见 img/qr_cache.py），为空则不使用缓存
+qr_cache_path = os.path.join(os.path.expanduser('~'), '.qchelper', 'qr_cache.sqlite3')
+qr_cache_max_entries = 100000
+# 感知哈希相差不超过该位数视为近似图片（0-7），近似命中（含哈希相同但像素不同）时只在缓存区域内复核
+qr_cache_max_distance = 6
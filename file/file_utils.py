@@ -1,8 +1,22 @@
+import logging
 import os
 from pathlib import Path
 import cv2
 import numpy as np
 
+from file.image_encoding import write_image
+from metrics import timer, count
+
+
+def print_log(message, level=logging.INFO):
+    """默认日志输出（命令行运行时直接打印），界面中替换为窗口的 log 方法"""
+    print(message)
+
+
+def silent_log(message, level=logging.INFO):
+    """不输出的日志函数（批量审计、基准测试、局部复核等不需要逐条日志的场合）"""
+    pass
+
 
 def get_non_hidden_files_pathlib(directory):
     """使用pathlib获取目录中所有非隐藏文件"""
@@ -42,6 +56,43 @@ def get_non_hidden_files_video(directory):
             and not any(part.startswith('.') for part in file.parts)]
 
 
+# 语音识别可处理的音视频格式（由ffmpeg读取音轨）
+MEDIA_SUFFIXES = ('.mp4', '.mov', '.m4v', '.mkv', '.avi', '.webm', '.flv',
+                  '.mp3', '.m4a', '.aac', '.wav', '.flac', '.ogg')
+
+
+def get_non_hidden_media_files(directory, suffixes=MEDIA_SUFFIXES):
+    """递归获取目录中所有非隐藏的音视频文件（扩展名不区分大小写），按路径排序"""
+    dir_path = Path(directory)
+    if not dir_path.exists() or not dir_path.is_dir():
+        raise ValueError(f"目录不存在或不是有效的目录: {directory}")
+
+    return sorted(str(file) for file in dir_path.rglob('*')
+                  if file.is_file()
+                  and file.suffix.lower() in suffixes
+                  and not any(part.startswith('.') for part in file.relative_to(dir_path).parts))
+
+
+HEIC_SUFFIXES = ('.heic', '.heif')
+# HEIF 容器 ftyp 中的品牌（静态图、图片序列、HEVC编码）
+HEIC_BRANDS = (b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'hevm', b'hevs', b'mif1', b'msf1')
+
+
+def is_heic_path(path):
+    """按扩展名判断是否为HEIC/HEIF"""
+    return Path(path).suffix.lower() in HEIC_SUFFIXES
+
+
+def is_heic_file(path):
+    """按文件头判断是否为HEIC/HEIF：第4-8字节为 ftyp，随后是HEIF品牌"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(12)
+    except OSError:
+        return False
+    return len(header) == 12 and header[4:8] == b'ftyp' and header[8:12] in HEIC_BRANDS
+
+
 def get_hidden_files(directory):
     """使用pathlib获取目录中所有非隐藏文件"""
     dir_path = Path(directory)
@@ -63,59 +114,38 @@ def read_chinese_path_image(image_path):
     # 使用numpy读取文件，再用OpenCV解码
     try:
         # 以二进制模式读取文件
-        file_data = np.fromfile(image_path, dtype=np.uint8)
+        with timer('file.read'):
+            file_data = np.fromfile(image_path, dtype=np.uint8)
+        count('file.read_bytes', file_data.size)
         # 解码图片
-        img = cv2.imdecode(file_data, cv2.IMREAD_COLOR)
+        with timer('img.decode'):
+            img = cv2.imdecode(file_data, cv2.IMREAD_COLOR)
         return img
     except Exception as e:
         print(f"读取失败: {e}")
         return None
 
 
-def cv2_imwrite_chinese(output_path, image):
+def cv2_imwrite_chinese(output_path, image, profile=None):
     """
     支持中文路径的cv2.imwrite替代函数
 
     Args:
         output_path: 保存路径（可包含中文）
         image: 要保存的OpenCV图像数组
+        profile: 编码方案名称（见 file/image_encoding.py），默认按扩展名选择
 
     Returns:
         bool: 保存成功返回True，失败返回False
     """
     try:
-        # 获取文件扩展名
-        if '.' in output_path:
-            ext = '.' + output_path.split('.')[-1]
-        else:
-            ext = '.jpg'  # 默认使用jpg格式
-
-        # 根据扩展名设置编码参数
-        encode_params = []
-        if ext.lower() in ['.jpg', '.jpeg']:
-            encode_params = [cv2.IMWRITE_JPEG_QUALITY, 95]
-        elif ext.lower() == '.png':
-            encode_params = [cv2.IMWRITE_PNG_COMPRESSION, 0]
-
-        # 编码图像并保存
-        retval, im_buf_arr = cv2.imencode(ext, image, encode_params)
-
-        if retval:
-            # 确保目录存在
-            directory = os.path.dirname(output_path)
-            if directory and not os.path.exists(directory):
-                os.makedirs(directory)
-
-            # 写入文件
-            im_buf_arr.tofile(output_path)
-            return True
-        else:
-            return False
-
+        write_image(output_path, image, profile)
+        return True
     except Exception as e:
         print(f"保存图片失败: {e}")
         return False
 
+
 if __name__ == "__main__":
     # 指定目录路径
     target_directory = r'D:\电商'  # 替换为你的目录路径
@@ -0,0 +1,211 @@
+"""
+图片输出编码方案
+
+每个方案对应一种输出格式及其编码参数，各流水线使用的方案在 config.output_profiles 中配置，
+未指定方案时按输出文件扩展名取 config.default_profiles 中的默认方案
+"""
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import cv2
+
+from config import default_profiles, image_write_workers, image_write_queue
+from metrics import timer, count
+
+# params 的键、值对应 cv2.IMWRITE_ 开头的常量名（值也可以是整数）
+ENCODING_PROFILES = {
+    'png_raw': {
+        'ext': '.png',
+        'params': {'PNG_COMPRESSION': 0},
+        'help': '不压缩：编码快但文件极大，写入NAS和上传都慢',
+    },
+    'png_fast': {
+        'ext': '.png',
+        'params': {'PNG_COMPRESSION': 1, 'PNG_FILTER': 'PNG_FILTER_SUB'},
+        'help': '快速无损：最低压缩级别 + SUB滤波，编码耗时与不压缩相当，体积小一个数量级',
+    },
+    'png': {
+        'ext': '.png',
+        'params': {'PNG_COMPRESSION': 3},
+        'help': 'OpenCV默认压缩级别',
+    },
+    'png_small': {
+        'ext': '.png',
+        'params': {'PNG_COMPRESSION': 9},
+        'help': '最高压缩级别：体积最小，编码最慢',
+    },
+    'jpeg': {
+        'ext': '.jpg',
+        'params': {'JPEG_QUALITY': 95},
+        'help': 'JPEG 质量95',
+    },
+    'jpeg_web': {
+        'ext': '.jpg',
+        'params': {'JPEG_QUALITY': 90, 'JPEG_PROGRESSIVE': 1, 'JPEG_OPTIMIZE': 1},
+        'help': 'JPEG 质量90，渐进式 + 优化霍夫曼表，适合上传网店',
+    },
+    'webp': {
+        'ext': '.webp',
+        'params': {'WEBP_QUALITY': 90},
+        'help': 'WebP 有损，质量90',
+    },
+    'webp_lossless': {
+        'ext': '.webp',
+        'params': {'WEBP_QUALITY': 101},
+        'help': 'WebP 无损',
+    },
+}
+
+
+def get_profile(name):
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"未知的编码方案: {name}，可选：{', '.join(ENCODING_PROFILES)}")
+    return ENCODING_PROFILES[name]
+
+
+@lru_cache(maxsize=None)
+def _encode_params(name):
+    """把方案参数转换为 cv2.imencode 的参数列表，当前OpenCV版本不支持的参数跳过"""
+    params = []
+    for key, value in get_profile(name)['params'].items():
+        flag = getattr(cv2, f'IMWRITE_{key}', None)
+        if isinstance(value, str):
+            value = getattr(cv2, f'IMWRITE_{value}', None)
+        if flag is None or value is None:
+            continue
+        params.extend([flag, value])
+    return params
+
+
+def profile_for_path(path, profile=None):
+    """确定输出使用的方案：指定了方案直接使用，否则按扩展名取默认方案（没有默认方案的格式返回None）"""
+    if profile:
+        get_profile(profile)
+        return profile
+    return default_profiles.get(_path_ext(path))
+
+
+def _path_ext(path):
+    # 没有扩展名时默认使用jpg格式
+    return os.path.splitext(path)[1].lower() or '.jpg'
+
+
+def with_profile_suffix(path, profile):
+    """把输出路径的扩展名替换为方案对应的格式，未指定方案时原样返回"""
+    if not profile:
+        return path
+    return os.path.splitext(path)[0] + get_profile(profile)['ext']
+
+
+def encode_image(image, profile, ext=None):
+    """
+    按方案编码图片，返回编码后的字节数组，失败时抛出异常
+
+    profile 为 None 时按 ext 格式使用OpenCV默认参数编码
+    """
+    if profile:
+        ext, params, name = get_profile(profile)['ext'], _encode_params(profile), profile
+    else:
+        params, name = [], ext.lstrip('.')
+    with timer(f'img.encode.{name}'):
+        retval, buffer = cv2.imencode(ext, image, params)
+    if not retval:
+        raise ValueError(f"图片编码失败（{name}）")
+    count(f'img.encode.{name}.bytes', buffer.size)
+    return buffer
+
+
+def write_image(output_path, image, profile=None):
+    """编码并写入图片（支持中文路径），失败时抛出异常"""
+    write_buffer(output_path, encode_image(image, profile_for_path(output_path, profile), _path_ext(output_path)))
+
+
+def write_buffer(output_path, buffer):
+    """写入已编码的图片数据"""
+    # 确保目录存在
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with timer('file.write'):
+        buffer.tofile(output_path)
+    count('file.write_bytes', buffer.size)
+
+
+class ImageWriterPool:
+    """
+    后台编码写入线程池（写后即返回，cv2编码时释放GIL，多线程可并行压缩）
+
+    - 待写入的图片数达到 max_pending 时 submit 阻塞，避免切图速度快于编码时占满内存
+    - 提交时可指定分组（如原图路径），flush(分组) 等待该组全部写完，用于保证原图的片段都落盘后才标记完成
+    - 提交的图片在写入完成前不能再修改
+    """
+
+    def __init__(self, workers=image_write_workers, max_pending=image_write_queue):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='image-writer')
+        self.slots = threading.BoundedSemaphore(max(1, max_pending))
+        self.lock = threading.Lock()
+        # 分组 -> 未确认的写入任务
+        self.groups = defaultdict(list)
+
+    def submit(self, output_path, image, profile=None, group=None):
+        return self._submit(group, write_image, output_path, image, profile)
+
+    def submit_encoded(self, output_path, buffer, group=None):
+        """提交已编码的数据（如缓存的纯色片段），只做写入"""
+        return self._submit(group, write_buffer, output_path, buffer)
+
+    def _submit(self, group, func, *args):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        with self.lock:
+            self.groups[group].append(future)
+        return future
+
+    def flush(self, group=None):
+        """等待该组图片全部写完，有写入失败时抛出第一个异常"""
+        with self.lock:
+            futures = self.groups.pop(group, [])
+        _raise_first_error(futures)
+
+    def wait(self):
+        """等待已提交的图片全部写完，有写入失败时抛出第一个异常"""
+        with self.lock:
+            futures = [future for group in self.groups.values() for future in group]
+            self.groups.clear()
+        _raise_first_error(futures)
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # 已有异常时不再抛出写入错误，避免覆盖原异常
+            self.executor.shutdown(wait=True)
+        return False
+
+
+def _raise_first_error(futures):
+    error = None
+    for future in futures:
+        exception = future.exception()
+        if exception is not None and error is None:
+            error = exception
+    if error is not None:
+        raise error
@@ -1,9 +1,29 @@
+import logging
 import os
+from pathlib import Path
+
 import cv2
 import numpy as np
 
-from config import img_folder_path, img_width, img_height
-from file.file_utils import get_non_hidden_files_pathlib
+from config import img_folder_path, img_width, img_height, output_profiles
+from file.file_utils import get_non_hidden_files_pathlib, read_chinese_path_image, cv2_imwrite_chinese, print_log, \
+    silent_log, is_heic_path
+from file.image_encoding import with_profile_suffix
+from img.qr_backends import get_qr_backend, default_backend_name
+from img.qr_cache import get_qr_cache
+from metrics import timer, count
+
+
+# 二维码检测参数，修改后缓存的检测结果自动失效
+QR_DETECT_PARAMS = {
+    'version': 1,
+    'clahe_clip_limit': 2.0,
+    'clahe_tile_grid': 8,
+    'blur_ksize': 3,
+    'expand': 5,
+    'backend': default_backend_name(),
+    'opencv': cv2.__version__,
+}
 
 
 def preprocess_image(img_cv):
@@ -12,11 +32,13 @@ def preprocess_image(img_cv):
     gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
 
     # 对比度增强
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    grid = QR_DETECT_PARAMS['clahe_tile_grid']
+    clahe = cv2.createCLAHE(clipLimit=QR_DETECT_PARAMS['clahe_clip_limit'], tileGridSize=(grid, grid))
     enhanced = clahe.apply(gray)
 
     # 高斯模糊去除噪声
-    blurred = cv2.GaussianBlur(enhanced, (3, 3), 0)
+    ksize = QR_DETECT_PARAMS['blur_ksize']
+    blurred = cv2.GaussianBlur(enhanced, (ksize, ksize), 0)
 
     # 自适应阈值处理
     _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -24,16 +46,17 @@ def preprocess_image(img_cv):
     return thresh
 
 
-def blur_qrcode_opencv(img_cv):
-    """使用OpenCV识别并模糊图片中的二维码，增加预处理步骤提高识别率"""
-    # 创建原始图像的副本用于最终处理
-    img_copy = img_cv.copy()
+def detect_qr_codes(img_cv, log=print_log, backend=None):
+    """
+    依次用原图、预处理图、灰度图检测二维码，返回第一次检测到的结果 [QrCode, ...]（含内容与顶点），未检测到返回空列表
 
-    # 对图像进行预处理以提高识别率
-    processed = preprocess_image(img_cv)
+    backend 为检测后端名称（见 img/qr_backends.py），未指定时使用 QR_DETECT_PARAMS 中的后端
+    """
+    detector = get_qr_backend(backend or QR_DETECT_PARAMS['backend'])
 
-    # 初始化QR码检测器
-    qr_detector = cv2.QRCodeDetector()
+    # 对图像进行预处理以提高识别率
+    with timer('img.qr_preprocess'):
+        processed = preprocess_image(img_cv)
 
     # 尝试多种方式检测二维码
     detection_methods = [
@@ -44,118 +67,219 @@ def blur_qrcode_opencv(img_cv):
         # 检测原始图像的灰度版本
         (cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY), "灰度图像")
     ]
+    # 只接受灰度图的后端内部会转灰度，彩色原图这一轮与灰度图重复
+    if not detector.accepts_color:
+        detection_methods = detection_methods[1:]
 
     for img, method in detection_methods:
-        retval, _, points, _ = qr_detector.detectAndDecodeMulti(img)
-
-        if retval:
-            print(f"使用{method}成功识别到二维码")
-            # 转换为整数坐标
-            points = np.int32(points)
-
-            # 对每个检测到的二维码进行处理
-            for qr_points in points:
-                # 计算二维码边界框
-                x_min, y_min = np.min(qr_points, axis=0)
-                x_max, y_max = np.max(qr_points, axis=0)
-
-                # 稍微扩大边界框，确保完全覆盖二维码
-                expand = 5
-                x_min = max(0, x_min - expand)
-                y_min = max(0, y_min - expand)
-                x_max = min(img_cv.shape[1] - 1, x_max + expand)
-                y_max = min(img_cv.shape[0] - 1, y_max + expand)
-
-                # 提取二维码区域
-                qr_roi = img_copy[y_min:y_max + 1, x_min:x_max + 1]
-
-                # 应用更强的高斯模糊
-                blurred_roi = cv2.GaussianBlur(qr_roi, (31, 31), 0)
-
-                # 将模糊后的区域放回原图
-                img_copy[y_min:y_max + 1, x_min:x_max + 1] = blurred_roi
+        with timer('img.qr_detect'):
+            codes = detector.detect(img)
+        count('img.qr_detect_passes')
+
+        if codes:
+            log(f"使用{method}成功识别到二维码", logging.DEBUG)
+            count('img.qr_found', len(codes))
+            return codes
+
+    # 如果所有方法都无法识别，提示
+    log("未检测到二维码", logging.DEBUG)
+    count('img.qr_missing')
+    return []
+
+
+def detect_qr_boxes(img_cv, log=print_log, backend=None):
+    """检测图片中的二维码，返回扩大后的边界框 [(x_min, y_min, x_max, y_max), ...]，未检测到返回空列表"""
+    boxes = []
+    for code in detect_qr_codes(img_cv, log=log, backend=backend):
+        # 计算二维码边界框
+        x_min, y_min, x_max, y_max = code.bounding_box()
+
+        # 稍微扩大边界框，确保完全覆盖二维码
+        expand = QR_DETECT_PARAMS['expand']
+        boxes.append((int(max(0, x_min - expand)), int(max(0, y_min - expand)),
+                      int(min(img_cv.shape[1] - 1, x_max + expand)),
+                      int(min(img_cv.shape[0] - 1, y_max + expand))))
+    return boxes
+
+
+def blur_regions(img_cv, boxes):
+    """返回模糊了指定区域的图片副本"""
+    img_copy = img_cv.copy()
+    for x_min, y_min, x_max, y_max in boxes:
+        # 提取二维码区域
+        qr_roi = img_copy[y_min:y_max + 1, x_min:x_max + 1]
 
-            return img_copy
+        # 应用更强的高斯模糊
+        with timer('img.qr_blur'):
+            blurred_roi = cv2.GaussianBlur(qr_roi, (31, 31), 0)
 
-    # 如果所有方法都无法识别，返回原图并提示
-    print("未检测到二维码")
+        # 将模糊后的区域放回原图
+        img_copy[y_min:y_max + 1, x_min:x_max + 1] = blurred_roi
     return img_copy
 
 
-def resize_image(input_path, output_path):
-    """先处理二维码，再根据长宽比旋转（长度>宽度时旋转90度），最后调整图片大小"""
+def verify_qr_boxes(img_cv, boxes):
+    """
+    在缓存的区域附近重新检测二维码（只检测局部，远快于整图检测）
+
+    全部区域都检测到时返回按本图重新计算的边界框，否则返回None
+    """
+    height, width = img_cv.shape[:2]
+    verified = []
+    for x_min, y_min, x_max, y_max in boxes:
+        # 四周留出与区域等大的余量，容忍近似图片中二维码的少量位移
+        margin_x, margin_y = x_max - x_min + 1, y_max - y_min + 1
+        left, top = max(0, x_min - margin_x), max(0, y_min - margin_y)
+        roi = img_cv[top:min(height, y_max + margin_y + 1), left:min(width, x_max + margin_x + 1)]
+        with timer('img.qr_verify'):
+            found = detect_qr_boxes(roi, log=silent_log)
+        if not found:
+            return None
+        verified.extend((x1 + left, y1 + top, x2 + left, y2 + top) for x1, y1, x2, y2 in found)
+    return verified
+
+
+def blur_qrcode_opencv(img_cv, log=print_log, use_cache=True):
+    """
+    使用OpenCV识别并模糊图片中的二维码，增加预处理步骤提高识别率
+
+    先查二维码区域缓存（img/qr_cache.py）：像素内容相同的图片直接使用缓存的区域；
+    感知哈希相近（含哈希相同）的图片只在缓存的区域内复核，复核不通过或缓存记录为无二维码时仍做整图检测
+    """
+    cache = get_qr_cache(QR_DETECT_PARAMS) if use_cache else None
+    boxes = None
+    if cache is not None:
+        key = cache.key(img_cv)
+        cached = cache.get(key)
+        if cached is not None:
+            cached_boxes, exact = cached
+            if exact:
+                boxes = cached_boxes
+                log(f"使用缓存的二维码区域（{len(boxes)}个）", logging.DEBUG)
+            elif cached_boxes:
+                boxes = verify_qr_boxes(img_cv, cached_boxes)
+                if boxes is not None:
+                    log(f"近似图片，复核缓存的二维码区域（{len(boxes)}个）", logging.DEBUG)
+                    cache.put(key, boxes)
+
+    if boxes is None:
+        boxes = detect_qr_boxes(img_cv, log=log)
+        if cache is not None:
+            cache.put(key, boxes)
+
+    return blur_regions(img_cv, boxes)
+
+
+def read_source_image(input_path):
+    """
+    读取待缩放的原图：HEIC/HEIF 直接解码为数组（需要 pillow_heif），不再先转成中间JPG；其它格式用OpenCV读取
+
+    读取失败返回None
+    """
+    if not is_heic_path(input_path):
+        # 使用OpenCV读取图片（兼容中文路径）
+        return read_chinese_path_image(input_path)
+    from img.image_heic_jpg import read_heic_image
+    return read_heic_image(input_path)
+
+
+def resize_image(input_path, output_path, width=img_width, height=img_height, log=print_log,
+                 profile=output_profiles['scale']):
+    """
+    先处理二维码，再根据长宽比旋转（长度>宽度时旋转90度），最后调整图片大小
+
+    输入可以是HEIC/HEIF（iPhone照片），解码一次后直接模糊、缩放、编码输出
+    profile 为输出编码方案（见 file/image_encoding.py），None 时按 output_path 扩展名选择
+    """
+    target_width, target_height = width, height
     try:
-        # 使用OpenCV读取图片
-        img_cv = cv2.imread(input_path)
+        img_cv = read_source_image(input_path)
         if img_cv is None:
-            print(f"无法读取图片: {input_path}")
+            log(f"无法读取图片: {input_path}", logging.ERROR)
             return False
 
         # 先识别并模糊原始图片中的二维码
-        img_with_blur = blur_qrcode_opencv(img_cv)
+        img_with_blur = blur_qrcode_opencv(img_cv, log=log)
 
         # 获取处理后的图片的宽和高
         height, width = img_with_blur.shape[:2]
 
-        # 如果长度（高度）小于宽度，则旋转90度
-        rotated = False
+        # 如果高度小于宽度，则旋转90度
         if height < width:
-            print(f"图片长度({height})大于宽度({width})，旋转90度")
+            log(f"图片高度({height})小于宽度({width})，旋转90度", logging.DEBUG)
             # 旋转90度（顺时针）
             img_with_blur = cv2.rotate(img_with_blur, cv2.ROTATE_90_CLOCKWISE)
             # 更新旋转后的尺寸
             height, width = img_with_blur.shape[:2]
-            rotated = True
 
         # 检查是否已经是目标尺寸
-        if width == img_width and height == img_height:
-            cv2.imwrite(output_path, img_with_blur)
-            return True
+        if width == target_width and height == target_height:
+            return cv2_imwrite_chinese(output_path, img_with_blur, profile)
 
         # 计算缩放系数
-        scale = min(img_width / width, img_height / height)
+        scale = min(target_width / width, target_height / height)
 
         # 计算缩放后的尺寸
         new_width = int(width * scale)
         new_height = int(height * scale)
 
         # 缩放图片
-        resized_img = cv2.resize(img_with_blur, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
+        with timer('img.resize'):
+            resized_img = cv2.resize(img_with_blur, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
 
         # 创建指定尺寸的白色背景图片
-        new_img = np.ones((img_height, img_width, 3), dtype=np.uint8) * 255
+        new_img = np.ones((target_height, target_width, 3), dtype=np.uint8) * 255
 
         # 计算粘贴位置（居中放置）
-        paste_x = (img_width - new_width) // 2
-        paste_y = (img_height - new_height) // 2
+        paste_x = (target_width - new_width) // 2
+        paste_y = (target_height - new_height) // 2
 
         # 将缩放后的图片粘贴到白色背景上
         new_img[paste_y:paste_y + new_height, paste_x:paste_x + new_width] = resized_img
 
         # 保存结果图片
-        cv2.imwrite(output_path, new_img)
-
-        return True
+        return cv2_imwrite_chinese(output_path, new_img, profile)
 
     except Exception as e:
-        print(f"处理图片时出错: {str(e)}")
+        log(f"处理图片时出错: {str(e)}", logging.ERROR)
         return False
 
 
-def get_file_new_path(path):
+def get_file_new_path(path, width=img_width, height=img_height, output_dir=None, profile=output_profiles['scale']):
+    """
+    生成缩放后的文件路径：去掉"扫描全能王 "前缀并添加 _宽x高 后缀，默认与原文件同目录
+
+    指定了编码方案时扩展名改为方案对应的格式；HEIC/HEIF 原图未指定方案时输出为jpg
+    """
     # 提取文件所在的目录路径
-    file_directory = os.path.dirname(path)
+    file_directory = output_dir if output_dir else os.path.dirname(path)
 
     # 提取文件名（包含扩展名）
     file_name = os.path.basename(path)
 
     # 提取文件名（不包含扩展名）和扩展名
     file_name_without_ext, file_extension = os.path.splitext(file_name)
+    # OpenCV不能编码HEIC
+    if is_heic_path(file_name) and not profile:
+        file_extension = '.jpg'
+
+    new_path = os.path.join(
+        file_directory,
+        f"{file_name_without_ext.replace('扫描全能王 ', '')}_{width}x{height}{file_extension}"
+    )
+
+    return with_profile_suffix(new_path, profile)
+
+
+def is_scaled_file(path, width=img_width, height=img_height):
+    """文件名中已包含 _宽x高 后缀的文件视为已处理"""
+    return f'_{width}x{height}' in os.path.basename(path)
 
-    new_path = os.path.join(file_directory,
-                            file_name_without_ext.replace('扫描全能王 ', '') + '_1024x1024' + file_extension)
 
-    return new_path
+def get_scale_files(directory):
+    """获取需要缩放的图片：排除得力xq详情图及其切分结果（xq_01.png等，由切分工具处理）"""
+    return [item for item in get_non_hidden_files_pathlib(directory)
+            if not Path(item).name.startswith('xq')]
 
 
 if __name__ == "__main__":
@@ -171,7 +295,7 @@ if __name__ == "__main__":
         for file_path in file_cache:
             try:
                 print('=======开始=======\r\n', file_path)
-                if '_800x800' in file_path:
+                if is_scaled_file(file_path):
                     print('文件名忽略')
                     continue
 
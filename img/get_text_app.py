@@ -1,90 +1,156 @@
 import os
+import queue
 import sys
+import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
 from pathlib import Path
-import easyocr
 import cv2
 import time
 import numpy as np
 
+from config import easyocr_model_path, ocr_gui_workers, ocr_adaptive_sizing, ocr_probe_canvas, ocr_min_char_height, \
+    ocr_cascade, ocr_onnx_threads
+from file.file_utils import get_non_hidden_files_pathlib
+from img.ocr_cascade import cascade_readtext
+from img.ocr_layout import layout_blocks
+from img.ocr_runtime import create_reader
+from img.ocr_sizing import DEFAULT_CANVAS_SIZE, DEFAULT_MAG_RATIO, box_bounds, plan_sizing, offset_results
+from metrics import timer, count
+from model_runtime import configure_threads, thread_budget
+from ui.job_dispatcher import get_dispatcher
+
+# 支持的图片格式
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
+
+
+def create_easyocr_reader(model_dir=easyocr_model_path, runtime=None, threads=None):
+    """
+    创建 EasyOCR 阅读器（中文简体 + 英文，加载失败时抛出异常，命令行与界面共用），runtime 见 img/ocr_runtime.py，
+    threads 为 onnx 运行时的推理线程数
+    """
+    return create_reader(model_dir=model_dir, runtime=runtime, threads=threads)
+
 
 # 初始化 EasyOCR 阅读器（提前加载，避免重复初始化）
 def init_easyocr_reader():
     """初始化 EasyOCR 阅读器，复用你提供的配置"""
     try:
-        reader = easyocr.Reader(
-            ['ch_sim', 'en'],  # 中文简体 + 英文
-            model_storage_directory='/Users/tyrtao/AI/文字识别/easyOCR',
-            download_enabled=False,
-            gpu=False
-        )
-        return reader
+        return create_easyocr_reader()
     except Exception as e:
         messagebox.showerror("初始化失败", f"EasyOCR 模型加载出错：{str(e)}")
         return None
 
 
+def _set_status(status_label, text):
+    """更新状态：status_label 为标签或回调函数（后台线程中使用），命令行下（None）直接打印"""
+    if status_label is None:
+        print(text)
+    elif callable(status_label):
+        status_label(text)
+    else:
+        status_label.config(text=text)
+
+
+# 完整识别的参数（canvas_size、mag_ratio 为固定参数，自适应时按探测结果替换）
+READTEXT_PARAMS = dict(
+    detail=1,  # 保留置信度等细节（必须）
+    paragraph=False,  # 不合并为段落，保留单字/短句（避免漏检）
+    min_size=5,  # 最小检测文字尺寸（默认20，降低后识别更小文字）
+    contrast_ths=0.1,  # 对比度阈值（默认0.1，更低值适配低对比度文字）
+    adjust_contrast=0.5,  # 自动增强对比度（0-1，提升模糊/淡色文字辨识度）
+    text_threshold=0.4,  # 文字区域判定阈值（默认0.7，降低后检测更多候选区域）
+    low_text=0.2,  # 低置信度文字阈值（默认0.4，更低值保留更多候选）
+    link_threshold=0.4,  # 文字行连接阈值（默认0.4，微调适配断行文字）
+    canvas_size=DEFAULT_CANVAS_SIZE,  # 图像预处理画布尺寸（更大尺寸保留更多细节）
+    mag_ratio=DEFAULT_MAG_RATIO,  # 放大比例（1.0-2.0，放大小文字）
+    slope_ths=0.2,  # 文字行倾斜阈值（适配倾斜文字）
+    ycenter_ths=0.5,  # 行内文字垂直对齐阈值（适配不规则排版）
+    height_ths=0.5,  # 行高差异阈值（适配不同字号混排）
+    width_ths=0.5,  # 字间距阈值（适配稀疏文字）
+    add_margin=0.1,  # 文字区域边缘扩展（避免截断文字）
+    threshold=0.3,  # 二值化阈值（更低值保留更多灰度细节）
+    bbox_min_score=0.2,  # 检测框最小置信度（保留更多候选框）
+    bbox_min_size=10,  # 检测框最小尺寸（识别更小文字）
+)
+# 探测时沿用的检测参数；不加边缘扩展，框高即字高
+PROBE_PARAMS = {name: READTEXT_PARAMS[name] for name in (
+    'min_size', 'text_threshold', 'low_text', 'link_threshold', 'slope_ths', 'ycenter_ths', 'height_ths',
+    'width_ths', 'threshold', 'bbox_min_score', 'bbox_min_size')}
+
+
+def probe_text_sizing(reader, img_gray):
+    """低分辨率快速检测，返回完整识别的裁剪区域与缩放参数（见 img/ocr_sizing.py），未检测到文字时返回None"""
+    with timer('ocr.probe'):
+        horizontal_list, free_list = reader.detect(img_gray, canvas_size=ocr_probe_canvas, mag_ratio=1.0,
+                                                   add_margin=0, **PROBE_PARAMS)
+    # 每张图片一组结果
+    sizing = plan_sizing(img_gray.shape, box_bounds(horizontal_list[0], free_list[0]), ocr_min_char_height,
+                         READTEXT_PARAMS['canvas_size'], READTEXT_PARAMS['mag_ratio'])
+    count('ocr.probe_fallback' if sizing is None else 'ocr.probe_sized')
+    return sizing
+
+
+def full_readtext(reader, img_gray, adaptive=None):
+    """
+    完整检测+识别；adaptive 为None时按 config.ocr_adaptive_sizing 决定是否自适应输入尺寸：
+    先低分辨率探测文字大小与位置，确定裁剪区域与检测缩放比例，未探测到文字时按固定参数整图识别
+    """
+    sizing = probe_text_sizing(reader, img_gray) if (ocr_adaptive_sizing if adaptive is None else adaptive) else None
+    params = dict(READTEXT_PARAMS)
+    x_min = y_min = 0
+    if sizing is not None:
+        x_min, y_min, x_max, y_max = sizing.crop
+        img_gray = img_gray[y_min:y_max, x_min:x_max]
+        params.update(canvas_size=sizing.canvas_size, mag_ratio=sizing.mag_ratio)
+
+    with timer('ocr.readtext'):
+        ocr_result = reader.readtext(img_gray, **params)
+    return offset_results(ocr_result, x_min, y_min)
+
+
 # 核心识别函数（复用你的优化逻辑）
-def recognize_image_text(image_path, reader, status_label):
-    """识别单张图片文字，返回结果列表"""
+def recognize_image_text(image_path, reader, status_label=None, adaptive=None, cascade=None):
+    """
+    识别单张图片文字，返回结果列表
+
+    adaptive：是否自适应输入尺寸（见 full_readtext），cascade：是否两级识别（见 img/ocr_cascade.py），
+    为None时按 config.ocr_adaptive_sizing / config.ocr_cascade['image']
+    """
     if not os.path.exists(image_path):
-        status_label.config(text="错误：文件不存在")
+        _set_status(status_label, "错误：文件不存在")
         return []
 
-    # 支持的图片格式
-    supported_formats = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif')
-    if not image_path.lower().endswith(supported_formats):
-        status_label.config(text="错误：仅支持图片格式（jpg/png/bmp等）")
+    if not image_path.lower().endswith(SUPPORTED_FORMATS):
+        _set_status(status_label, "错误：仅支持图片格式（jpg/png/bmp等）")
         return []
 
     try:
-        status_label.config(text="正在读取图片...")
+        _set_status(status_label, "正在读取图片...")
         # 读取图片（兼容中文路径）
         img = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_COLOR)
         if img is None:
-            status_label.config(text="错误：图片读取失败")
+            _set_status(status_label, "错误：图片读取失败")
             return []
 
-        # # 优化：压缩图片
-        # max_size = 640
-        # h, w = img.shape[:2]
-        # if max(h, w) > max_size:
-        #     scale = max_size / max(h, w)
-        #     img = cv2.resize(img, (int(w * scale), int(h * scale)))
-
         # 转为灰度图
         img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        status_label.config(text="正在识别文字...")
+        _set_status(status_label, "正在识别文字...")
         start_time = time.time()
 
-        # 执行识别
-        ocr_result = reader.readtext(
-            img_gray,
-            detail=1,  # 保留置信度等细节（必须）
-            paragraph=False,  # 不合并为段落，保留单字/短句（避免漏检）
-            min_size=5,  # 最小检测文字尺寸（默认20，降低后识别更小文字）
-            contrast_ths=0.1,  # 对比度阈值（默认0.1，更低值适配低对比度文字）
-            adjust_contrast=0.5,  # 自动增强对比度（0-1，提升模糊/淡色文字辨识度）
-            text_threshold=0.4,  # 文字区域判定阈值（默认0.7，降低后检测更多候选区域）
-            low_text=0.2,  # 低置信度文字阈值（默认0.4，更低值保留更多候选）
-            link_threshold=0.4,  # 文字行连接阈值（默认0.4，微调适配断行文字）
-            canvas_size=1280,  # 图像预处理画布尺寸（更大尺寸保留更多细节）
-            mag_ratio=1.5,  # 放大比例（1.0-2.0，放大小文字）
-            slope_ths=0.2,  # 文字行倾斜阈值（适配倾斜文字）
-            ycenter_ths=0.5,  # 行内文字垂直对齐阈值（适配不规则排版）
-            height_ths=0.5,  # 行高差异阈值（适配不同字号混排）
-            width_ths=0.5,  # 字间距阈值（适配稀疏文字）
-            add_margin=0.1,  # 文字区域边缘扩展（避免截断文字）
-            threshold=0.3,  # 二值化阈值（更低值保留更多灰度细节）
-            bbox_min_score=0.2,  # 检测框最小置信度（保留更多候选框）
-            bbox_min_size=10,  # 检测框最小尺寸（识别更小文字）
-        )
+        # 执行识别：两级识别只识别候选文字区域，没有候选区域时完整检测
+        if ocr_cascade['image'] if cascade is None else cascade:
+            ocr_result = cascade_readtext(
+                reader, img_gray, fallback=lambda: full_readtext(reader, img_gray, adaptive),
+                contrast_ths=READTEXT_PARAMS['contrast_ths'], adjust_contrast=READTEXT_PARAMS['adjust_contrast'])
+        else:
+            ocr_result = full_readtext(reader, img_gray, adaptive)
+        count('ocr.text_blocks', len(ocr_result))
 
         return ocr_result
     except Exception as e:
-        status_label.config(text=f"识别出错：{str(e)}")
+        _set_status(status_label, f"识别出错：{str(e)}")
         return None
 
 
@@ -103,61 +169,51 @@ def group_ocr_by_lines(ocr_result, line_threshold=10):
     if not ocr_result:
         return []
 
-    # 1. 按顶部纵坐标（bbox的第一个点的y值）排序，确保从上到下处理
-    # 修复：从bbox中提取top坐标（y1），而非字典key
-    sorted_blocks = sorted(ocr_result, key=lambda x: x[0][0][1])
-
-    # 2. 按行分组
-    lines = []
-    current_line = [sorted_blocks[0]]  # 初始化第一行
-
-    for block in sorted_blocks[1:]:
-        # 计算当前块与当前行第一个块的top差值（y1）
-        current_top = current_line[0][0][0][1]
-        block_top = block[0][0][1]
-        top_diff = abs(block_top - current_top)
-        if top_diff <= line_threshold:
-            # 位置相近，加入当前行
-            current_line.append(block)
-        else:
-            # 位置较远，当前行结束，新建一行
-            lines.append(current_line)
-            current_line = [block]
-    # 把最后一行加入结果
-    lines.append(current_line)
-
-    # 3. 每行内按left坐标（x1）排序，拼接文本
-    final_lines = []
-    for line in lines:
-        # 按左侧横坐标（bbox第一个点的x值）排序，保证文字顺序正确
-        sorted_line = sorted(line, key=lambda x: x[0][0][0])
-        # 拼接该行的所有文本
-        line_text = '   '.join([block[1] for block in sorted_line])
-        final_lines.append(line_text)
-
-    return final_lines
+    # 与当前行第一个文字块的top差值不超过阈值的归为同一行，行内按left坐标排序后拼接（见 img/ocr_layout.py）
+    return layout_blocks(ocr_result, threshold=line_threshold, mode='anchor').lines('   ')
 
 
 # TK 主界面类
 class EasyOCRGUI:
+    """
+    图片文字识别窗口
+
+    - 模型在后台线程加载，窗口立即显示，加载完成前“开始识别”不可用
+    - 可选择多张图片或整个文件夹，加入识别队列后由后台线程逐张识别（线程数见 config.ocr_gui_workers）
+    - 每张图片识别完成后结果立即追加到结果框；取消时清空队列，正在识别的图片完成后停止
+    """
+
     def __init__(self, root):
         self.root = root
         self.root.title("EasyOCR 图片文字识别工具")
         self.root.geometry("800x600")  # 初始窗口大小
         self.root.resizable(True, True)
 
-        # 初始化 EasyOCR 阅读器
-        self.reader = init_easyocr_reader()
-        if self.reader is None:
-            root.quit()
-            return
-
-        # 选中的文件路径
+        self.reader = None
+        # 选中的文件或文件夹（多选时输入框只显示摘要，实际路径保存在 selected_paths）
         self.selected_file = tk.StringVar()
+        self.selected_paths = []
+
+        # 识别队列：待识别的图片路径，工作线程取完即退出
+        self.jobs = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.active_workers = 0
+        self.total_files = 0
+        self.done_files = 0
 
         # 构建界面
         self._create_widgets()
 
+        # 状态提示统一交给主窗口的调度器刷新
+        self.dispatcher = get_dispatcher(root)
+        self.channel = self.dispatcher.register(root, on_progress=self._set_status)
+
+        # 后台加载 EasyOCR 阅读器，不阻塞窗口显示
+        self.recognize_btn.config(state=tk.DISABLED)
+        self.status_label.config(text="正在加载 EasyOCR 模型...")
+        self.dispatcher.submit(self._load_reader)
+
     def _create_widgets(self):
         """创建界面组件，确保“开始识别”按钮可见"""
         # 1. 顶部文件选择区域
@@ -169,8 +225,9 @@ class EasyOCRGUI:
         entry = ttk.Entry(frame_file, textvariable=self.selected_file, width=40)
         entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
 
-        # 浏览按钮
+        # 浏览按钮：可多选图片，或选择整个文件夹
         ttk.Button(frame_file, text="浏览", command=self._browse_file).pack(side=tk.LEFT, padx=5)
+        ttk.Button(frame_file, text="文件夹", command=self._browse_folder).pack(side=tk.LEFT, padx=5)
         # 开始识别按钮：显式设置宽度+确保pack顺序，保证可见
         self.recognize_btn = ttk.Button(
             frame_file,
@@ -179,7 +236,8 @@ class EasyOCRGUI:
             width=10  # 固定宽度，避免被挤压
         )
         self.recognize_btn.pack(side=tk.LEFT, padx=5)
-        self.recognize_btn.config(state=tk.NORMAL)  # 确保按钮可用且可见
+        self.cancel_btn = ttk.Button(frame_file, text="取消", command=self._cancel_recognize, state=tk.DISABLED)
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
 
         # 2. 状态提示标签
         self.status_label = ttk.Label(self.root, text="就绪 - 请选择图片并点击识别", foreground="blue")
@@ -200,45 +258,169 @@ class EasyOCRGUI:
         ttk.Button(frame_oper, text="清空结果", command=self._clear_result).pack(side=tk.LEFT, padx=5)
         ttk.Button(frame_oper, text="保存结果", command=self._save_result).pack(side=tk.LEFT, padx=5)
 
+    def _set_status(self, value, message):
+        self.status_label.config(text=message)
+
+    def _load_reader(self):
+        """后台线程：加载模型，完成后回到主线程启用识别按钮"""
+        # 多个识别线程共用一个模型同时推理，平分本进程的线程预算（不改变进程预算，重复打开窗口不会越分越少）
+        configure_threads(thread_budget(), parallel=ocr_gui_workers)
+        try:
+            reader = create_easyocr_reader(threads=ocr_onnx_threads or thread_budget(ocr_gui_workers))
+        except Exception as e:
+            self.dispatcher.call(self._on_reader_failed, str(e))
+            return
+        self.dispatcher.call(self._on_reader_loaded, reader)
+
+    def _on_reader_loaded(self, reader):
+        self.reader = reader
+        self.recognize_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="就绪 - 请选择图片并点击识别")
+
+    def _on_reader_failed(self, error):
+        messagebox.showerror("初始化失败", f"EasyOCR 模型加载出错：{error}")
+        # 只关闭本窗口，不能退出共享的主事件循环
+        self.root.destroy()
+
     def _browse_file(self):
-        """打开文件选择对话框"""
-        file_path = filedialog.askopenfilename(
+        """打开文件选择对话框（可多选）"""
+        file_paths = filedialog.askopenfilenames(
             title="选择图片文件",
             filetypes=[
                 ("图片文件", "*.jpg *.jpeg *.png *.bmp *.tiff *.gif"),
                 ("所有文件", "*.*")
             ]
         )
-        if file_path:
-            self.selected_file.set(file_path)
-            self.status_label.config(text="已选择文件：" + os.path.basename(file_path))
+        if file_paths:
+            self._set_selection(list(file_paths))
+
+    def _browse_folder(self):
+        """选择文件夹，识别其中（含子目录）的全部图片"""
+        directory = filedialog.askdirectory(title="选择图片文件夹")
+        if directory:
+            self.selected_paths = [directory]
+            self.selected_file.set(directory)
+            self.status_label.config(text="已选择文件夹：" + os.path.basename(directory))
+
+    def _set_selection(self, file_paths):
+        self.selected_paths = file_paths
+        if len(file_paths) == 1:
+            self.selected_file.set(file_paths[0])
+            self.status_label.config(text="已选择文件：" + os.path.basename(file_paths[0]))
+        else:
+            self.selected_file.set(f"已选择 {len(file_paths)} 张图片")
+            self.status_label.config(text=f"已选择 {len(file_paths)} 张图片")
+
+    def _collect_images(self):
+        """展开选择的文件与文件夹，返回图片路径列表"""
+        entry_value = self.selected_file.get().strip()
+        # 手动输入的路径优先于多选摘要
+        paths = self.selected_paths if len(self.selected_paths) > 1 else [entry_value] if entry_value else []
+        images = []
+        for path in paths:
+            if os.path.isdir(path):
+                images.extend(item for item in get_non_hidden_files_pathlib(path)
+                              if item.lower().endswith(SUPPORTED_FORMATS))
+            else:
+                images.append(path)
+        return images
 
     def _start_recognize(self):
-        """开始识别图片文字（修复结果处理逻辑+确保按钮交互正常）"""
-        file_path = self.selected_file.get().strip()
-        if not file_path:
+        """把选择的图片加入识别队列，识别在后台线程中进行，已在识别时追加到队列末尾"""
+        if self.reader is None:
+            return
+        try:
+            images = self._collect_images()
+        except ValueError as e:
+            messagebox.showwarning("提示", str(e))
+            return
+        if not images:
             messagebox.showwarning("提示", "请先选择要识别的图片文件！")
             return
 
-        # 清空原有结果
-        self.result_text.delete(1.0, tk.END)
-        self.status_label.config(text="正在识别，请稍候...")
-        self.root.update()  # 立即更新UI，避免卡顿
-
-        # 执行识别
-        results = recognize_image_text(file_path, self.reader, self.status_label)
-
-        # 显示结果（修复：调用分组函数并输出结果）
-        if results and len(results) > 0:
-            # 按行分组
-            line_texts = group_ocr_by_lines(results, line_threshold=10)
+        with self.lock:
+            idle = self.active_workers == 0
+            if self.cancel_event.is_set() and not idle:
+                messagebox.showinfo("提示", "正在取消，请等待当前图片识别完成后再开始")
+                return
+            if idle:
+                # 新一轮识别：清空原有结果与计数
+                self.result_text.delete(1.0, tk.END)
+                self.cancel_event.clear()
+                self.total_files = self.done_files = 0
+            self.total_files += len(images)
+            for image_path in images:
+                self.jobs.put(image_path)
+            # 按需补足工作线程
+            workers = max(0, min(ocr_gui_workers, self.total_files - self.done_files) - self.active_workers)
+            self.active_workers += workers
+        for _ in range(workers):
+            self.dispatcher.submit(self._worker)
+
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.status_label.config(text=f"正在识别，共 {self.total_files} 张图片，请稍候...")
+
+    def _cancel_recognize(self):
+        """取消识别：清空队列，正在识别的图片完成后停止"""
+        with self.lock:
+            self.cancel_event.set()
+            dropped = self.jobs.qsize()
+            while not self.jobs.empty():
+                self.jobs.get_nowait()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.status_label.config(text=f"正在取消，已移出队列 {dropped} 张图片，等待当前图片识别完成...")
+
+    def _worker(self):
+        """后台线程：逐张识别队列中的图片，结果通过调度器回到主线程显示"""
+        while True:
+            # 入队与退出判断都在锁内，避免刚入队的图片无人处理
+            with self.lock:
+                if self.cancel_event.is_set() or self.jobs.empty():
+                    self.active_workers -= 1
+                    finished = self.active_workers == 0
+                    break
+                image_path = self.jobs.get_nowait()
+            name = os.path.basename(image_path)
+            self.dispatcher.progress(self.channel, None, f"正在识别：{name}")
+            results = recognize_image_text(
+                image_path, self.reader,
+                lambda text: self.dispatcher.progress(self.channel, None, f"{name}：{text}"))
+            line_texts = group_ocr_by_lines(results, line_threshold=10) if results else []
+            with self.lock:
+                self.done_files += 1
+                done, total = self.done_files, self.total_files
+            self.dispatcher.call(self._append_result, image_path, line_texts)
+            self.dispatcher.progress(self.channel, done, f"已识别 {done}/{total}：{name}")
+
+        if finished:
+            self.dispatcher.call(self._finish_recognize)
+
+    def _append_result(self, image_path, line_texts):
+        """主线程：追加一张图片的识别结果"""
+        if self.total_files > 1:
+            self.result_text.insert(tk.END, f"===== {os.path.basename(image_path)} =====\n")
+        if line_texts:
             # 将分行结果插入文本框
             for line in line_texts:
                 self.result_text.insert(tk.END, line + "\n")
-            self.status_label.config(text=f"识别完成！共识别 {len(line_texts)} 行文字")
         else:
-            self.result_text.insert(tk.END, "未识别到有效文字")
-            self.status_label.config(text="识别完成 - 未识别到有效文字")
+            self.result_text.insert(tk.END, "未识别到有效文字\n")
+        if self.total_files > 1:
+            self.result_text.insert(tk.END, "\n")
+        self.result_text.see(tk.END)
+
+    def _finish_recognize(self):
+        """主线程：全部工作线程结束"""
+        if self.active_workers:
+            # 结束前又开始了新一轮识别
+            return
+        self.cancel_btn.config(state=tk.DISABLED)
+        if self.cancel_event.is_set():
+            message = f"识别已取消，完成 {self.done_files}/{self.total_files} 张图片"
+        else:
+            message = f"识别完成！共识别 {self.done_files} 张图片"
+        # 在调度器本批次的进度更新之后显示
+        self.dispatcher.progress(self.channel, self.done_files, message)
 
     def _clear_result(self):
         """清空结果框"""
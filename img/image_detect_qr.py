@@ -1,66 +1,151 @@
 """
-通过图片检测二维码并显示
+通过图片检测二维码
+
+- detect_qr_in_image：检测单张图片并弹窗显示标注结果
+- audit_image / QrAuditReport：无界面批量审计（上传前检查商品图中残留的供应商二维码），
+  由命令行 python -m cli qr 并行调用，结果写入CSV或JSONL报告，可选输出标注缩略图
 """
-import os
-# 添加 zbar 库路径到环境变量
-os.environ["DYLD_LIBRARY_PATH"] = "/opt/homebrew/lib:" + os.environ.get("DYLD_LIBRARY_PATH", "")
+import csv
+import json
 
 import cv2
-from pyzbar.pyzbar import decode
 import numpy as np
 
+from config import qr_audit_thumbnail_size
+from file.file_utils import read_chinese_path_image, silent_log
+from file.image_encoding import write_image
+from img.ImageScale import detect_qr_codes
 
-def detect_qr_in_image(image_path):
-    # 读取图片
-    image = cv2.imread(image_path)
-    if image is None:
-        print(f"无法读取图片: {image_path}")
-        return
-
-    # 检测并解码二维码
-    qr_codes = decode(image)
-
-    if not qr_codes:
-        print("未检测到二维码")
-        # 显示原图
-        cv2.imshow("二维码检测结果", image)
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
-        return
 
-    # 处理每个检测到的二维码
-    for qr_code in qr_codes:
+def annotate_qr_codes(image, codes, scale=1.0):
+    """在图片上标注二维码：绿色边框 + 红色的类型与内容，scale 为图片相对检测时的缩放比例"""
+    for qr_code in codes:
         # 提取二维码边界框坐标
-        points = qr_code.polygon
+        points = qr_code.points
         if len(points) == 4:
             # 转换为整数坐标并绘制多边形边框（绿色）
-            pts = np.array([[p.x, p.y] for p in points], np.int32)
+            pts = np.array([(x * scale, y * scale) for x, y in points], np.int32)
             pts = pts.reshape((-1, 1, 2))
             cv2.polylines(image, [pts], True, (0, 255, 0), 2)
 
-        # 获取二维码内容并显示
-        qr_data = qr_code.data.decode('utf-8')  # 解码内容
-        qr_type = qr_code.type  # 二维码类型（如QRCODE）
+        left, top = qr_code.bounding_box()[:2]
         # 在图片上绘制文本（红色）
         cv2.putText(
             image,
-            f"{qr_type}: {qr_data}",
-            (qr_code.rect.left, qr_code.rect.top - 10),  # 文本位置（二维码上方）
+            f"{qr_code.type}: {qr_code.data}",
+            (int(left * scale), max(10, int(top * scale) - 10)),  # 文本位置（二维码上方）
             cv2.FONT_HERSHEY_SIMPLEX,
             0.5,  # 字体大小
             (0, 0, 255),  # 红色
             2  # 线条粗细
         )
+    return image
+
+
+def make_qr_thumbnail(image, codes, max_side=qr_audit_thumbnail_size):
+    """缩小到最长边不超过 max_side 后再标注，线条与文字不会随缩小变细"""
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    if scale < 1.0:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    else:
+        image = image.copy()
+    return annotate_qr_codes(image, codes, scale)
+
+
+def audit_image(image_path, thumbnail_path=None, backend=None, thumbnail_size=qr_audit_thumbnail_size):
+    """
+    检测一张图片中的二维码，返回 [{'data', 'type', 'points'}, ...]，读取失败时抛出 ValueError
+
+    指定 thumbnail_path 时，检测到二维码的图片输出标注缩略图
+    """
+    image = read_chinese_path_image(image_path)
+    if image is None:
+        raise ValueError(f"无法读取图片: {image_path}")
+
+    codes = detect_qr_codes(image, log=silent_log, backend=backend)
+    if codes and thumbnail_path:
+        write_image(thumbnail_path, make_qr_thumbnail(image, codes, thumbnail_size))
+    return [code.to_dict() for code in codes]
+
+
+class QrAuditReport:
+    """
+    二维码审计报告，按后缀选择格式，边处理边写入（几万张图片也不占内存）：
+    - .jsonl：每张图片一行 {"path", "codes": [{"data", "type", "points"}], "error"}
+    - 其余为CSV：每个二维码一行 path,payload,type,polygon,error（polygon 为顶点坐标的JSON）
+
+    默认只记录检测到二维码或读取失败的图片，include_clean=True 时也记录没有二维码的图片
+    """
+    CSV_FIELDS = ('path', 'payload', 'type', 'polygon', 'error')
+
+    def __init__(self, path, include_clean=False):
+        self.path = path
+        self.include_clean = include_clean
+        self.jsonl = path.lower().endswith('.jsonl')
+        # CSV带BOM，Excel打开中文路径不乱码
+        self.file = open(path, 'w', encoding='utf-8' if self.jsonl else 'utf-8-sig', newline='')
+        self.writer = None if self.jsonl else csv.writer(self.file)
+        if self.writer:
+            self.writer.writerow(self.CSV_FIELDS)
+        self.images_with_qr = 0
+        self.codes = 0
+        self.errors = 0
+
+    def add(self, image_path, codes, error=None):
+        if codes:
+            self.images_with_qr += 1
+            self.codes += len(codes)
+        if error:
+            self.errors += 1
+        if not codes and not error and not self.include_clean:
+            return
+
+        if self.jsonl:
+            record = {'path': image_path, 'codes': codes, 'error': error}
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif codes:
+            for code in codes:
+                self.writer.writerow((image_path, code['data'], code['type'],
+                                      json.dumps(code['points']), error or ''))
+        else:
+            self.writer.writerow((image_path, '', '', '', error or ''))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def detect_qr_in_image(image_path, backend=None):
+    """检测并弹窗显示标注结果，backend 为检测后端名称（见 img/qr_backends.py），未指定时使用 config.qr_backend"""
+    # 读取图片
+    image = read_chinese_path_image(image_path)
+    if image is None:
+        print(f"无法读取图片: {image_path}")
+        return
+
+    # 检测并解码二维码
+    qr_codes = detect_qr_codes(image, log=silent_log, backend=backend)
+
+    if not qr_codes:
+        print("未检测到二维码")
+    for qr_code in qr_codes:
         # 打印到控制台
-        print(f"检测到{qr_type}：{qr_data}")
+        print(f"检测到{qr_code.type}：{qr_code.data}")
 
     # 显示标注后的图片
-    cv2.imshow("二维码检测结果", image)
+    cv2.imshow("二维码检测结果", annotate_qr_codes(image, qr_codes))
     cv2.waitKey(0)  # 等待按键关闭窗口
     cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
-    # 替换为你的图片路径（支持.jpg/.png等格式）
+    # 替换为你的图片路径（支持.jpg/.png等格式）；批量审计目录请使用 python -m cli qr
     image_path = "/Users/tyrtao/QcHelper/电商/家庭清洁_纸品/驱蚊驱虫/灭鼠用品/粘鼠板/爱必达/20884/2025-11-1 10.37_1_1024x1024.JPG"
     detect_qr_in_image(image_path)
@@ -1,20 +1,80 @@
 """
 主要用于将iOS HEIC图片转换为jpg格式
+
+- 先按扩展名筛选，再检查文件头（ftyp 品牌），扩展名是 .heic 但内容实际是JPEG等格式的文件不送入转换
+- 通过 pillow_heif.register_heif_opener 让 Pillow 直接打开HEIC，解码结果直接交给JPEG编码，不再经 Image.frombytes 复制像素
+- 按EXIF方向摆正后保存（去掉方向标记），缩放时不需要再旋转
+- convert_heic_files 用多进程并行转换（命令行 python -m cli heic 使用同样的函数）
+- read_heic_image 直接解码为OpenCV数组，缩放流程（img/ImageScale.py）读取HEIC时使用，不生成中间JPG
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import cv2
 import numpy as np
 
 from config import img_folder_path
-from file.file_utils import get_non_hidden_files_pathlib
+from file.file_utils import get_non_hidden_files_pathlib, print_log, is_heic_path, is_heic_file
+from metrics import timed, timer
 
 from pathlib import Path
-from PIL import Image
+from PIL import Image, ImageOps
 import pillow_heif
 
+pillow_heif.register_heif_opener()
+
+def list_heic_files(directory, log=print_log):
+    """目录中扩展名为 .heic/.heif 且文件头确实是HEIF的文件，扩展名不符的文件直接跳过，不送入转换"""
+    files = []
+    for item in get_non_hidden_files_pathlib(directory):
+        if not is_heic_path(item):
+            continue
+        if is_heic_file(item):
+            files.append(item)
+        else:
+            log(f"扩展名为HEIC但内容不是HEIF格式，跳过: {item}")
+    return files
+
+
+# EXIF方向 -> 摆正所需的变换（与 PIL.ImageOps.exif_transpose 一致）
+_ORIENTATION_TRANSFORMS = {
+    2: lambda img: cv2.flip(img, 1),
+    3: lambda img: cv2.rotate(img, cv2.ROTATE_180),
+    4: lambda img: cv2.flip(img, 0),
+    5: lambda img: cv2.transpose(img),
+    6: lambda img: cv2.rotate(img, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda img: cv2.flip(cv2.transpose(img), -1),
+    8: lambda img: cv2.rotate(img, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
 
-def convert_heic_to_jpg(heic_path, jpg_path=None, quality=95):
+def _exif_orientation(exif_bytes):
+    if not exif_bytes:
+        return 1
+    exif = Image.Exif()
+    exif.load(exif_bytes)
+    return exif.get(0x0112, 1)
+
+
+def read_heic_image(heic_path):
+    """
+    解码HEIC为BGR数组（与 cv2.imdecode 结果相同的格式），按EXIF方向摆正，失败时抛出异常
+
+    bgr_mode 让 libheif 直接输出BGR，数组通过 pillow_heif 的数组接口引用解码缓冲区，不经过 PIL 复制
+    """
+    with timer('img.heic_decode'):
+        heif_file = pillow_heif.open_heif(heic_path, convert_hdr_to_8bit=True, bgr_mode=True)
+        img = np.asarray(heif_file)
+    if img.ndim == 3 and img.shape[2] == 4:
+        img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+    # 与 convert_heic_to_jpg 相同：pillow_heif 已应用容器中的旋转时EXIF方向为1，不会重复旋转
+    transform = _ORIENTATION_TRANSFORMS.get(_exif_orientation(heif_file.info.get('exif')))
+    return transform(img) if transform else img
+
+
+@timed('img.heic_convert')
+def convert_heic_to_jpg(heic_path, jpg_path=None, quality=95, log=print_log):
     """
     将HEIC格式图片转换为JPG格式
 
@@ -34,84 +94,67 @@ def convert_heic_to_jpg(heic_path, jpg_path=None, quality=95):
             file_name, _ = os.path.splitext(heic_path)
             jpg_path = f"{file_name}.jpg"
 
-        # 读取HEIC文件
-        heif_file = pillow_heif.read(heic_path)
-
-        # 处理不同版本的API差异
-        if isinstance(heif_file, list):
-            # 某些版本返回图像列表
-            image_data = heif_file[0]
-        else:
-            # 另一些版本直接返回图像数据
-            image_data = heif_file
-
-        # 将HEIC转换为PIL Image对象
-        image = Image.frombytes(
-            image_data.mode,
-            image_data.size,
-            image_data.data,
-            "raw",
-            image_data.mode,
-            image_data.stride,
-        )
-
-        # 保存为JPG格式
-        image.save(jpg_path, "JPEG", quality=quality)
-        print(f"转换成功: {jpg_path}")
+        with Image.open(heic_path) as source:
+            # pillow_heif 解码时已应用HEIF容器中的旋转并把EXIF方向重置为1，此时不会重复旋转；
+            # 方向仍不为1（旧版本或只记录在EXIF中）时在这里摆正，并去掉方向标记
+            image = ImageOps.exif_transpose(source)
+            # 保留EXIF（拍摄时间、相机型号等），方向标记已在摆正时去掉
+            exif = image.getexif()
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            image.save(jpg_path, "JPEG", quality=quality, exif=exif)
+        log(f"转换成功: {jpg_path}")
         return True
 
-    except AttributeError as ae:
-        # 处理不同版本的API差异
-        try:
-            # 尝试另一种获取图像数据的方式
-            heif_file = pillow_heif.HeifFile(heic_path)
-            image = Image.frombytes(
-                heif_file.mode,
-                heif_file.size,
-                heif_file.data,
-                "raw",
-                heif_file.mode,
-                heif_file.stride,
-            )
-            image.save(jpg_path, "JPEG", quality=quality)
-            print(f"转换成功: {jpg_path}")
-            return True
-        except Exception as e:
-            print(f"转换失败: {str(e)}")
-            return False
     except Exception as e:
-        print(f"转换失败: {str(e)}")
+        log(f"转换失败: {str(e)}")
         return False
 
 
+def _convert_task(heic_path, jpg_path, quality, delete_source):
+    ok = convert_heic_to_jpg(heic_path, jpg_path=jpg_path, quality=quality)
+    if ok and delete_source:
+        os.remove(heic_path)
+    return ok
+
+
+def convert_heic_files(file_paths, quality=95, delete_source=True, workers=None, log=print_log):
+    """
+    多进程批量转换为同目录下的同名JPG，转换成功后按需删除原图
+
+    返回 (成功数, 失败数)
+    """
+    total = len(file_paths)
+    succeeded = failed = 0
+    workers = max(1, min(workers or os.cpu_count() or 1, total or 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_convert_task, path, str(Path(path).with_suffix('.jpg')), quality, delete_source): path
+                   for path in file_paths}
+        for index, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                log(f"处理图片时出错: {str(e)}")
+                ok = False
+            if ok:
+                succeeded += 1
+            else:
+                failed += 1
+            log(f'{index}/{total},已完成{index * 100 / total:.2f}%:{path}{"" if ok else " 转换失败"}')
+    return succeeded, failed
+
+
 if __name__ == "__main__":
     # 指定目录路径
     target_directory = img_folder_path  # 替换为你的目录路径
 
     try:
-        # 获取并缓存文件列表
-        file_cache = get_non_hidden_files_pathlib(target_directory)
-        total_files = len(file_cache)
-        img_file_index = 0
-
-        # 打印缓存结果
-        print(f"发现 {len(file_cache)} 个文件路径：")
-        for file_path in file_cache:
-            try:
-                path = Path(file_path)
-                file_fold = path.parent
-                file_name = path.stem
-                jpeg_file_path = os.path.join(file_fold, f"{file_name}.jpg")
-                print(f'{jpeg_file_path}')
-                if convert_heic_to_jpg(file_path, jpg_path=jpeg_file_path, quality=95):
-                    os.remove(file_path)
-
-            except Exception as e:
-                print(f"处理图片时出错: {str(e)}")
-            finally:
-                # print('=======结束=======')
-                img_file_index += 1
-                print(f'{img_file_index}/{total_files},已完成{img_file_index * 100 / total_files:.2f}%%:{file_path}')
+        # 只转换HEIC文件，其它文件不再逐个尝试
+        file_cache = list_heic_files(target_directory)
+        print(f"发现 {len(file_cache)} 个HEIC文件")
+        succeeded, failed = convert_heic_files(file_cache, quality=95, delete_source=True)
+        print(f"转换完成：成功 {succeeded} 个，失败 {failed} 个")
 
     except ValueError as e:
         print(e)
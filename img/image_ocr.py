@@ -1,55 +1,43 @@
-import easyocr
+import csv
 import os
+
+import cv2
 import numpy as np
-from collections import defaultdict
 
+from config import easyocr_model_path
+from img.ocr_layout import layout_blocks, cluster_bounds
+from img.ocr_runtime import create_reader
+from img.table_grid import detect_table_grid
+from metrics import timer, count
+
+
+def create_table_reader():
+    """初始化阅读器（运行时见 config.ocr_runtime）"""
+    return create_reader(model_dir=easyocr_model_path)
 
-def recognize_table_with_easyocr(image_path):
-    """识别表格图片并尝试还原表格结构"""
+
+def recognize_table_with_easyocr(image_path, reader=None):
+    """识别表格图片并尝试还原表格结构（整图检测文字后按坐标分行分列）"""
     try:
         # 检查图片文件是否存在
         if not os.path.exists(image_path):
             print(f"错误：图片文件不存在 - {image_path}")
             return None
 
-        # 初始化阅读器
-        reader = easyocr.Reader(['ch_sim', 'en']
-                                , model_storage_directory='/Users/tyrtao/AI/文字识别/easyOCR'  # 你的模型存放目录
-                                , download_enabled=False  # 禁用自动下载,
-                                , gpu=False)
+        if reader is None:
+            reader = create_table_reader()
 
         # 执行识别，获取带坐标的结果
         # result格式: [([[x1,y1], [x2,y2], [x3,y3], [x4,y4]], '文本', 置信度), ...]
-        result = reader.readtext(image_path)
+        with timer('ocr.readtext'):
+            result = reader.readtext(image_path)
 
         if not result:
             print("未识别到任何内容")
             return None
 
-        # 提取所有文本的y坐标（用于判断行）
-        y_coordinates = [item[0][0][1] for item in result]
-
-        # 聚类y坐标，确定行（通过阈值判断是否为同一行）
-        rows = cluster_coordinates(y_coordinates, threshold=15)
-
-        # 按行分组文本
-        row_items = defaultdict(list)
-        for i, item in enumerate(result):
-            coords, text, _ = item
-            # 找到当前项所属的行
-            for row_idx, y_range in rows.items():
-                if y_range[0] <= coords[0][1] <= y_range[1]:
-                    row_items[row_idx].append((coords[0][0], text))  # (x坐标, 文本)
-                    break
-
-        # 对每行按x坐标排序（确定列顺序）
-        table_data = []
-        for row_idx in sorted(row_items.keys()):
-            # 按x坐标排序，确保列顺序正确
-            sorted_items = sorted(row_items[row_idx], key=lambda x: x[0])
-            # 提取文本
-            row_text = [text for (x, text) in sorted_items]
-            table_data.append(row_text)
+        # 按y坐标聚类分行（相邻坐标差不超过阈值为同一行），行内按x坐标排序确定列顺序
+        table_data = layout_blocks(result, threshold=15, mode='gap').rows()
 
         return table_data
 
@@ -58,26 +46,69 @@ def recognize_table_with_easyocr(image_path):
         return None
 
 
+def recognize_table_cells(image_path, reader=None):
+    """
+    有框线的表格：框线只检测一次，每个非空单元格的区域作为识别框交给一次 recognize 调用，
+    跳过整图文字检测，行列由框线直接确定（不再按坐标猜测）
+
+    没有检测到框线时退回 recognize_table_with_easyocr，返回二维列表，失败时返回None
+    """
+    if not os.path.exists(image_path):
+        print(f"错误：图片文件不存在 - {image_path}")
+        return None
+    # 兼容中文路径
+    gray = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        print(f"错误：图片读取失败 - {image_path}")
+        return None
+    if reader is None:
+        reader = create_table_reader()
+
+    grid = detect_table_grid(gray)
+    if grid is None or not grid.cells:
+        print(f"未检测到表格框线，按文字坐标还原表格：{image_path}")
+        return recognize_table_with_easyocr(image_path, reader)
+
+    cells = [cell for cell in grid.cells if not cell.empty]
+    count('ocr.table_cells', len(cells))
+    texts = {}
+    if cells:
+        # 识别框格式 [x_min, x_max, y_min, y_max]；只有GPU下 batch_size 才整批送入识别模型，
+        # CPU上 EasyOCR 仍逐个单元格识别，省下的是整图的文字检测
+        with timer('ocr.recognize_cells'):
+            result = reader.recognize(gray, horizontal_list=[list(cell.box) for cell in cells], free_list=[],
+                                      detail=1, batch_size=len(cells))
+        # GPU整批识别时结果按纵坐标重新排序，按识别框左上角对应回单元格
+        for bbox, text, _ in result:
+            texts[(int(bbox[0][0]), int(bbox[0][1]))] = text
+    return grid.to_table([texts.get((cell.box[0], cell.box[2]), '') for cell in grid.cells])
+
+
+def write_table(table_data, output_path):
+    """按扩展名保存表格：.csv（utf-8-sig，Excel可直接打开）或 .xlsx（需要 openpyxl）"""
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    if output_path.lower().endswith('.xlsx'):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise ValueError("保存xlsx需要安装 openpyxl")
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in table_data:
+            sheet.append(row)
+        workbook.save(output_path)
+        return
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        csv.writer(f).writerows(table_data)
+
+
 def cluster_coordinates(coordinates, threshold=10):
-    """将相近的坐标聚类（用于识别行）"""
+    """将相近的坐标聚类（用于识别行），返回 {聚类序号: [最小值, 最大值]}"""
     if not coordinates:
         return {}
 
-    # 排序坐标
-    sorted_coords = sorted(coordinates)
-    clusters = {}
-    current_cluster = 0
-    clusters[current_cluster] = [sorted_coords[0], sorted_coords[0]]  # [min, max]
-
-    for coord in sorted_coords[1:]:
-        # 如果当前坐标与上一聚类的最大差值小于阈值，则归为同一聚类
-        if coord - clusters[current_cluster][1] <= threshold:
-            clusters[current_cluster][1] = coord
-        else:
-            current_cluster += 1
-            clusters[current_cluster] = [coord, coord]
-
-    return clusters
+    lower, upper = cluster_bounds(coordinates, threshold, mode='gap')
+    return {index: [low, high] for index, (low, high) in enumerate(zip(lower.tolist(), upper.tolist()))}
 
 
 def print_table(table_data):
@@ -108,8 +139,8 @@ if __name__ == "__main__":
     # 替换为你的表格图片路径
     image_path = "/Users/tyrtao/QcHelper/电商/素材/进货单/喜庆用品/xq.jpg"
 
-    # 识别表格
-    table_data = recognize_table_with_easyocr(image_path)
+    # 识别表格（有框线时按单元格批量识别）
+    table_data = recognize_table_cells(image_path)
 
     if table_data:
         print("表格识别结果：")
@@ -3,14 +3,18 @@
 """
 
 import os
+import threading
+
 import cv2
 import numpy as np
 
-from config import img_folder_path
-from file.file_utils import get_non_hidden_files_deli_xq
+from config import img_folder_path, output_profiles, blank_tile_mode, blank_tile_tolerance, trim_trailing_blank
+from file.file_utils import get_non_hidden_files_deli_xq, read_chinese_path_image, print_log
+from file.image_encoding import ImageWriterPool, get_profile, encode_image
+from img.ImageScale import blur_qrcode_opencv
+from metrics import count
 
 from pathlib import Path
-from file.file_utils import get_non_hidden_files_video
 
 
 def get_file_new_path(path):
@@ -29,107 +33,105 @@ def get_file_new_path(path):
     return new_path
 
 
-def preprocess_image(img_cv):
-    """图像预处理以提高二维码识别率"""
-    # 转换为灰度图
-    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-
-    # 对比度增强
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-
-    # 高斯模糊去除噪声
-    blurred = cv2.GaussianBlur(enhanced, (3, 3), 0)
-
-    # 自适应阈值处理
-    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-    return thresh
-
-
-def blur_qrcode_opencv(img_cv):
-    """使用OpenCV识别并模糊图片中的二维码，增加预处理步骤提高识别率"""
-    # 创建原始图像的副本用于最终处理
-    img_copy = img_cv.copy()
-
-    # 对图像进行预处理以提高识别率
-    processed = preprocess_image(img_cv)
-
-    # 初始化QR码检测器
-    qr_detector = cv2.QRCodeDetector()
-
-    # 尝试多种方式检测二维码
-    detection_methods = [
-        # 直接检测原始图像
-        (img_cv, "原始图像"),
-        # 检测预处理后的图像
-        (processed, "预处理图像"),
-        # 检测原始图像的灰度版本
-        (cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY), "灰度图像")
-    ]
+# 纯色片段的编码结果缓存：(高, 宽, 颜色, 编码方案) -> 编码数据
+_blank_tiles = {}
+_blank_tiles_lock = threading.Lock()
+_BLANK_CACHE_SIZE = 64
 
-    for img, method in detection_methods:
-        retval, _, points, _ = qr_detector.detectAndDecodeMulti(img)
 
-        if retval:
-            print(f"使用{method}成功识别到二维码")
-            # 转换为整数坐标
-            points = np.int32(points)
-
-            # 对每个检测到的二维码进行处理
-            for qr_points in points:
-                # 计算二维码边界框
-                x_min, y_min = np.min(qr_points, axis=0)
-                x_max, y_max = np.max(qr_points, axis=0)
-
-                # 稍微扩大边界框，确保完全覆盖二维码
-                expand = 5
-                x_min = max(0, x_min - expand)
-                y_min = max(0, y_min - expand)
-                x_max = min(img_cv.shape[1] - 1, x_max + expand)
-                y_max = min(img_cv.shape[0] - 1, y_max + expand)
-
-                # 提取二维码区域
-                qr_roi = img_copy[y_min:y_max + 1, x_min:x_max + 1]
-
-                # 应用更强的高斯模糊
-                blurred_roi = cv2.GaussianBlur(qr_roi, (31, 31), 0)
-
-                # 将模糊后的区域放回原图
-                img_copy[y_min:y_max + 1, x_min:x_max + 1] = blurred_roi
+def uniform_color(img, tolerance=blank_tile_tolerance):
+    """
+    图片为纯色（所有像素与左上角像素相差不超过 tolerance）时返回该颜色，否则返回None
 
-            return img_copy
+    使用OpenCV在原图视图上计算，耗时不到编码的二十分之一
+    """
+    if img.size == 0:
+        return None
+    color = tuple(int(c) for c in np.atleast_1d(img[0, 0]))
+    diff = cv2.absdiff(img, color + (0,) * (4 - len(color)))
+    if cv2.minMaxLoc(diff.reshape(img.shape[0], -1))[1] > tolerance:
+        return None
+    return color
 
-    # 如果所有方法都无法识别，返回原图并提示
-    # print("未检测到二维码")
-    return img_copy
 
+def trailing_blank_start(img, tolerance=blank_tile_tolerance, block=64):
+    """
+    返回末尾留白的起始行（没有留白时返回图片高度）
 
-def split_image_into_squares(img, output_dir, file_name):
+    以最后一行的颜色为底色，从底部按块向上检查，只扫描留白部分
+    """
+    height = img.shape[0]
+    background = uniform_color(img[-1:], tolerance)
+    if background is None:
+        return height
+    background = background + (0,) * (4 - len(background))
+    for top in range((height - 1) // block * block, -1, -block):
+        rows = img[top:top + block]
+        diff = cv2.absdiff(rows, background).reshape(rows.shape[0], -1)
+        # 每行的最大差值
+        row_max = cv2.reduce(diff, 1, cv2.REDUCE_MAX).ravel()
+        content = np.flatnonzero(row_max > tolerance)
+        if content.size:
+            return top + int(content[-1]) + 1
+    return 0
+
+
+def _encoded_blank_tile(shape, color, profile):
+    """纯色片段只编码一次，相同尺寸、颜色、方案的片段直接复用编码结果"""
+    key = (shape, color, profile)
+    with _blank_tiles_lock:
+        buffer = _blank_tiles.get(key)
+    if buffer is None:
+        buffer = encode_image(np.full(shape, color, dtype=np.uint8), profile)
+        with _blank_tiles_lock:
+            if len(_blank_tiles) >= _BLANK_CACHE_SIZE:
+                _blank_tiles.pop(next(iter(_blank_tiles)))
+            _blank_tiles[key] = buffer
+    return buffer
+
+
+def split_image_into_squares(img, output_dir, file_name, profile=output_profiles['split'], writer=None, group=None,
+                             blank_mode=blank_tile_mode, trim=trim_trailing_blank):
     """
     将图片上下拆分为正方形片段，使用图片宽度作为每个片段的高度
 
     参数:
         img: cv2读取的图片数组
         output_dir: 输出目录
+        file_name: 输出文件名前缀，片段保存为 {file_name}_01.png ...（扩展名由编码方案决定）
+        profile: 编码方案（见 file/image_encoding.py）
+        writer: 共用的 ImageWriterPool，片段按 group 分组提交后立即返回，由调用方 flush(group)；
+                不指定时使用临时线程池并等待全部片段写完
+        blank_mode: 纯色片段的处理方式 keep / shared（复用缓存的编码结果）/ drop（不输出，编号保持连续）
+        trim: 切分前裁掉末尾留白
     """
+    if writer is None:
+        with ImageWriterPool() as writer:
+            split_image_into_squares(img, output_dir, file_name, profile, writer, group, blank_mode, trim)
+        return
+
+    ext = get_profile(profile)['ext']
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
 
     try:
+        # 裁掉末尾留白（视图，不复制）
+        if trim:
+            end = trailing_blank_start(img)
+            count('img.split_trimmed_rows', img.shape[0] - end)
+            img = img[:end]
+
         # 获取图片尺寸 (高度, 宽度, 通道数)
         height, width = img.shape[:2]
-        # print(f"原始图片尺寸: 宽度 {width}px, 高度 {height}px")
 
         # 使用图片宽度作为每个正方形片段的高度
         segment_height = width
-        # print(f"每个正方形片段尺寸: {width}px × {segment_height}px")
 
         # 计算可以分成多少段
         num_segments = (height + segment_height - 1) // segment_height
-        # print(f"将上下拆分为 {num_segments} 个正方形片段")
 
-        # 拆分图片
+        # 拆分图片（片段为原图的视图，不复制）
+        index = 0
         for i in range(num_segments):
             # 计算当前分段的起始和结束位置（垂直方向）
             start_y = i * segment_height
@@ -143,45 +145,94 @@ def split_image_into_squares(img, output_dir, file_name):
             # 宽度方向取完整宽度，高度方向取当前分段
             segment = img[start_y:end_y, :width]
 
-            # 生成输出文件名
-            output_path = os.path.join(output_dir, f"{file_name}_{i + 1:02d}.png")
+            # 编码前检查是否为纯色片段
+            color = uniform_color(segment) if blank_mode != 'keep' else None
+            if color is not None:
+                count('img.split_blank_tiles')
+                if blank_mode == 'drop':
+                    continue
 
-            # 保存分段图片
-            cv2.imwrite(output_path, segment)
+            # 生成输出文件名
+            index += 1
+            output_path = os.path.join(output_dir, f"{file_name}_{index:02d}{ext}")
 
+            # 提交到后台编码写入（兼容中文路径），积压过多时在此等待
+            if color is not None:
+                writer.submit_encoded(output_path, _encoded_blank_tile(segment.shape, color, profile), group)
+            else:
+                writer.submit(output_path, segment, profile, group)
+            count('img.split_tiles')
 
     except Exception as e:
-        print(f"处理图片时出错: {str(e)}")
+        raise Exception(f"拆分图片时出错: {str(e)}")
 
 
-def resize_image(input_path):
+def split_xq_image(input_path, output_dir=None, log=print_log, profile=output_profiles['split'], writer=None,
+                   blank_mode=blank_tile_mode, trim=trim_trailing_blank):
+    """
+    处理单个xq图片：模糊二维码并拆分，output_dir 默认为原图所在目录
+
+    指定 writer 时片段按 input_path 分组后台写入，调用方需 writer.flush(input_path) 后再视为完成
+    """
     path = Path(input_path)
-    if not path.exists():
-        return False
+    if not path.exists() or path.is_dir():
+        raise Exception("文件不存在或为目录")
 
-    if path.is_dir():
-        return False
+    # 使用OpenCV读取图片
+    img_cv = read_chinese_path_image(input_path)
+    if img_cv is None:
+        raise Exception("无法读取图片")
 
-    try:
-        # 使用OpenCV读取图片
-        img_cv = cv2.imread(input_path)
-        if img_cv is None:
-            print(f"无法读取图片: {input_path}")
-            return False
+    # 识别并模糊原始图片中的二维码
+    img_with_blur = blur_qrcode_opencv(img_cv, log=log)
 
-        # 先识别并模糊原始图片中的二维码
-        img_with_blur = blur_qrcode_opencv(img_cv)
+    # 拆分图片
+    split_image_into_squares(img_with_blur, output_dir if output_dir else path.parent, path.stem, profile,
+                             writer, input_path, blank_mode, trim)
 
-        path = Path(file_path)
 
-        new_path = path.parent
-        split_image_into_squares(img_with_blur, new_path, path.stem)
+def split_xq_images(file_paths, on_done, log=print_log, profile=output_profiles['split'], should_stop=None,
+                    blank_mode=blank_tile_mode, trim=trim_trailing_blank):
+    """
+    批量处理xq图片：上一张的片段在后台编码写入时，下一张已开始读取和检测二维码
 
+    每张图的片段全部写完后才按顺序回调 on_done(文件路径, 异常或None)
+    should_stop() 返回True时停止提交新图片（已提交的仍会写完）
+    """
+    with ImageWriterPool() as writer:
+        pending = None
 
+        def finish(file_path):
+            try:
+                writer.flush(file_path)
+            except Exception as e:
+                on_done(file_path, e)
+            else:
+                on_done(file_path, None)
 
-    except Exception as e:
-        print(f"处理图片时出错: {str(e)}")
-        return False
+        for file_path in file_paths:
+            if should_stop and should_stop():
+                break
+            try:
+                split_xq_image(file_path, log=log, profile=profile, writer=writer, blank_mode=blank_mode, trim=trim)
+                error = None
+            except Exception as e:
+                # 切分中途失败时该图可能已提交部分片段，等待写完，结果以原异常为准
+                try:
+                    writer.flush(file_path)
+                except Exception:
+                    pass
+                error = e
+            if pending is not None:
+                finish(pending)
+                pending = None
+            if error is None:
+                pending = file_path
+            else:
+                on_done(file_path, error)
+
+        if pending is not None:
+            finish(pending)
 
 
 if __name__ == "__main__":
@@ -196,16 +247,16 @@ if __name__ == "__main__":
 
         # 打印缓存结果
         print(f"发现 {len(file_cache)} 个文件路径：")
-        for file_path in file_cache:
-            try:
-                resize_image(file_path)
 
-            except Exception as e:
-                print(f"处理图片时出错: {str(e)}")
-            finally:
-                # print('=======结束=======')
-                img_file_index += 1
-                print(f'{img_file_index}/{total_files},已完成{img_file_index*100/total_files:.2f}%%:{file_path}')
+        def on_done(file_path, error):
+            global img_file_index
+            if error is not None:
+                print(f"处理图片时出错: {str(error)}")
+            # print('=======结束=======')
+            img_file_index += 1
+            print(f'{img_file_index}/{total_files},已完成{img_file_index*100/total_files:.2f}%%:{file_path}')
+
+        split_xq_images(file_cache, on_done)
 
     except ValueError as e:
         print(e)
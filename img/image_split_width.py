@@ -4,10 +4,10 @@
 
 import os
 import cv2
-import numpy as np
 
-from config import img_folder_path
+from config import img_folder_path, output_profiles
 from file.file_utils import get_non_hidden_files_deli_xq
+from file.image_encoding import ImageWriterPool, get_profile
 
 from pathlib import Path
 from file.file_utils import get_non_hidden_files_video
@@ -29,82 +29,6 @@ def get_file_new_path(path):
     return new_path
 
 
-def preprocess_image(img_cv):
-    """图像预处理以提高二维码识别率"""
-    # 转换为灰度图
-    gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-
-    # 对比度增强
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    enhanced = clahe.apply(gray)
-
-    # 高斯模糊去除噪声
-    blurred = cv2.GaussianBlur(enhanced, (3, 3), 0)
-
-    # 自适应阈值处理
-    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-
-    return thresh
-
-
-def blur_qrcode_opencv(img_cv):
-    """使用OpenCV识别并模糊图片中的二维码，增加预处理步骤提高识别率"""
-    # 创建原始图像的副本用于最终处理
-    img_copy = img_cv.copy()
-
-    # 对图像进行预处理以提高识别率
-    processed = preprocess_image(img_cv)
-
-    # 初始化QR码检测器
-    qr_detector = cv2.QRCodeDetector()
-
-    # 尝试多种方式检测二维码
-    detection_methods = [
-        # 直接检测原始图像
-        (img_cv, "原始图像"),
-        # 检测预处理后的图像
-        (processed, "预处理图像"),
-        # 检测原始图像的灰度版本
-        (cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY), "灰度图像")
-    ]
-
-    for img, method in detection_methods:
-        retval, _, points, _ = qr_detector.detectAndDecodeMulti(img)
-
-        if retval:
-            print(f"使用{method}成功识别到二维码")
-            # 转换为整数坐标
-            points = np.int32(points)
-
-            # 对每个检测到的二维码进行处理
-            for qr_points in points:
-                # 计算二维码边界框
-                x_min, y_min = np.min(qr_points, axis=0)
-                x_max, y_max = np.max(qr_points, axis=0)
-
-                # 稍微扩大边界框，确保完全覆盖二维码
-                expand = 5
-                x_min = max(0, x_min - expand)
-                y_min = max(0, y_min - expand)
-                x_max = min(img_cv.shape[1] - 1, x_max + expand)
-                y_max = min(img_cv.shape[0] - 1, y_max + expand)
-
-                # 提取二维码区域
-                qr_roi = img_copy[y_min:y_max + 1, x_min:x_max + 1]
-
-                # 应用更强的高斯模糊
-                blurred_roi = cv2.GaussianBlur(qr_roi, (31, 31), 0)
-
-                # 将模糊后的区域放回原图
-                img_copy[y_min:y_max + 1, x_min:x_max + 1] = blurred_roi
-
-            return img_copy
-
-    # 如果所有方法都无法识别，返回原图并提示
-    # print("未检测到二维码")
-    return img_copy
-
-
 def split_image_by_width(img, num_parts):
     """
     按照宽度将图片平均切分成指定数量的部分
@@ -142,23 +66,26 @@ def split_image_by_width(img, num_parts):
     return split_images
 
 
-def split_image_into_squares(img, total, output_dir, file_name):
+def split_image_into_squares(img, total, output_dir, file_name, profile=output_profiles['split_width']):
     """
     将图片上下拆分为正方形片段，使用图片宽度作为每个片段的高度
 
     参数:
         img: cv2读取的图片数组
         output_dir: 输出目录
+        profile: 编码方案（见 file/image_encoding.py）
     """
     # 确保输出目录存在
     os.makedirs(output_dir, exist_ok=True)
 
     try:
         split_images = split_image_by_width(img, total)
-        for i in range(len(split_images)):
-            image = split_images[i]
-            output_path = os.path.join(output_dir, f"{file_name}_{i + 1:02d}.png")
-            cv2.imwrite(output_path, image)
+        ext = get_profile(profile)['ext']
+        with ImageWriterPool() as writer:
+            for i in range(len(split_images)):
+                image = split_images[i]
+                output_path = os.path.join(output_dir, f"{file_name}_{i + 1:02d}{ext}")
+                writer.submit(output_path, image, profile)
 
     except Exception as e:
         print(f"处理图片时出错: {str(e)}")
@@ -0,0 +1,108 @@
+"""
+两级OCR：先用传统方法快速找出候选文字区域，只把这些区域交给EasyOCR的识别模型，跳过整图CRAFT检测
+
+商品照片、视频画面里文字通常只占一小块，CRAFT检测整图的耗时远大于识别几个文字块
+（CPU上 EasyOCR 逐个区域识别，batch_size 只在GPU上整批送入识别模型）。
+候选区域用形态学梯度找：文字笔画边缘密集，梯度二值化后横向闭运算把同一行的字连成块，
+再按高度、宽高比、填充率过滤。区域为空或不可信（数量过多、覆盖过大，多见于纹理复杂的照片）时退回完整检测。
+
+结果格式与 readtext 相同：[(四个顶点, 文本, 置信度), ...]，后续的分行（img/ocr_layout.py）不需要区分来源。
+对比速度与文字一致性：python -m bench.ocr_cascade
+"""
+import cv2
+import numpy as np
+
+from metrics import timer, count
+
+# 像素数超过该值时缩小后再找候选区域（按面积而不是长边，xq长条图缩小后文字仍可辨）
+PROPOSAL_MAX_PIXELS = 2_000_000
+# 候选区域的最小高度（缩小后的像素），更矮的多为噪点、线条
+MIN_REGION_HEIGHT = 8
+# 区域高度不超过图片高度的该比例（更高的多为商品主体而非文字行）
+MAX_REGION_HEIGHT_RATIO = 0.25
+# 区域宽高比下限：文字行通常横向较长
+MIN_ASPECT_RATIO = 0.8
+# 区域内梯度像素占比下限
+MIN_FILL_RATIO = 0.15
+# 候选区域外扩（按区域高度的比例），避免截断笔画
+REGION_MARGIN = 0.15
+# 超过该数量或覆盖超过图片面积该比例时认为候选不可信，退回完整检测
+MAX_REGIONS = 48
+MAX_COVERAGE = 0.5
+
+
+def propose_text_regions(gray):
+    """
+    返回候选文字区域 [[x_min, x_max, y_min, y_max], ...]（EasyOCR recognize 的 horizontal_list 格式，原图坐标），
+    不可信时返回空列表
+    """
+    height, width = gray.shape[:2]
+    with timer('ocr.propose'):
+        # 大图缩小后再找（同时去掉照片噪点），区域坐标再换算回原图
+        scale = min(1.0, (PROPOSAL_MAX_PIXELS / (height * width)) ** 0.5)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+        small_height, small_width = small.shape[:2]
+        gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+        _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+        # 横向连接同一行相邻的字，核宽随图片宽度变化
+        kernel_width = max(9, small_width // 80)
+        connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_width, 1)))
+        contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if h < MIN_REGION_HEIGHT or h > small_height * MAX_REGION_HEIGHT_RATIO or w < h * MIN_ASPECT_RATIO:
+                continue
+            if cv2.countNonZero(binary[y:y + h, x:x + w]) < w * h * MIN_FILL_RATIO:
+                continue
+            margin = h * REGION_MARGIN
+            boxes.append((max(0, x - margin), min(small_width, x + w + margin),
+                          max(0, y - margin), min(small_height, y + h + margin)))
+
+    boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) > MAX_REGIONS or ((boxes[:, 1] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 2])).sum() \
+            > small_width * small_height * MAX_COVERAGE:
+        count('ocr.proposals_rejected')
+        return []
+    # 去掉落在其他区域内的小块（如 i、j 的点）
+    inside = ((boxes[:, None, 0] >= boxes[None, :, 0]) & (boxes[:, None, 1] <= boxes[None, :, 1])
+              & (boxes[:, None, 2] >= boxes[None, :, 2]) & (boxes[:, None, 3] <= boxes[None, :, 3]))
+    np.fill_diagonal(inside, False)
+    boxes = boxes[~inside.any(axis=1)]
+    regions = [[int(x_min / scale), min(width, int(np.ceil(x_max / scale))),
+                int(y_min / scale), min(height, int(np.ceil(y_max / scale)))]
+               for x_min, x_max, y_min, y_max in boxes.tolist()]
+    # 按阅读顺序（从上到下、从左到右）
+    regions.sort(key=lambda box: (box[2], box[0]))
+    return regions
+
+
+def cascade_readtext(reader, gray, fallback=None, **recognize_params):
+    """
+    只识别候选区域，没有候选区域时完整检测：调用 fallback()，未指定时为 reader.readtext(gray, detail=1)
+
+    recognize_params 传给 reader.recognize（如 contrast_ths、adjust_contrast）
+    """
+    regions = propose_text_regions(gray)
+    if not regions:
+        count('ocr.cascade_fallback')
+        if fallback is not None:
+            return fallback()
+        with timer('ocr.readtext'):
+            return reader.readtext(gray, detail=1)
+
+    count('ocr.cascade_regions', len(regions))
+    with timer('ocr.recognize_regions'):
+        result = reader.recognize(gray, horizontal_list=regions, free_list=[], detail=1,
+                                  batch_size=len(regions), **recognize_params)
+    # 区域内没有识别出文字的结果去掉
+    return [item for item in result if item[1].strip()]
+
+
+def draw_regions(img, regions, color=(0, 0, 255)):
+    """在图片上画出候选区域（调试、基准测试输出用）"""
+    canvas = img.copy() if img.ndim == 3 else cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    for x_min, x_max, y_min, y_max in regions:
+        cv2.rectangle(canvas, (x_min, y_min), (x_max, y_max), color, 2)
+    return canvas
@@ -0,0 +1,119 @@
+"""
+OCR结果版面整理：把文字块按行分组、行内按横坐标排序，得到表格结构
+
+get_text_app.group_ocr_by_lines（按行输出文字）与 image_ocr.recognize_table_with_easyocr（还原表格）共用。
+文字块格式与 EasyOCR readtext 的结果相同：(bbox, 文本, 置信度)，bbox 为四个顶点，取第一个顶点（左上角）定位。
+
+全部用NumPy计算：纵坐标只排序一次，行号由分行位置 searchsorted 得到，行内列顺序用 lexsort 一次排好，
+几千个文字块的进货单、规格表也不会在Python循环里逐块比较。
+
+两种分行方式：
+- anchor：与当前行第一个文字块的纵坐标相差不超过阈值的归为同一行（group_ocr_by_lines 原有的规则）
+- gap：排序后相邻纵坐标相差不超过阈值的归为同一行，行可以逐块延伸（cluster_coordinates 原有的规则）
+"""
+import numpy as np
+
+
+def block_origins(ocr_result):
+    """返回文字块左上角的 (横坐标数组, 纵坐标数组)"""
+    origins = np.array([block[0][0] for block in ocr_result], dtype=np.float64).reshape(-1, 2)
+    return origins[:, 0], origins[:, 1]
+
+
+def row_starts(sorted_values, threshold, mode='anchor'):
+    """已排序的坐标中每一行的起始下标"""
+    if len(sorted_values) == 0:
+        return np.zeros(0, dtype=np.intp)
+    if mode == 'gap':
+        breaks = np.flatnonzero(np.diff(sorted_values) > threshold) + 1
+        return np.concatenate(([0], breaks)).astype(np.intp)
+    if mode != 'anchor':
+        raise ValueError(f"未知的分行方式: {mode}")
+    # 一次二分查找出以每个位置为行首时下一行的起点，再从第0个开始跳转，循环次数等于行数
+    next_start = np.searchsorted(sorted_values, sorted_values + threshold, side='right').tolist()
+    starts = []
+    start, total = 0, len(sorted_values)
+    while start < total:
+        starts.append(start)
+        start = next_start[start]
+    return np.array(starts, dtype=np.intp)
+
+
+def cluster_bounds(values, threshold, mode='gap'):
+    """坐标聚类，返回每一类的 (最小值数组, 最大值数组)，按从小到大排列"""
+    sorted_values = np.sort(np.asarray(values, dtype=np.float64))
+    starts = row_starts(sorted_values, threshold, mode)
+    if len(starts) == 0:
+        return sorted_values, sorted_values
+    ends = np.append(starts[1:], len(sorted_values)) - 1
+    return sorted_values[starts], sorted_values[ends]
+
+
+class OcrLayout:
+    """
+    整理后的版面
+
+    - texts / confidences / xs / ys：文字块原有顺序的数据
+    - row / col：每个文字块的行号与列号（从0开始）
+    - order：按（行，横坐标）排列的文字块下标
+    """
+
+    def __init__(self, texts, confidences, xs, ys, row, order):
+        self.texts = texts
+        self.confidences = confidences
+        self.xs = xs
+        self.ys = ys
+        self.row = row
+        self.order = order
+        self.col = np.empty(len(order), dtype=np.intp)
+        if len(order):
+            sorted_rows = row[order]
+            starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+            counts = np.diff(np.append(starts, len(order)))
+            self.col[order] = np.arange(len(order)) - np.repeat(starts, counts)
+
+    @property
+    def row_count(self):
+        return int(self.row.max()) + 1 if len(self.row) else 0
+
+    def rows(self):
+        """表格：每行为按横坐标排列的文本列表"""
+        if not len(self.order):
+            return []
+        texts = [self.texts[index] for index in self.order.tolist()]
+        # 行号连续且每行至少一个文字块，按行首位置切分即可
+        starts = np.flatnonzero(self.col[self.order] == 0).tolist()
+        return [texts[start:end] for start, end in zip(starts, starts[1:] + [len(texts)])]
+
+    def lines(self, separator='   '):
+        """每行文本用分隔符拼接"""
+        return [separator.join(row) for row in self.rows()]
+
+    def records(self):
+        """每个文字块一条记录：行、列、文本、置信度、左上角坐标（按表格顺序）"""
+        return [{'row': int(self.row[i]), 'col': int(self.col[i]), 'text': self.texts[i],
+                 'confidence': self.confidences[i], 'x': float(self.xs[i]), 'y': float(self.ys[i])}
+                for i in self.order]
+
+
+def layout_blocks(ocr_result, threshold=10, mode='anchor'):
+    """
+    按纵坐标分行、行内按横坐标排序，返回 OcrLayout
+
+    横坐标相同的文字块：anchor 按纵坐标先后排列，gap 保持输入顺序（分别与两处原实现一致）
+    """
+    texts = [block[1] for block in ocr_result]
+    confidences = [float(block[2]) if len(block) > 2 else None for block in ocr_result]
+    xs, ys = block_origins(ocr_result)
+    # 稳定排序：纵坐标相同的文字块保持原有顺序
+    by_y = np.argsort(ys, kind='stable')
+    starts = row_starts(ys[by_y], threshold, mode)
+    row = np.empty(len(texts), dtype=np.intp)
+    if len(texts):
+        row[by_y] = np.searchsorted(starts, np.arange(len(texts)), side='right') - 1
+    # 先按行、再按横坐标；lexsort 是稳定排序，横坐标相同时保持排序前的顺序
+    if mode == 'anchor':
+        order = by_y[np.lexsort((xs[by_y], row[by_y]))]
+    else:
+        order = np.lexsort((xs, row))
+    return OcrLayout(texts, confidences, xs, ys, row, order)
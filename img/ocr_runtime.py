@@ -0,0 +1,221 @@
+"""
+EasyOCR 阅读器的创建与推理运行时
+
+所有模块通过 create_reader 创建阅读器（config.ocr_runtime 选择运行时）：
+- torch：EasyOCR 默认的 PyTorch 推理
+- onnx：CRAFT 检测模型与 CRNN 识别模型导出为ONNX（只在第一次使用时导出，保存在 config.ocr_onnx_dir），
+  用 ONNX Runtime 推理，可选 INT8 动态量化、指定线程数与执行后端（如 OpenVINOExecutionProvider）
+
+ONNX 模型只替换 reader.detector / reader.recognizer 的前向计算，图片缩放、框合并、CTC解码等仍由 EasyOCR 完成，
+readtext / detect / recognize 的参数与返回格式不变。
+
+导出并核对输出误差：python -m img.ocr_runtime --verify
+"""
+import argparse
+import copy
+import os
+
+import easyocr
+import numpy as np
+import torch
+
+from config import easyocr_model_path, ocr_runtime, ocr_onnx_dir, ocr_onnx_quantize, ocr_onnx_threads, \
+    ocr_onnx_providers, model_warmup
+from metrics import timer
+from model_runtime import select_device, warm_up_reader
+
+OCR_RUNTIMES = ('torch', 'onnx')
+DEFAULT_LANG = ('ch_sim', 'en')
+ONNX_OPSET = 13
+# 识别模型输入高度（EasyOCR 固定为64）
+RECOGNIZER_HEIGHT = 64
+
+
+def create_reader(lang=DEFAULT_LANG, model_dir=easyocr_model_path, runtime=None, threads=None, warm_up=None):
+    """
+    创建 EasyOCR 阅读器（加载失败时抛出异常）；runtime 为None时按 config.ocr_runtime，
+    threads 为 onnx 运行时的推理线程数（None 时按 config.ocr_onnx_threads），
+    warm_up 为None时按 config.model_warmup，加载后先识别一张合成图片
+
+    torch 运行时的设备按 config.model_devices['ocr']（见 model_runtime.py），onnx 运行时按 config.ocr_onnx_providers
+    """
+    runtime = runtime or ocr_runtime
+    if runtime not in OCR_RUNTIMES:
+        raise ValueError(f"未知的OCR运行时: {runtime}（可选：{', '.join(OCR_RUNTIMES)}）")
+    with timer('ocr.load_model'):
+        if runtime == 'onnx':
+            # 导出ONNX需要未量化的PyTorch模型，量化改由 ONNX Runtime 完成
+            reader = _load_easyocr(lang, model_dir, quantize=False)
+            use_onnx_runtime(reader, onnx_dir=_onnx_dir(model_dir), threads=threads)
+        else:
+            reader = _load_easyocr(lang, model_dir, device=select_device('ocr'))
+    if model_warmup if warm_up is None else warm_up:
+        warm_up_reader(reader)
+    return reader
+
+
+def _load_easyocr(lang, model_dir, quantize=True, device='cpu'):
+    return easyocr.Reader(
+        list(lang),
+        model_storage_directory=model_dir,  # 你的模型存放目录
+        download_enabled=False,  # 禁用自动下载
+        gpu=False if device == 'cpu' else device,
+        quantize=quantize,  # 动态量化只在CPU上生效
+    )
+
+
+def _onnx_dir(model_dir, onnx_dir=None):
+    return onnx_dir or ocr_onnx_dir or os.path.join(model_dir, 'onnx')
+
+
+# ========== ONNX 导出 ==========
+class _MeanPool(torch.nn.Module):
+    """等价于识别模型中的 AdaptiveAvgPool2d((None, 1))：对最后一维求平均（自适应池化无法按动态宽度导出）"""
+
+    def forward(self, x):
+        return x.mean(dim=3, keepdim=True)
+
+
+class _RecognizerExport(torch.nn.Module):
+    """识别模型的 forward(input, text) 中 text 不参与CTC计算，导出时只保留图片输入"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = copy.deepcopy(model)
+        self.model.AdaptiveAvgPool = _MeanPool()
+
+    def forward(self, image):
+        return self.model(image, None)
+
+
+def export_detector(reader, path):
+    """CRAFT：输入 [N, 3, H, W]，输出文字/连接得分图 [N, H/2, W/2, 2] 与特征图"""
+    model = reader.detector.eval()
+    dummy = torch.randn(1, 3, 640, 640)
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, path, opset_version=ONNX_OPSET,
+                          input_names=['image'], output_names=['score', 'feature'],
+                          dynamic_axes={'image': {0: 'batch', 2: 'height', 3: 'width'},
+                                        'score': {0: 'batch', 1: 'score_height', 2: 'score_width'},
+                                        'feature': {0: 'batch', 2: 'score_height', 3: 'score_width'}})
+
+
+def export_recognizer(reader, path):
+    """CRNN：输入 [N, 1, 64, W]，输出每个时间步的字符得分 [N, T, 字符数]"""
+    model = _RecognizerExport(reader.recognizer).eval()
+    dummy = torch.randn(1, 1, RECOGNIZER_HEIGHT, 256)
+    with torch.no_grad():
+        torch.onnx.export(model, dummy, path, opset_version=ONNX_OPSET,
+                          input_names=['image'], output_names=['preds'],
+                          dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'preds': {0: 'batch', 1: 'steps'}})
+
+
+def quantize_model(path, quantized_path):
+    """INT8 动态量化（权重量化，激活值在推理时量化），不需要校准数据"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QUInt8)
+
+
+def onnx_model_paths(reader, onnx_dir, quantize=False):
+    """检测、识别模型的ONNX文件路径；识别模型按语言模型区分（ch_sim 与 ja 等使用不同的模型）"""
+    suffix = '.int8.onnx' if quantize else '.onnx'
+    detector = os.path.join(onnx_dir, f"{getattr(reader, 'detect_network', 'craft')}{suffix}")
+    recognizer = os.path.join(onnx_dir, f"recognizer_{getattr(reader, 'model_lang', '_'.join(reader.lang_list))}{suffix}")
+    return detector, recognizer
+
+
+def export_onnx_models(reader, onnx_dir, quantize=False):
+    """导出缺少的ONNX模型（已存在的不重复导出），返回 (检测模型路径, 识别模型路径)"""
+    if getattr(reader, 'detect_network', 'craft') != 'craft':
+        raise ValueError(f"ONNX运行时只支持CRAFT检测模型: {reader.detect_network}")
+    os.makedirs(onnx_dir, exist_ok=True)
+    paths = onnx_model_paths(reader, onnx_dir)
+    for export, path in zip((export_detector, export_recognizer), paths):
+        if not os.path.exists(path):
+            with timer('ocr.onnx_export'):
+                # 先写临时文件，中断时不留下不完整的模型
+                temp_path = path + '.tmp'
+                export(reader, temp_path)
+                os.replace(temp_path, path)
+    if not quantize:
+        return paths
+    quantized_paths = onnx_model_paths(reader, onnx_dir, quantize=True)
+    for path, quantized_path in zip(paths, quantized_paths):
+        if not os.path.exists(quantized_path):
+            temp_path = quantized_path + '.tmp'
+            quantize_model(path, temp_path)
+            os.replace(temp_path, quantized_path)
+    return quantized_paths
+
+
+# ========== ONNX Runtime 推理 ==========
+class OnnxModule:
+    """
+    以 PyTorch 模块的调用方式运行ONNX模型：EasyOCR 内部调用 model.eval()、model(x, ...)，
+    输入、输出都是 torch.Tensor（输出 .cpu().data.numpy() 等用法不变）
+    """
+
+    def __init__(self, path, threads=0, providers=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # 0 表示由 ONNX Runtime 按物理核数决定
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.threads = threads
+        self.session = ort.InferenceSession(path, options, providers=list(providers or ['CPUExecutionProvider']))
+        self.input_name = self.session.get_inputs()[0].name
+
+    def eval(self):
+        return self
+
+    def __call__(self, image, *unused):
+        outputs = self.session.run(None, {self.input_name: image.detach().cpu().numpy().astype(np.float32)})
+        tensors = tuple(torch.from_numpy(output) for output in outputs)
+        return tensors if len(tensors) > 1 else tensors[0]
+
+
+def use_onnx_runtime(reader, onnx_dir, quantize=None, threads=None, providers=None):
+    """把阅读器的检测、识别模型替换为 ONNX Runtime 推理（模型不存在时先导出）"""
+    quantize = ocr_onnx_quantize if quantize is None else quantize
+    threads = ocr_onnx_threads if threads is None else threads
+    providers = providers or ocr_onnx_providers
+    detector_path, recognizer_path = export_onnx_models(reader, onnx_dir, quantize)
+    reader.detector = OnnxModule(detector_path, threads, providers)
+    reader.recognizer = OnnxModule(recognizer_path, threads, providers)
+    return reader
+
+
+def verify_onnx_models(model_dir=easyocr_model_path, onnx_dir=None, quantize=False):
+    """导出后用随机输入对比 PyTorch 与 ONNX Runtime 的输出，返回各输出的最大绝对误差"""
+    reader = _load_easyocr(DEFAULT_LANG, model_dir, quantize=False)
+    detector_path, recognizer_path = export_onnx_models(reader, _onnx_dir(model_dir, onnx_dir), quantize)
+    errors = {}
+    with torch.no_grad():
+        image = torch.rand(1, 3, 480, 736)
+        expected = reader.detector.eval()(image)
+        actual = OnnxModule(detector_path)(image)
+        for name, left, right in zip(('score', 'feature'), expected, actual):
+            errors[f"detector.{name}"] = float((left - right).abs().max())
+        image = torch.rand(2, 1, RECOGNIZER_HEIGHT, 320)
+        expected = reader.recognizer.eval()(image, None)
+        errors['recognizer.preds'] = float((expected - OnnxModule(recognizer_path)(image)).abs().max())
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='python -m img.ocr_runtime', description='导出EasyOCR模型为ONNX并核对输出')
+    parser.add_argument('--model-dir', default=easyocr_model_path, help='EasyOCR模型目录')
+    parser.add_argument('--onnx-dir', default=None, help='ONNX模型目录（默认 config.ocr_onnx_dir，为空时为模型目录下的onnx）')
+    parser.add_argument('--quantize', action='store_true', help='同时生成INT8量化模型并核对')
+    parser.add_argument('--verify', action='store_true', help='用随机输入对比PyTorch与ONNX Runtime的输出')
+    args = parser.parse_args()
+
+    if args.verify:
+        for name, error in verify_onnx_models(args.model_dir, args.onnx_dir, args.quantize).items():
+            print(f"{name}: 最大误差 {error:.2e}")
+    else:
+        reader = _load_easyocr(DEFAULT_LANG, args.model_dir, quantize=False)
+        for path in export_onnx_models(reader, _onnx_dir(args.model_dir, args.onnx_dir), args.quantize):
+            print(f"已导出：{path}")
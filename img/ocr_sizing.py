@@ -0,0 +1,87 @@
+"""
+OCR输入尺寸自适应：先用低分辨率快速检测估计文字大小与位置，再决定完整识别时的裁剪区域、canvas_size 与 mag_ratio
+
+原来固定 canvas_size=1280、mag_ratio=1.5：4000x3000 的照片里只有一小块标签文字时，检测与密集文档一样耗时。
+现在：
+- 低分辨率探测（probe_canvas，默认640）得到文字框，按框高估计字高（取较小的分位数，照顾小字）
+- 选择使字高在检测输入中不低于 min_char_height 的最小缩放比例，且不超过原固定参数的缩放比例（不会比原来更慢）
+- 文字集中在局部时只对文字区域（外扩若干字高）做完整识别，识别结果坐标换算回原图
+
+探测没有发现文字时返回None，调用方按原固定参数整图识别。探测分辨率下过小的文字可能漏检，
+此时裁剪区域可能不含这些文字，可在 config.ocr_adaptive_sizing 关闭。
+"""
+import math
+
+import numpy as np
+
+# 原固定参数：完整识别时的缩放比例不超过这两个值决定的比例
+DEFAULT_CANVAS_SIZE = 1280
+DEFAULT_MAG_RATIO = 1.5
+# 估计字高时取框高的该分位数
+HEIGHT_PERCENTILE = 25
+# 裁剪区域在文字框外扩的字高倍数
+CROP_MARGIN_CHARS = 2
+# 裁剪后面积不足原图该比例时才裁剪
+CROP_MAX_AREA_RATIO = 0.8
+# 检测输入最长边下限（canvas_size 过小时 CRAFT 的特征图没有意义）
+MIN_CANVAS_SIZE = 256
+
+
+class OcrSizing:
+    """完整识别的输入：原图中的裁剪区域 (x_min, y_min, x_max, y_max)，以及 canvas_size、mag_ratio"""
+    __slots__ = ('crop', 'canvas_size', 'mag_ratio', 'char_height')
+
+    def __init__(self, crop, canvas_size, mag_ratio, char_height):
+        self.crop = crop
+        self.canvas_size = canvas_size
+        self.mag_ratio = mag_ratio
+        self.char_height = char_height
+
+
+def box_bounds(horizontal_list, free_list):
+    """EasyOCR detect 的结果转为 (x_min, y_min, x_max, y_max) 数组"""
+    bounds = [(box[0], box[2], box[1], box[3]) for box in horizontal_list]
+    for points in free_list:
+        points = np.asarray(points, dtype=np.float64)
+        bounds.append((*points.min(axis=0), *points.max(axis=0)))
+    return np.array(bounds, dtype=np.float64).reshape(-1, 4)
+
+
+def plan_sizing(image_shape, bounds, min_char_height=16,
+                canvas_size=DEFAULT_CANVAS_SIZE, mag_ratio=DEFAULT_MAG_RATIO):
+    """
+    根据探测到的文字框（原图坐标）选择完整识别的裁剪区域与缩放参数，没有文字框时返回None
+
+    canvas_size / mag_ratio 为原固定参数，作为缩放比例的上限
+    """
+    if len(bounds) == 0:
+        return None
+    height, width = image_shape[:2]
+    heights = bounds[:, 3] - bounds[:, 1]
+    heights = heights[heights > 0]
+    if len(heights) == 0:
+        return None
+    char_height = float(np.percentile(heights, HEIGHT_PERCENTILE))
+
+    # 文字区域外扩后裁剪，文字铺满全图时不裁剪
+    margin = CROP_MARGIN_CHARS * float(np.median(heights))
+    x_min = max(0, int(bounds[:, 0].min() - margin))
+    y_min = max(0, int(bounds[:, 1].min() - margin))
+    x_max = min(width, int(math.ceil(bounds[:, 2].max() + margin)))
+    y_max = min(height, int(math.ceil(bounds[:, 3].max() + margin)))
+    if (x_max - x_min) * (y_max - y_min) >= width * height * CROP_MAX_AREA_RATIO:
+        x_min, y_min, x_max, y_max = 0, 0, width, height
+    longest = max(x_max - x_min, y_max - y_min)
+
+    # EasyOCR 的检测输入缩放比例为 min(mag_ratio, canvas_size / 最长边)
+    fixed_ratio = min(mag_ratio, canvas_size / longest)
+    ratio = min(min_char_height / char_height, fixed_ratio)
+    ratio = max(ratio, min(MIN_CANVAS_SIZE / longest, fixed_ratio))
+    return OcrSizing((x_min, y_min, x_max, y_max), max(1, int(math.ceil(ratio * longest))), ratio, char_height)
+
+
+def offset_results(ocr_result, dx, dy):
+    """裁剪区域内的识别结果换算回原图坐标"""
+    if not dx and not dy:
+        return ocr_result
+    return [([[point[0] + dx, point[1] + dy] for point in bbox], *rest) for bbox, *rest in ocr_result]
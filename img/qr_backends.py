@@ -0,0 +1,167 @@
+"""
+二维码检测后端
+
+各后端统一为 detect(img) -> [QrCode, ...]，模糊（img/ImageScale.py）与检测（img/image_detect_qr.py）都通过
+get_qr_backend() 取得后端，使用哪个后端在 config.qr_backend 中配置。
+用 python -m bench.qr_backends 在基准素材上对比各后端的检出率与耗时后再选择。
+
+- opencv：cv2.QRCodeDetector
+- opencv_aruco：cv2.QRCodeDetectorAruco（OpenCV 4.8+，默认；基准素材上检出率与速度都优于 opencv）
+- pyzbar：需要安装 pyzbar 和 zbar 动态库
+- zxing：需要安装 zxing-cpp
+"""
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from config import qr_backend
+
+
+class QrCode:
+    """检测结果：内容、类型、顶点坐标 [(x, y), ...]（未能解码时内容为空字符串）"""
+    __slots__ = ('data', 'type', 'points')
+
+    def __init__(self, data, type, points):
+        self.data = data
+        self.type = type
+        self.points = points
+
+    def bounding_box(self):
+        """外接矩形 (x_min, y_min, x_max, y_max)"""
+        xs = [x for x, _ in self.points]
+        ys = [y for _, y in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def to_dict(self):
+        return {'data': self.data, 'type': self.type, 'points': [list(point) for point in self.points]}
+
+
+class QrBackend:
+    """检测后端基类"""
+    name = None
+    # 是否直接接受彩色图（不接受的后端内部转灰度，多轮检测时跳过彩色原图这一轮）
+    accepts_color = True
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def detect(self, img):
+        raise NotImplementedError
+
+
+def _to_gray(img):
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+
+
+class OpenCvBackend(QrBackend):
+    name = 'opencv'
+
+    def __init__(self):
+        # 检测器不能多线程共用，每个线程一个
+        self.local = threading.local()
+
+    def _create_detector(self):
+        return cv2.QRCodeDetector()
+
+    def detect(self, img):
+        detector = getattr(self.local, 'detector', None)
+        if detector is None:
+            detector = self.local.detector = self._create_detector()
+        retval, decoded, points, _ = detector.detectAndDecodeMulti(img)
+        if not retval or points is None:
+            return []
+        return [QrCode(data, 'QRCODE', [(int(x), int(y)) for x, y in np.int32(quad)])
+                for data, quad in zip(decoded, points)]
+
+
+class OpenCvArucoBackend(OpenCvBackend):
+    name = 'opencv_aruco'
+
+    @classmethod
+    def available(cls):
+        return hasattr(cv2, 'QRCodeDetectorAruco')
+
+    def _create_detector(self):
+        return cv2.QRCodeDetectorAruco()
+
+
+class PyzbarBackend(QrBackend):
+    name = 'pyzbar'
+    accepts_color = False
+
+    @classmethod
+    def available(cls):
+        try:
+            _import_pyzbar()
+        except (ImportError, OSError):
+            return False
+        return True
+
+    def detect(self, img):
+        decode, symbol = _import_pyzbar()
+        # 只识别二维码，商品条形码不处理
+        return [QrCode(code.data.decode('utf-8', errors='replace'), code.type,
+                       [(point.x, point.y) for point in code.polygon])
+                for code in decode(_to_gray(img), symbols=[symbol.QRCODE])]
+
+
+def _import_pyzbar():
+    # Homebrew 安装的 zbar 不在默认搜索路径中
+    os.environ["DYLD_LIBRARY_PATH"] = "/opt/homebrew/lib:" + os.environ.get("DYLD_LIBRARY_PATH", "")
+    from pyzbar.pyzbar import decode, ZBarSymbol
+    return decode, ZBarSymbol
+
+
+class ZxingBackend(QrBackend):
+    name = 'zxing'
+
+    @classmethod
+    def available(cls):
+        try:
+            import zxingcpp  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def detect(self, img):
+        import zxingcpp
+        results = []
+        for code in zxingcpp.read_barcodes(img, formats=zxingcpp.BarcodeFormat.QRCode):
+            position = code.position
+            results.append(QrCode(code.text, 'QRCODE', [(point.x, point.y) for point in (
+                position.top_left, position.top_right, position.bottom_right, position.bottom_left)]))
+        return results
+
+
+QR_BACKENDS = {backend.name: backend for backend in (OpenCvBackend, OpenCvArucoBackend, PyzbarBackend, ZxingBackend)}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def available_backends():
+    """当前环境可用的后端名称"""
+    return [name for name, backend in QR_BACKENDS.items() if backend.available()]
+
+
+def default_backend_name():
+    """config.qr_backend，当前环境不可用时（如OpenCV低于4.8没有Aruco检测器）退回 opencv"""
+    if qr_backend in QR_BACKENDS and not QR_BACKENDS[qr_backend].available():
+        return OpenCvBackend.name
+    return qr_backend
+
+
+def get_qr_backend(name=None):
+    """取得后端实例（进程内共用），未指定时使用 default_backend_name()"""
+    name = name or default_backend_name()
+    if name not in QR_BACKENDS:
+        raise ValueError(f"未知的二维码检测后端: {name}，可选：{', '.join(QR_BACKENDS)}")
+    with _instances_lock:
+        if name not in _instances:
+            if not QR_BACKENDS[name].available():
+                raise ValueError(f"二维码检测后端 {name} 不可用（缺少依赖），可用：{', '.join(available_backends())}")
+            _instances[name] = QR_BACKENDS[name]()
+        return _instances[name]
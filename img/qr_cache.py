@@ -0,0 +1,188 @@
+"""
+二维码区域缓存
+
+供应商的同一张商品图常在多个SKU中重复使用，缓存检测到的二维码区域，相同或几乎相同的图片不再重复整图检测。
+- 像素内容摘要（SHA1）+ 尺寸相同才是完全命中，直接使用缓存结果
+- 感知哈希（256位差值哈希）相差不超过 qr_cache_max_distance 位的近似图片（如重新压缩）返回缓存区域，
+  由调用方在缓存区域内复核；17x16 的差值哈希很粗，大照片上贴一个小二维码哈希可能完全不变，
+  重新压缩与贴上/去掉二维码造成的差异位数也相当，哈希相同（差异为0）同样只算近似命中，不能直接采信
+- 保存在SQLite文件中，多个进程（命令行并行处理）共用，超过上限时淘汰最久未使用的记录
+- 记录检测参数的指纹，检测参数变化后旧记录失效
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from config import qr_cache_path, qr_cache_max_entries, qr_cache_max_distance
+from metrics import timer, count
+
+# 哈希分为8段建索引：差异不超过7位时至少有一段完全相同，据此查找近似图片
+_BANDS = 8
+# 每写入多少条检查一次是否超出上限
+_EVICT_INTERVAL = 100
+# 表结构版本，变化时重建缓存表
+_SCHEMA_VERSION = 2
+
+
+def image_hash(img, hash_size=16):
+    """差值哈希：缩小为 (hash_size+1) x hash_size 灰度图，比较相邻像素明暗，返回16进制字符串"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits).tobytes().hex()
+
+
+def content_digest(img):
+    """像素内容摘要（含尺寸、通道），用于判断完全相同的图片"""
+    digest = hashlib.sha1(str(img.shape).encode('ascii'))
+    digest.update(np.ascontiguousarray(img).data)
+    return digest.hexdigest()
+
+
+def hamming_distance(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+def params_fingerprint(params):
+    """检测参数的指纹"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _bands(hash_hex):
+    size = len(hash_hex) // _BANDS
+    return [hash_hex[i * size:(i + 1) * size] for i in range(_BANDS)]
+
+
+class QrRegionCache:
+    """二维码区域缓存，区域为 [(x_min, y_min, x_max, y_max), ...]，空列表表示图片中没有二维码"""
+
+    def __init__(self, path, params, max_entries=qr_cache_max_entries, max_distance=qr_cache_max_distance):
+        self.path = path
+        self.fingerprint = params_fingerprint(params)
+        self.max_entries = max_entries
+        self.max_distance = min(max_distance, _BANDS - 1)
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.conn = None
+        self.pid = None
+
+    def _connect(self):
+        # 连接不能跨进程使用，fork出的子进程重新连接
+        if self.conn is not None and self.pid == os.getpid():
+            return self.conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS qr_regions")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        band_columns = ''.join(f", b{i} TEXT NOT NULL" for i in range(_BANDS))
+        conn.execute("CREATE TABLE IF NOT EXISTS qr_regions (digest TEXT NOT NULL, hash TEXT NOT NULL, "
+                     "size TEXT NOT NULL, params TEXT NOT NULL, boxes TEXT NOT NULL, last_used REAL NOT NULL"
+                     f"{band_columns}, PRIMARY KEY (size, digest))")
+        conn.execute("CREATE INDEX IF NOT EXISTS qr_regions_last_used ON qr_regions (last_used)")
+        for i in range(_BANDS):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS qr_regions_b{i} ON qr_regions (size, b{i})")
+        # 检测参数变化：清除旧记录
+        conn.execute("DELETE FROM qr_regions WHERE params != ?", (self.fingerprint,))
+        conn.commit()
+        self.conn, self.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def key(img):
+        """缓存键：(尺寸, 感知哈希, 内容摘要)"""
+        height, width = img.shape[:2]
+        return f"{width}x{height}", image_hash(img), content_digest(img)
+
+    def get(self, key):
+        """
+        返回 (区域列表, 是否完全命中)，未命中返回None
+
+        完全命中为像素内容相同，区域可直接使用；否则为感知哈希相近的图片（哈希可能完全相同），区域需要复核
+        """
+        size, hash_hex, digest = key
+        with self.lock, timer('img.qr_cache_get'):
+            conn = self._connect()
+            row = conn.execute("SELECT digest, boxes FROM qr_regions WHERE size = ? AND digest = ? AND params = ?",
+                               (size, digest, self.fingerprint)).fetchone()
+            exact = row is not None
+            if row is None:
+                row = self._nearest(conn, size, hash_hex)
+            if row is None:
+                count('img.qr_cache_miss')
+                return None
+            conn.execute("UPDATE qr_regions SET last_used = ? WHERE size = ? AND digest = ?",
+                         (time.time(), size, row[0]))
+            conn.commit()
+        count('img.qr_cache_hit' if exact else 'img.qr_cache_near_hit')
+        return [tuple(box) for box in json.loads(row[1])], exact
+
+    def _nearest(self, conn, size, hash_hex):
+        """按分段索引查找感知哈希差异位数最少的近似记录"""
+        conditions = ' OR '.join(f"b{i} = ?" for i in range(_BANDS))
+        rows = conn.execute(f"SELECT digest, boxes, hash FROM qr_regions WHERE size = ? AND params = ? "
+                            f"AND ({conditions})", (size, self.fingerprint, *_bands(hash_hex))).fetchall()
+        best, best_distance = None, self.max_distance + 1
+        for row in rows:
+            distance = hamming_distance(row[2], hash_hex)
+            if distance < best_distance:
+                best, best_distance = row, distance
+        return best
+
+    def put(self, key, boxes):
+        size, hash_hex, digest = key
+        with self.lock:
+            conn = self._connect()
+            band_columns = ''.join(f", b{i}" for i in range(_BANDS))
+            conn.execute(f"INSERT OR REPLACE INTO qr_regions (digest, hash, size, params, boxes, last_used"
+                         f"{band_columns}) VALUES (?, ?, ?, ?, ?, ?{', ?' * _BANDS})",
+                         (digest, hash_hex, size, self.fingerprint, json.dumps([list(map(int, box)) for box in boxes]),
+                          time.time(), *_bands(hash_hex)))
+            self.writes += 1
+            if self.writes % _EVICT_INTERVAL == 0:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        """淘汰最久未使用的记录"""
+        total = conn.execute("SELECT COUNT(*) FROM qr_regions").fetchone()[0]
+        if total > self.max_entries:
+            conn.execute("DELETE FROM qr_regions WHERE rowid IN "
+                         "(SELECT rowid FROM qr_regions ORDER BY last_used LIMIT ?)", (total - self.max_entries,))
+
+    def clear(self):
+        with self.lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM qr_regions")
+            conn.commit()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+_enabled = True
+
+
+def enable_qr_cache(flag=True):
+    """开启/关闭缓存（基准测试、命令行 --no-qr-cache 时关闭）"""
+    global _enabled
+    _enabled = flag
+
+
+def get_qr_cache(params):
+    """按检测参数取共享的缓存实例，关闭缓存或 config.qr_cache_path 为空时返回None"""
+    if not _enabled or not qr_cache_path:
+        return None
+    fingerprint = params_fingerprint(params)
+    with _caches_lock:
+        if fingerprint not in _caches:
+            _caches[fingerprint] = QrRegionCache(qr_cache_path, params)
+        return _caches[fingerprint]
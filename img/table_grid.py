@@ -0,0 +1,139 @@
+"""
+表格框线检测：用形态学运算找出横线、竖线，得到单元格位置
+
+供 image_ocr.recognize_table_cells 使用：整张图只检测一次框线，再把每个单元格的区域交给识别模型，
+不再对整图做文字检测后按坐标猜行列。
+
+- 只处理有框线的表格（进货单、送货单），合并的列（横向跨多列的单元格）按缺少竖线合并
+- 空白单元格标记为空，不送去识别
+- 间距容不下单元格的相邻框线（双线边框）合并为一条，不产生空行、空列
+"""
+import cv2
+import numpy as np
+
+from img.ocr_layout import cluster_bounds
+from metrics import timer
+
+# 框线最短长度占图片宽/高的比例
+LINE_LENGTH_RATIO = 1 / 30
+# 框线在投影中的覆盖率：不低于最长框线的该比例才算表格线（部分行没有竖线时仍能识别该列）
+LINE_COVERAGE_RATIO = 0.3
+# 横线长度至少为表格宽度（最左、最右竖线之间）的该比例，排除照片中色块边缘等短线
+ROW_LINE_SPAN_RATIO = 0.6
+# 单元格内缩像素，避免把框线裁进识别区域
+CELL_INSET = 3
+# 单元格内文字像素少于该值视为空白
+MIN_INK_PIXELS = 12
+
+
+class TableCell:
+    """单元格：所在行、起始列、跨列数，以及图片中的区域 (x_min, x_max, y_min, y_max)"""
+    __slots__ = ('row', 'col', 'span', 'box', 'empty')
+
+    def __init__(self, row, col, span, box, empty):
+        self.row = row
+        self.col = col
+        self.span = span
+        self.box = box
+        self.empty = empty
+
+
+class TableGrid:
+    """框线检测结果：横线、竖线的位置（线宽范围）与单元格列表"""
+
+    def __init__(self, rows, cols, cells):
+        self.rows = rows
+        self.cols = cols
+        self.cells = cells
+
+    @property
+    def row_count(self):
+        return max(0, len(self.rows) - 1)
+
+    @property
+    def col_count(self):
+        return max(0, len(self.cols) - 1)
+
+    def to_table(self, texts):
+        """按单元格文本（与 cells 顺序相同）组成二维表，跨列单元格的文本放在起始列"""
+        table = [[''] * self.col_count for _ in range(self.row_count)]
+        for cell, text in zip(self.cells, texts):
+            table[cell.row][cell.col] = text
+        return table
+
+
+def _binarize(gray):
+    # 深色框线与文字为前景（白）
+    return cv2.adaptiveThreshold(cv2.bitwise_not(gray), 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 15, -2)
+
+
+def _line_positions(mask, axis):
+    """框线掩码按方向投影，返回每条线的 (起始, 结束) 坐标数组"""
+    profile = np.count_nonzero(mask, axis=axis)
+    if profile.max(initial=0) == 0:
+        return np.zeros((0, 2), dtype=np.intp)
+    # 相邻的像素行/列属于同一条（有宽度的）线
+    positions = np.flatnonzero(profile >= profile.max() * LINE_COVERAGE_RATIO)
+    lower, upper = cluster_bounds(positions, threshold=1, mode='gap')
+    return np.stack([lower, upper], axis=1).astype(np.intp)
+
+
+def _merge_close_lines(lines):
+    """间距不超过 2 * CELL_INSET 的相邻框线（双线）合并为一条"""
+    merged = []
+    for low, high in lines:
+        if merged and low - merged[-1][1] - 1 <= 2 * CELL_INSET:
+            merged[-1][1] = high
+        else:
+            merged.append([low, high])
+    return np.array(merged, dtype=np.intp).reshape(-1, 2)
+
+
+def detect_table_grid(gray):
+    """检测灰度图中的表格框线，横线少于2条或竖线少于3条（不是有框线的表格）时返回None"""
+    height, width = gray.shape[:2]
+    with timer('ocr.table_grid'):
+        binary = _binarize(gray)
+        horizontal = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(
+            cv2.MORPH_RECT, (max(10, int(width * LINE_LENGTH_RATIO)), 1)))
+        vertical = cv2.morphologyEx(binary, cv2.MORPH_OPEN, cv2.getStructuringElement(
+            cv2.MORPH_RECT, (1, max(10, int(height * LINE_LENGTH_RATIO)))))
+        rows = _line_positions(horizontal, axis=1)
+        cols = _merge_close_lines(_line_positions(vertical, axis=0))
+        # 至少两列：只有左右两条边框的长条图（xq详情图）不是表格
+        if len(rows) < 2 or len(cols) < 3:
+            return None
+        # 表格的横线贯穿整个表格宽度
+        table_width = cols[-1][1] - cols[0][0]
+        row_lengths = np.array([np.count_nonzero(horizontal[low:high + 1, cols[0][0]:cols[-1][1] + 1].max(axis=0))
+                                for low, high in rows])
+        rows = _merge_close_lines(rows[row_lengths >= table_width * ROW_LINE_SPAN_RATIO])
+        if len(rows) < 2:
+            return None
+
+        # 去掉框线后剩下的是文字，用于判断空白单元格
+        text_mask = cv2.subtract(binary, cv2.bitwise_or(horizontal, vertical))
+        cells = []
+        for row in range(len(rows) - 1):
+            top, bottom = rows[row][1] + 1, rows[row + 1][0]
+            col = 0
+            while col < len(cols) - 1:
+                # 右侧竖线在本行缺失时与下一列合并（跨列单元格）
+                end = col + 1
+                while end < len(cols) - 1 and not _has_separator(vertical, cols[end], top, bottom):
+                    end += 1
+                left, right = cols[col][1] + 1, cols[end][0]
+                box = (int(left + CELL_INSET), int(right - CELL_INSET), int(top + CELL_INSET), int(bottom - CELL_INSET))
+                if box[1] > box[0]:
+                    ink = cv2.countNonZero(text_mask[box[2]:box[3], box[0]:box[1]])
+                    cells.append(TableCell(row, col, end - col, box, ink < MIN_INK_PIXELS))
+                col = end
+    return TableGrid(rows, cols, cells)
+
+
+def _has_separator(vertical, line, top, bottom):
+    """竖线在 [top, bottom) 范围内是否存在（覆盖过半）"""
+    segment = vertical[top:bottom, max(0, line[0] - 1):line[1] + 2]
+    if segment.size == 0:
+        return False
+    return np.count_nonzero(segment.max(axis=1)) >= (bottom - top) / 2
@@ -0,0 +1,256 @@
+"""
+各处理阶段的计时、计数与数值样本
+
+用法：
+    from metrics import timer, timed, count, record
+
+    with timer('img.qr_detect'):
+        ...
+
+    @timed('ocr.readtext')
+    def recognize(...):
+        ...
+
+    count('img.qr_found')
+    record('asr.rtf.whisper', 0.8)  # 非耗时的数值（如实时率），单独汇总，不按秒/毫秒显示
+
+默认关闭，关闭时 timer() 返回共享的空上下文，几乎没有额外开销。
+开启方式：
+    - 代码中调用 metrics.enable()（命令行 --metrics 参数、基准测试会自动开启）
+    - 设置环境变量 QC_METRICS=报告路径，任意入口（含界面）退出时写出报告
+报告按后缀选择格式：.prom/.txt 为 Prometheus 文本格式，其余为JSON
+"""
+import atexit
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+_enabled = False
+_lock = threading.Lock()
+# 阶段名 -> 耗时样本（秒）
+_timings = defaultdict(list)
+# 计数器名 -> 累计值
+_counters = defaultdict(int)
+# 数值名 -> 样本（无单位）
+_values = defaultdict(list)
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled():
+    return _enabled
+
+
+class _NullTimer:
+    """关闭统计时使用的空计时器"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def timer(name):
+    """统计一个代码块的耗时"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name)
+
+
+def timed(name):
+    """统计函数耗时的装饰器"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def observe(name, seconds):
+    """记录一次耗时样本"""
+    if not _enabled:
+        return
+    with _lock:
+        _timings[name].append(seconds)
+
+
+def count(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] += value
+
+
+def record(name, value):
+    """记录一个数值样本（不是耗时，如实时率、压缩比）"""
+    if not _enabled:
+        return
+    with _lock:
+        _values[name].append(value)
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+        _values.clear()
+
+
+def drain():
+    """取出当前进程的原始数据并清空，用于把工作进程的数据汇总到主进程"""
+    with _lock:
+        raw = {'timings': dict(_timings), 'counters': dict(_counters), 'values': dict(_values)}
+        _timings.clear()
+        _counters.clear()
+        _values.clear()
+    return raw
+
+
+def merge(raw):
+    """合并 drain() 得到的数据"""
+    if not raw:
+        return
+    with _lock:
+        for name, samples in raw.get('timings', {}).items():
+            _timings[name].extend(samples)
+        for name, value in raw.get('counters', {}).items():
+            _counters[name] += value
+        for name, samples in raw.get('values', {}).items():
+            _values[name].extend(samples)
+
+
+def _percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(q * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+
+def snapshot():
+    """汇总当前数据：每个阶段的次数、总耗时、p50/p95/max（毫秒），以及数值样本的次数、合计、均值、p50/p95/max"""
+    with _lock:
+        timings = {name: sorted(samples) for name, samples in _timings.items()}
+        counters = dict(_counters)
+        values = {name: sorted(samples) for name, samples in _values.items()}
+
+    stages = {}
+    for name, samples in sorted(timings.items()):
+        total = sum(samples)
+        stages[name] = {
+            'count': len(samples),
+            'total_s': round(total, 4),
+            'mean_ms': round(total * 1000 / len(samples), 3) if samples else 0.0,
+            'p50_ms': round(_percentile(samples, 0.5) * 1000, 3),
+            'p95_ms': round(_percentile(samples, 0.95) * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+        }
+    value_stats = {}
+    for name, samples in sorted(values.items()):
+        value_stats[name] = {
+            'count': len(samples),
+            'total': round(sum(samples), 4),
+            'mean': round(sum(samples) / len(samples), 4) if samples else 0.0,
+            'p50': round(_percentile(samples, 0.5), 4),
+            'p95': round(_percentile(samples, 0.95), 4),
+            'max': round(samples[-1], 4) if samples else 0.0,
+        }
+    return {'stages': stages, 'counters': dict(sorted(counters.items())), 'values': value_stats}
+
+
+def to_json():
+    return json.dumps(snapshot(), ensure_ascii=False, indent=2)
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name)
+
+
+def to_prometheus(prefix='qc'):
+    """Prometheus 文本格式：阶段耗时、数值样本为 summary，计数器为 counter"""
+    data = snapshot()
+    lines = [
+        f"# HELP {prefix}_stage_seconds 处理阶段耗时",
+        f"# TYPE {prefix}_stage_seconds summary",
+    ]
+    for name, stage in data['stages'].items():
+        for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('1', 'max_ms')):
+            lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {stage[key] / 1000:.6f}')
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["total_s"]:.6f}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+    for name, value in data['counters'].items():
+        metric = f"{prefix}_{_metric_name(name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, stats in data['values'].items():
+        metric = f"{prefix}_{_metric_name(name)}"
+        lines.append(f"# TYPE {metric} summary")
+        for quantile, key in (('0.5', 'p50'), ('0.95', 'p95'), ('1', 'max')):
+            lines.append(f'{metric}{{quantile="{quantile}"}} {stats[key]:.6f}')
+        lines.append(f"{metric}_sum {stats['total']:.6f}")
+        lines.append(f"{metric}_count {stats['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_report(path):
+    """按文件后缀写出 Prometheus 文本（.prom/.txt）或 JSON 报告"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    content = to_prometheus() if path.lower().endswith(('.prom', '.txt')) else to_json()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+
+
+def format_summary():
+    """可读的汇总文本，用于日志输出"""
+    data = snapshot()
+    lines = [f"{name}: {stage['count']}次 p50={stage['p50_ms']:.1f}ms p95={stage['p95_ms']:.1f}ms "
+             f"max={stage['max_ms']:.1f}ms 合计={stage['total_s']:.2f}s"
+             for name, stage in data['stages'].items()]
+    lines.extend(f"{name}: {value}" for name, value in data['counters'].items())
+    lines.extend(f"{name}: {stats['count']}次 均值={stats['mean']:.3f} p50={stats['p50']:.3f} p95={stats['p95']:.3f} "
+                 f"max={stats['max']:.3f}" for name, stats in data['values'].items())
+    return "\n".join(lines)
+
+
+# 通过环境变量开启：进程退出时写出报告
+_report_path = os.environ.get('QC_METRICS')
+if _report_path:
+    enable()
+    atexit.register(write_report, _report_path)
@@ -0,0 +1,269 @@
+"""
+模型运行时管理：设备选择、线程预算、预热与稳态延迟基准
+
+- 设备：config.model_devices 按模型类别（asr / ocr）指定 auto / cpu / cuda / mps，
+  auto 依次选择可用的 CUDA、MPS，都不可用时为 CPU；指定的设备不可用时退回 CPU
+- 线程：PyTorch、OpenCV 的计算线程数在每个进程开始时设置一次（config.model_threads，0 为 CPU核数/进程数），
+  多个进程各自按全部核数开线程会互相争抢；同一进程中多个模型实例在各自线程中同时推理时（分段识别、批量识别、
+  图片识别窗口的多个识别线程），再按实例数平分本进程的线程预算
+- 预热：模型加载后用一小段合成输入推理一次（config.model_warmup），首次推理的内存分配、算子初始化不计入第一个文件
+
+本机各模型的稳态延迟：python -m model_runtime --benchmark ocr,asr
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from config import model_devices, model_threads, model_interop_threads, easyocr_model_path, whisper_model_path
+from file.file_utils import print_log
+from metrics import timer
+
+DEVICES = ('auto', 'cpu', 'cuda', 'mps')
+MODEL_KINDS = ('asr', 'ocr')
+
+
+def available_devices():
+    """本机可用的 PyTorch 设备"""
+    try:
+        import torch
+    except ImportError:
+        return ['cpu']
+    devices = ['cpu']
+    if torch.cuda.is_available():
+        devices.append('cuda')
+    mps = getattr(torch.backends, 'mps', None)
+    if mps is not None and mps.is_available() and mps.is_built():
+        devices.append('mps')
+    return devices
+
+
+def select_device(kind, preference=None, supported=('cpu', 'cuda', 'mps')):
+    """
+    选择模型运行的设备；preference 为None时按 config.model_devices[kind]，
+    supported 为该推理框架支持的设备（如 CTranslate2 不支持 mps）
+    """
+    preference = preference or model_devices.get(kind, 'cpu')
+    if preference not in DEVICES:
+        raise ValueError(f"未知的设备: {preference}（可选：{', '.join(DEVICES)}）")
+    available = [device for device in available_devices() if device in supported]
+    if preference == 'auto':
+        return next((device for device in ('cuda', 'mps') if device in available), 'cpu')
+    return preference if preference in available else 'cpu'
+
+
+def densify_sparse(model):
+    """稀疏权重、缓冲转为密集张量（MPS 不支持稀疏张量），需在CPU上调用"""
+    import torch
+    for _, module in model.named_modules():
+        if hasattr(module, "weight") and isinstance(module.weight, torch.Tensor) and module.weight.is_sparse:
+            module.weight = torch.nn.Parameter(module.weight.to_dense())
+        for buf_name, buf in module.named_buffers(recurse=False):
+            if isinstance(buf, torch.Tensor) and buf.is_sparse:
+                setattr(module, buf_name, buf.to_dense())
+    return model
+
+
+# 当前进程的线程预算（configure_threads 设置），未设置时为CPU核数
+_process_threads = None
+
+
+def thread_budget(parallel=1):
+    """
+    每个并行单元（工作进程，或同一进程中同时推理的模型实例）的计算线程数：config.model_threads，
+    为0时按 本进程的线程预算（未设置时为CPU核数）/ 并行数
+    """
+    return model_threads or max(1, (_process_threads or os.cpu_count() or 1) // max(1, parallel))
+
+
+def configure_threads(threads, interop_threads=None, parallel=1):
+    """
+    设置当前进程的线程预算为 threads（在导入 torch 之前调用时 OpenMP 环境变量也会生效）；
+    parallel 为本进程中同时推理的模型实例数，PyTorch/OpenCV 每次推理的线程数为 threads / parallel
+
+    PyTorch 的 interop 线程数只能在开始并行计算之前设置，之后调用时保持原值
+    """
+    global _process_threads
+    _process_threads = threads
+    interop_threads = model_interop_threads if interop_threads is None else interop_threads
+    threads = max(1, threads // max(1, parallel))
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[name] = str(threads)
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        pass
+
+
+# ========== 预热 ==========
+def _text_image():
+    """带英文、数字的合成图片，检测与识别模型都会运行"""
+    image = np.full((96, 480), 255, dtype=np.uint8)
+    cv2.putText(image, 'QcHelper 2025', (12, 64), cv2.FONT_HERSHEY_SIMPLEX, 1.6, 0, 3)
+    return image
+
+
+def _speech_wav(path, seconds=2.0):
+    """
+    类语音的合成音频：基频在120~180Hz间起伏的谐波（声带振动）叠加少量噪声，按约4Hz的音节包络起伏；
+    纯正弦音会被 faster_whisper 的VAD整段丢弃，编码器、解码器都不会运行
+    """
+    from video.asr_chunking import SAMPLE_RATE, write_wav
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 150 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    # 谐波幅度在 500Hz、1500Hz 附近（前两个共振峰）较大
+    voice = sum(np.sin(k * phase) * (np.exp(-((k * 150 - 500) / 300) ** 2) + 0.5 * np.exp(-((k * 150 - 1500) / 400) ** 2))
+                for k in range(1, 20))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 0.5
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.02
+    samples = voice * syllables / np.max(np.abs(voice)) * 0.5 + noise
+    write_wav(path, samples.astype(np.float32))
+
+
+def warm_up_reader(reader):
+    """EasyOCR 预热：识别一张合成图片"""
+    with timer('runtime.warmup.ocr'):
+        reader.readtext(_text_image(), detail=1)
+
+
+def warm_up_asr(backend):
+    """语音识别预热：识别一段合成音频（分段识别时每个模型实例各一次），关闭VAD保证编码器、解码器都运行"""
+    temp_dir = tempfile.mkdtemp(prefix='asr_warmup_')
+    path = os.path.join(temp_dir, 'warmup.wav')
+    try:
+        _speech_wav(path)
+        with timer('runtime.warmup.asr'):
+            for model in getattr(backend, 'backends', [backend]):
+                model.transcribe(path, language='zh', vad=False)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        os.rmdir(temp_dir)
+
+
+# ========== 稳态延迟基准 ==========
+def _percentile_ms(timings, q):
+    ordered = sorted(timings)
+    return round(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))] * 1000, 1)
+
+
+def _measure(load, warm_up, run, repeat):
+    start = time.perf_counter()
+    model = load()
+    load_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    warm_up(model)
+    warmup_seconds = time.perf_counter() - start
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(model)
+        timings.append(time.perf_counter() - start)
+    return model, {
+        'load_s': round(load_seconds, 2),
+        'warmup_s': round(warmup_seconds, 2),
+        'p50_ms': round(statistics.median(timings) * 1000, 1),
+        'p95_ms': _percentile_ms(timings, 95),
+    }
+
+
+def benchmark_ocr(repeat=5, model_dir=easyocr_model_path, image=None):
+    """EasyOCR：加载、预热耗时，以及之后 readtext 的延迟"""
+    from img.ocr_runtime import create_reader
+    image = _text_image() if image is None else image
+    reader, result = _measure(lambda: create_reader(model_dir=model_dir, warm_up=False), warm_up_reader,
+                              lambda reader: reader.readtext(image, detail=1), repeat)
+    threads = getattr(reader.detector, 'threads', None)
+    if threads is None:
+        result['device'], result['threads'] = f"torch/{getattr(reader, 'device', 'cpu')}", _torch_threads()
+    else:
+        # ONNX Runtime 的 intra_op_num_threads，0 为按物理核数
+        result['device'], result['threads'] = 'onnx/cpu', threads or 'auto'
+    return result
+
+
+def benchmark_asr(repeat=5, model_path=whisper_model_path, audio_path=None):
+    """语音识别（config.asr_backend）：加载、预热耗时，以及之后识别 audio_path（默认合成的2秒音频）的延迟"""
+    from video.asr_backends import load_asr_backend
+    temp_dir = None
+    if audio_path is None:
+        temp_dir = tempfile.mkdtemp(prefix='asr_bench_')
+        audio_path = os.path.join(temp_dir, 'bench.wav')
+        _speech_wav(audio_path)
+    try:
+        # 关闭VAD：测的是模型推理的延迟（合成音频会被VAD丢弃）
+        backend, result = _measure(lambda: load_asr_backend(model_path, chunk_workers=0, warm_up=False), warm_up_asr,
+                                   lambda backend: backend.transcribe(audio_path, language='zh', vad=False), repeat)
+    finally:
+        if temp_dir:
+            os.remove(audio_path)
+            os.rmdir(temp_dir)
+    result['device'] = f"{backend.name}/{backend.device}"
+    # faster_whisper 为 CTranslate2 的 cpu_threads（0 为其默认值），whisper 为 PyTorch 线程数
+    threads = getattr(backend, 'cpu_threads', None)
+    result['threads'] = _torch_threads() if threads is None else threads or 'auto'
+    return result
+
+
+def _torch_threads():
+    import torch
+    return torch.get_num_threads()
+
+
+def benchmark(kinds=MODEL_KINDS, repeat=5, audio_path=None, log=print_log):
+    """
+    返回 {模型类别: {device, threads, load_s, warmup_s, p50_ms, p95_ms}}，缺少依赖的类别记录 skipped；
+    threads 为实际使用的推理运行时（PyTorch / ONNX Runtime / CTranslate2）的线程数
+    """
+    results = {}
+    for kind in kinds:
+        log(f"测试 {kind} ...")
+        try:
+            results[kind] = benchmark_ocr(repeat) if kind == 'ocr' else benchmark_asr(repeat, audio_path=audio_path)
+        except (ImportError, ValueError) as e:
+            results[kind] = {'skipped': str(e) if isinstance(e, ValueError) else f"缺少依赖: {e}"}
+    return results
+
+
+def print_benchmark(results):
+    print(f"{'模型':<6}{'设备':>22}{'线程':>6}{'加载s':>8}{'预热s':>8}{'p50ms':>10}{'p95ms':>10}")
+    for kind, result in results.items():
+        if 'skipped' in result:
+            print(f"{kind:<6}  跳过：{result['skipped']}")
+            continue
+        print(f"{kind:<6}{result['device']:>22}{result['threads']:>6}{result['load_s']:>8.2f}{result['warmup_s']:>8.2f}"
+              f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog='python -m model_runtime', description='本机模型设备、线程与稳态延迟')
+    parser.add_argument('--benchmark', default=','.join(MODEL_KINDS), help='逗号分隔：ocr / asr')
+    parser.add_argument('--repeat', type=int, default=5, help='预热后重复推理次数')
+    parser.add_argument('--threads', type=int, default=None, help='计算线程数（默认 config.model_threads）')
+    parser.add_argument('--audio', default=None, help='asr 使用的WAV音频（默认合成的2秒音频）')
+    parser.add_argument('--output', help='结果写入JSON文件')
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.benchmark.split(',') if kind.strip()]
+    unknown = [kind for kind in kinds if kind not in MODEL_KINDS]
+    if unknown:
+        parser.error(f"未知模型类别: {', '.join(unknown)}（可选：{', '.join(MODEL_KINDS)}）")
+    configure_threads(args.threads or thread_budget())
+    print(f"可用设备：{', '.join(available_devices())}；设备配置：{model_devices}")
+    benchmark_results = benchmark(kinds, args.repeat, args.audio)
+    print_benchmark(benchmark_results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(benchmark_results, f, ensure_ascii=False, indent=2)
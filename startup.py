@@ -9,6 +9,7 @@ from img.splitter_app import ImageSplitterApp
 from video.flac_mp3_app import AudioConverterGUI
 from video.get_text_app import VideoToTextApp
 from video.mp4_wav_text import VideoToTextApp2
+from ui.job_dispatcher import get_dispatcher
 
 
 class NormalApp:
@@ -19,6 +20,9 @@ class NormalApp:
         # 允许窗体缩放（自适应的前提）
         self.root.resizable(True, True)
 
+        # 所有功能窗口共用的后台任务调度器（日志/进度在主线程按固定节拍批量刷新）
+        self.dispatcher = get_dispatcher(root)
+
         # ========== 主容器 ==========
         self.main_container = ttk.Frame(root)
         # 移除额外边距，让主容器铺满窗体（仅保留2px边距做边界）
@@ -216,17 +220,17 @@ class NormalApp:
         new_win.geometry("300x200")
         ttk.Label(new_win, text="这是新建的普通窗口", font=("微软雅黑", 12)).pack(expand=True)
 
+    def open_window(self, app_class):
+        """以Toplevel子窗口打开功能窗体，所有窗体共用主窗口的事件循环与任务调度器"""
+        _root = tk.Toplevel(self.root)
+        app_class(_root)
+        return _root
+
     def image_scale(self):
-        # 不要创建新的Tk()实例，而是使用Toplevel作为子窗口
-        _root = tk.Toplevel()  # 改为Toplevel，继承主窗口的事件循环
-        ImageScaleApp(_root)
-        # 确保子窗口正确显示
-        _root.mainloop()  # 如果需要独立运行子窗口的事件循环
+        self.open_window(ImageScaleApp)
 
     def image_split(self):
-        _root = tk.Toplevel()  # 改为Toplevel，继承主窗口的事件循环
-        ImageSplitterApp(_root)
-        _root.mainloop()
+        self.open_window(ImageSplitterApp)
 
     def image_qrcode_detect(self):
         messagebox.showinfo("提示", "检测二维码功能已触发！")
@@ -235,24 +239,16 @@ class NormalApp:
         messagebox.showinfo("提示", "视频移除水印功能已触发！")
 
     def video_extract_text(self):
-        _root = tk.Toplevel()  # 改为Toplevel，继承主窗口的事件循环
-        VideoToTextApp(_root)
-        root.mainloop()
+        self.open_window(VideoToTextApp)
 
     def video_wav_extract_text(self):
-        _root = tk.Toplevel()  # 改为Toplevel，继承主窗口的事件循环
-        VideoToTextApp2(_root)
-        root.mainloop()
+        self.open_window(VideoToTextApp2)
 
     def image_extract_text(self):
-        _root = tk.Toplevel()  # 改为Toplevel，继承主窗口的事件循环
-        EasyOCRGUI(_root)
-        root.mainloop()
+        self.open_window(EasyOCRGUI)
 
     def convert_flac_2_mp3(self):
-        _root = tk.Toplevel()
-        AudioConverterGUI(_root)
-        _root.mainloop()
+        self.open_window(AudioConverterGUI)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+"""能量VAD（video/asr_chunking.detect_speech）：合成音频上的语音段检测"""
+import numpy as np
+
+from video.asr_chunking import SAMPLE_RATE, detect_speech
+
+RNG = np.random.default_rng(0)
+
+
+def _voice(seconds, level=0.3):
+    """类语音信号：噪声按约4Hz的音节包络起伏（音节间不完全静音）"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.35 + 0.65 * np.abs(np.sin(2 * np.pi * 2 * t))
+    return (level * envelope * RNG.standard_normal(len(t))).astype(np.float32)
+
+
+def _music(seconds, level):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    chord = sum(np.sin(2 * np.pi * freq * t) for freq in (220, 277, 330)) / 3
+    return (level * chord).astype(np.float32)
+
+
+def _silence(seconds):
+    return (1e-4 * RNG.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def _rms(samples):
+    return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+
+
+def _total(segments):
+    return sum(end - start for start, end in segments)
+
+
+def test_continuous_voice_is_speech():
+    for seconds in (2, 65):
+        segments = detect_speech(_voice(seconds), min_silence=0.5, max_chunk=30)
+        assert _total(segments) >= seconds * 0.9
+        assert all(end - start <= 30 + 1e-6 for start, end in segments)
+
+
+def test_voice_over_background_music():
+    for music_db in (-6, -10):
+        voice = np.concatenate([np.concatenate([_voice(6), np.zeros(4 * SAMPLE_RATE, np.float32)])
+                                for _ in range(6)])
+        music = _music(len(voice) / SAMPLE_RATE, 1.0)
+        music *= _rms(_voice(6)) * 10 ** (music_db / 20) / _rms(music)
+        segments = detect_speech(voice + music, min_silence=0.5, max_chunk=30)
+        assert _total(segments) >= 36 * 0.9
+
+
+def test_silence_between_speech_is_skipped():
+    samples = np.concatenate([_silence(10), _voice(5), _silence(10), _voice(5), _silence(10)])
+    segments = detect_speech(samples, min_silence=0.5, max_chunk=30)
+    assert len(segments) == 2
+    assert 9 < segments[0][0] < 10.5 and 14.5 < segments[0][1] < 16
+    assert 9 < _total(segments) < 12
+
+
+def test_silence_only():
+    assert detect_speech(np.zeros(5 * SAMPLE_RATE, np.float32)) == []
+    assert detect_speech(np.zeros(100, np.float32)) == []
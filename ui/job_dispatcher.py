@@ -0,0 +1,162 @@
+"""
+界面任务调度器
+
+所有功能窗口共用主窗口的一个事件循环：后台线程/进程只把日志、进度等事件放入线程安全队列，
+由主线程按固定的 after() 节拍批量取出并分发给各窗口，后台线程不再直接操作Tk控件
+"""
+import itertools
+import logging
+import queue
+import threading
+
+from file.file_utils import print_log
+
+# 事件类型
+EVENT_LOG = 'log'
+EVENT_PROGRESS = 'progress'
+EVENT_CALL = 'call'
+
+
+class JobDispatcher:
+    def __init__(self, root, interval_ms=50, max_batch=500):
+        """
+        :param root: tk.Tk 主窗口
+        :param interval_ms: 主线程取队列的间隔（毫秒）
+        :param max_batch: 每次最多处理的事件数，避免一次取太多导致界面卡顿
+        """
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+
+        self.events = queue.Queue()
+        # 额外的事件来源（如 multiprocessing.Manager().Queue()，供子进程使用）
+        self.sources = []
+        # channel -> {"log": 回调, "progress": 回调}
+        self.handlers = {}
+        self._channel_ids = itertools.count(1)
+        self._after_id = None
+        self._closed = False
+
+        self._schedule()
+
+    # ========== 注册窗口 ==========
+    def register(self, owner, on_log=None, on_progress=None):
+        """
+        注册一个窗口的事件回调，返回该窗口使用的channel
+
+        on_log(records): 一次收到一批 (日志级别, 日志内容)
+        on_progress(value, message): 两次主线程调用之间只收到最新的一次进度
+        owner 被销毁时自动注销
+        """
+        channel = next(self._channel_ids)
+        self.handlers[channel] = {EVENT_LOG: on_log, EVENT_PROGRESS: on_progress}
+
+        def on_destroy(event):
+            if event.widget is owner:
+                self.unregister(channel)
+
+        owner.bind("<Destroy>", on_destroy, add="+")
+        return channel
+
+    def unregister(self, channel):
+        self.handlers.pop(channel, None)
+
+    def add_source(self, source_queue):
+        """添加额外的事件队列，队列中的元素格式为 (事件类型, channel, 内容)"""
+        self.sources.append(source_queue)
+
+    # ========== 线程安全的投递接口 ==========
+    def log(self, channel, message, level=logging.INFO):
+        self.events.put((EVENT_LOG, channel, (level, message)))
+
+    def progress(self, channel, value, message=None):
+        self.events.put((EVENT_PROGRESS, channel, (value, message)))
+
+    def call(self, func, *args):
+        """在主线程中执行func（如弹窗、修改按钮状态）"""
+        self.events.put((EVENT_CALL, None, (func, args)))
+
+    def submit(self, target, *args):
+        """在后台线程中执行任务"""
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        return thread
+
+    # ========== 主线程批量处理 ==========
+    def _schedule(self):
+        if not self._closed:
+            self._after_id = self.root.after(self.interval_ms, self._poll)
+
+    def _take(self, source, batch):
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(source.get_nowait())
+            except queue.Empty:
+                break
+            except (EOFError, OSError):
+                # 子进程队列已关闭
+                self.sources.remove(source)
+                break
+
+    def _poll(self):
+        batch = []
+        self._take(self.events, batch)
+        for source in list(self.sources):
+            self._take(source, batch)
+
+        try:
+            self._dispatch(batch)
+        finally:
+            self._schedule()
+
+    def _dispatch(self, batch):
+        logs = {}
+        progresses = {}
+
+        for kind, channel, payload in batch:
+            if kind == EVENT_LOG:
+                logs.setdefault(channel, []).append(payload)
+            elif kind == EVENT_PROGRESS:
+                # 同一批次中只保留最新进度
+                progresses[channel] = payload
+            elif kind == EVENT_CALL:
+                # 先刷新已积累的日志与进度，保证与调用的先后顺序一致（调用设置的界面状态不会被之前的进度覆盖）
+                self._flush_logs(logs)
+                self._flush_progresses(progresses)
+                logs, progresses = {}, {}
+                func, args = payload
+                try:
+                    func(*args)
+                except Exception as e:
+                    print_log(f"界面回调出错: {str(e)}", logging.ERROR)
+
+        self._flush_logs(logs)
+        self._flush_progresses(progresses)
+
+    def _flush_logs(self, logs):
+        for channel, messages in logs.items():
+            handler = self.handlers.get(channel, {}).get(EVENT_LOG)
+            if handler:
+                handler(messages)
+
+    def _flush_progresses(self, progresses):
+        for channel, (value, message) in progresses.items():
+            handler = self.handlers.get(channel, {}).get(EVENT_PROGRESS)
+            if handler:
+                handler(value, message)
+
+    def close(self):
+        self._closed = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+
+def get_dispatcher(widget):
+    """获取（或创建）widget所在主窗口共享的调度器"""
+    root = widget._root()
+    dispatcher = getattr(root, '_job_dispatcher', None)
+    if dispatcher is None:
+        dispatcher = JobDispatcher(root)
+        root._job_dispatcher = dispatcher
+    return dispatcher
@@ -0,0 +1,148 @@
+"""
+长时间批处理使用的日志控件
+
+- 最多保留 max_lines 行（环形缓冲），超出部分从顶部删除，避免 tk.Text 无限增长
+- 日志先缓存，按定时器批量写入控件，避免每条日志都触发重绘
+- 可选：完整日志落盘到 log_spool_dir
+- 可按级别过滤，隐藏逐个文件的明细日志
+
+除 __init__ 外所有方法都只能在主线程调用，后台线程请通过 JobDispatcher.log 投递
+"""
+import logging
+import os
+import time
+import tkinter as tk
+from collections import deque
+from tkinter import ttk
+
+from config import log_max_lines, log_spool_dir
+
+# 过滤选项（显示名称 -> 最低显示级别）
+LEVEL_OPTIONS = {
+    "全部": logging.DEBUG,
+    "信息": logging.INFO,
+    "警告": logging.WARNING,
+    "错误": logging.ERROR,
+}
+
+
+class LogPanel(ttk.Frame):
+    def __init__(self, master, max_lines=log_max_lines, flush_interval_ms=200, spool_name=None,
+                 level=logging.DEBUG, height=15):
+        """
+        :param master: 父容器
+        :param max_lines: 控件中最多保留的行数
+        :param flush_interval_ms: 批量写入控件的间隔（毫秒）
+        :param spool_name: 落盘日志文件名前缀，为空或未配置 log_spool_dir 时不落盘
+        :param level: 初始显示的最低级别
+        :param height: 文本框高度（行）
+        """
+        super().__init__(master)
+        self.max_lines = max_lines
+        self.flush_interval_ms = flush_interval_ms
+        self.level = level
+
+        # 环形缓冲：切换过滤级别时用于重新渲染
+        self.records = deque(maxlen=max_lines)
+        self.pending = []
+        self._flush_id = None
+
+        # 完整日志落盘
+        self.spool = None
+        self.spool_path = None
+        if spool_name and log_spool_dir:
+            os.makedirs(log_spool_dir, exist_ok=True)
+            self.spool_path = os.path.join(log_spool_dir, f"{spool_name}_{time.strftime('%Y%m%d_%H%M%S')}.log")
+            self.spool = open(self.spool_path, 'a', encoding='utf-8')
+
+        # 级别过滤
+        toolbar = ttk.Frame(self)
+        toolbar.pack(fill=tk.X)
+        ttk.Label(toolbar, text="显示级别:").pack(side=tk.LEFT)
+        level_name = next((name for name, value in LEVEL_OPTIONS.items() if value == level), "全部")
+        self.level_var = tk.StringVar(value=level_name)
+        level_box = ttk.Combobox(toolbar, textvariable=self.level_var, values=list(LEVEL_OPTIONS),
+                                 width=6, state="readonly")
+        level_box.pack(side=tk.LEFT, padx=5)
+        level_box.bind("<<ComboboxSelected>>", self._on_level_change)
+
+        # 文本框和滚动条
+        scrollbar = ttk.Scrollbar(self)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text = tk.Text(self, wrap=tk.WORD, height=height, yscrollcommand=scrollbar.set)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.text.config(state=tk.DISABLED)
+        scrollbar.config(command=self.text.yview)
+
+        self.bind("<Destroy>", self._on_destroy)
+
+    def append(self, records):
+        """追加一批 (级别, 内容)，由定时器统一写入控件（可直接作为 JobDispatcher 的 on_log 回调）"""
+        self.pending.extend(records)
+        if self._flush_id is None:
+            self._flush_id = self.after(self.flush_interval_ms, self.flush)
+
+    def write(self, message, level=logging.INFO):
+        self.append([(level, message)])
+
+    def flush(self):
+        """把缓存的日志一次性写入控件"""
+        self._flush_id = None
+        if not self.pending:
+            return
+        records, self.pending = self.pending, []
+
+        if self.spool is not None:
+            self.spool.write("".join(f"{message}\n" for _, message in records))
+            self.spool.flush()
+
+        self.records.extend(records)
+        # 一批超过上限时只需要最后 max_lines 条
+        visible = [message for level, message in records[-self.max_lines:] if level >= self.level]
+        if visible:
+            self._insert(visible)
+
+    def clear(self):
+        self.pending = []
+        self.records.clear()
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.config(state=tk.DISABLED)
+
+    def _insert(self, messages):
+        # 用户向上翻看时不强制滚动到底部
+        at_bottom = self.text.yview()[1] >= 0.999
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, "\n".join(messages) + "\n")
+        self._trim()
+        self.text.config(state=tk.DISABLED)
+        if at_bottom:
+            self.text.see(tk.END)
+
+    def _trim(self):
+        """删除超出上限的顶部行"""
+        line_count = int(self.text.index("end-1c").split(".")[0]) - 1
+        excess = line_count - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+
+    def _on_level_change(self, event=None):
+        self.level = LEVEL_OPTIONS[self.level_var.get()]
+        self.text.config(state=tk.NORMAL)
+        self.text.delete(1.0, tk.END)
+        self.text.config(state=tk.DISABLED)
+        visible = [message for level, message in self.records if level >= self.level]
+        if visible:
+            self._insert(visible)
+
+    def _on_destroy(self, event):
+        if event.widget is not self:
+            return
+        if self._flush_id is not None:
+            self.after_cancel(self._flush_id)
+            self._flush_id = None
+        if self.spool is not None:
+            # 销毁前把尚未写入的日志落盘
+            self.spool.write("".join(f"{message}\n" for _, message in self.pending))
+            self.spool.close()
+            self.spool = None
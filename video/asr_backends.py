@@ -0,0 +1,344 @@
+"""
+语音识别后端
+
+各后端统一为 transcribe(音频路径, ...) -> AsrResult（全文、分段时间戳、音频时长、耗时与实时率），
+视频转文字（video/mp4_text.py、video/get_text_app.py、video/mp4_wav_text.py）与命令行 asr 都通过
+load_asr_backend() 取得后端，使用哪个后端在 config.asr_backend 中配置。
+
+- whisper：openai-whisper 的 PyTorch 模型（原有方式，CPU上 medium 约为实时速度或更慢）
+- faster_whisper：CTranslate2 INT8 推理（需要安装 faster-whisper），模型由现有的 medium.pt 在本地转换一次
+  （转换需要 transformers，分词器文件取自 HuggingFace 缓存），支持 VAD 跳过静音段
+
+asr_chunk_workers 大于0时按VAD切分语音段，由多个模型实例并行识别（见 video/asr_chunking.py）。
+
+实时率（RTF）= 识别耗时 / 音频时长，小于1表示比实时快；python -m bench.run_bench --stages asr,asr_faster_whisper 对比
+"""
+import os
+import time
+import warnings
+import wave
+
+from config import asr_backend, asr_beam_size, asr_vad, asr_compute_type, asr_cpu_threads, asr_ct2_model_path, \
+    asr_chunk_workers, model_warmup
+from file.file_utils import print_log
+from metrics import timer, record
+from model_runtime import select_device, densify_sparse, warm_up_asr, configure_threads, thread_budget
+
+
+class AsrSegment:
+    """一段识别结果：起止时间（秒）与文本"""
+    __slots__ = ('start', 'end', 'text')
+
+    def __init__(self, start, end, text):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def to_dict(self):
+        return {'start': round(self.start, 3), 'end': round(self.end, 3), 'text': self.text}
+
+
+class AsrResult:
+    """识别结果：全文、分段、音频时长与识别耗时（秒）"""
+
+    def __init__(self, text, segments, audio_seconds, elapsed, backend):
+        self.text = text
+        self.segments = segments
+        self.audio_seconds = audio_seconds
+        self.elapsed = elapsed
+        self.backend = backend
+
+    @property
+    def rtf(self):
+        """实时率：识别耗时 / 音频时长，音频时长未知时为None"""
+        return self.elapsed / self.audio_seconds if self.audio_seconds else None
+
+    def summary(self):
+        rtf = self.rtf
+        return (f"{self.backend}：音频 {self.audio_seconds or 0:.1f}s，识别耗时 {self.elapsed:.1f}s，"
+                f"实时率 {'-' if rtf is None else f'{rtf:.2f}'}")
+
+
+def wav_duration(path):
+    """WAV音频时长（秒），无法读取时返回None"""
+    try:
+        with wave.open(path, 'rb') as audio:
+            return audio.getnframes() / float(audio.getframerate())
+    except (wave.Error, OSError, EOFError):
+        return None
+
+
+_showwarning = warnings.showwarning
+
+
+def _filter_fp16_warning(message, category, filename, lineno, file=None, line=None):
+    # 仅过滤"FP16 is not supported on CPU; using FP32 instead"警告，其他警告正常显示
+    if "FP16 is not supported on CPU; using FP32 instead" in str(message):
+        return
+    _showwarning(message, category, filename, lineno, file, line)
+
+
+def _ignore_segment(segment):
+    pass
+
+
+# 逐段识别时接在提示词后面的上一段文字长度（字符）
+_PROMPT_CONTEXT_CHARS = 200
+
+
+class AsrBackend:
+    """识别后端基类"""
+    name = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def __init__(self, model_path, log=print_log):
+        self.model_path = model_path
+        self.log = log
+        # 实际运行的设备（cpu / mps），界面显示用
+        self.device = 'cpu'
+
+    def _transcribe(self, audio_path, language, initial_prompt, beam_size, vad, options, emit):
+        """返回 (分段列表, 音频时长或None)；每得到一段（按时间顺序）调用 emit(分段)"""
+        raise NotImplementedError
+
+    def transcribe(self, audio_path, language='zh', initial_prompt=None, beam_size=None, vad=None,
+                   on_segment=None, **options):
+        """
+        识别音频文件
+
+        beam_size / vad 为None时按 config.asr_beam_size / config.asr_vad；
+        on_segment(分段) 在识别出每一段时调用（边识别边回调；whisper 此时按语音段逐段识别，见 WhisperBackend）；
+        options 为两种后端通用的其他参数（condition_on_previous_text、no_speech_threshold、compression_ratio_threshold 等）
+        """
+        beam_size = asr_beam_size if beam_size is None else beam_size
+        vad = asr_vad if vad is None else vad
+        emit = on_segment or _ignore_segment
+        start = time.perf_counter()
+        with timer('asr.transcribe'):
+            segments, audio_seconds = self._transcribe(audio_path, language, initial_prompt, beam_size, vad, options,
+                                                       emit)
+        elapsed = time.perf_counter() - start
+        if audio_seconds is None:
+            audio_seconds = wav_duration(audio_path)
+        result = AsrResult(''.join(segment.text for segment in segments), segments, audio_seconds, elapsed, self.name)
+        if result.rtf is not None:
+            # 按后端分别统计实时率（数值样本，不是耗时）
+            record(f'asr.rtf.{self.name}', result.rtf)
+        return result
+
+
+class WhisperBackend(AsrBackend):
+    name = 'whisper'
+
+    @classmethod
+    def available(cls):
+        try:
+            import whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self, model_path, log=print_log, device=None):
+        """device 为None时按 config.model_devices['asr']（见 model_runtime.py）"""
+        super().__init__(model_path, log)
+        import whisper
+
+        warnings.showwarning = _filter_fp16_warning
+
+        # 先在CPU加载（唯一能处理稀疏权重的设备），稀疏权重、缓冲转为密集张量，规避MPS稀疏张量报错
+        with timer('asr.load_model'):
+            self.model = whisper.load_model(model_path, device='cpu')
+            self.device = select_device('asr', device)
+            if self.device == 'mps':
+                densify_sparse(self.model)
+            if self.device != 'cpu':
+                self.model = self.model.to(self.device)
+        log(f"使用{self.device.upper()}运行Whisper模型")
+
+    def _transcribe(self, audio_path, language, initial_prompt, beam_size, vad, options, emit):
+        # openai-whisper 没有VAD，vad 参数不起作用（长音频可用分段并行识别跳过静音）
+        if beam_size and beam_size > 1:
+            options = dict(options, beam_size=beam_size)
+        if emit is not _ignore_segment:
+            # model.transcribe 整段识别完才返回分段，需要边识别边回调（写字幕）时按语音段逐段识别
+            from video.asr_chunking import load_wav
+            try:
+                samples = load_wav(audio_path)
+            except (wave.Error, ValueError, EOFError):
+                samples = None
+            if samples is not None:
+                return self._transcribe_windows(samples, language, initial_prompt, options, emit)
+        segments = self._run(audio_path, 0.0, language, initial_prompt, options)
+        for segment in segments:
+            emit(segment)
+        return segments, None
+
+    def _run(self, audio, offset, language, initial_prompt, options):
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            fp16=False,  # 避免MPS/CPU的FP16兼容问题
+            initial_prompt=initial_prompt,
+            verbose=False,  # 关闭转录过程中的冗余日志
+            **options
+        )
+        segments = [AsrSegment(segment['start'] + offset, segment['end'] + offset, segment['text'])
+                    for segment in result['segments']]
+        # 没有分段信息（极短音频）时保留全文
+        if not segments and result.get('text'):
+            segments = [AsrSegment(offset, offset, result['text'])]
+        return segments
+
+    def _transcribe_windows(self, samples, language, initial_prompt, options, emit):
+        """
+        按能量VAD切出的语音段（不超过 config.asr_max_chunk_seconds）顺序识别，每段识别完即回调
+
+        condition_on_previous_text 未关闭时把上一段的文字接在提示词后面，保持跨段的上下文
+        """
+        from video.asr_chunking import SAMPLE_RATE, detect_speech
+        with timer('asr.vad'):
+            speech = detect_speech(samples)
+        conditioned = options.get('condition_on_previous_text', True)
+        segments, previous = [], ''
+        for start, end in speech:
+            prompt = ''.join(filter(None, (initial_prompt, previous[-_PROMPT_CONTEXT_CHARS:])))
+            window = self._run(samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], start, language,
+                               prompt or None, options)
+            for segment in window:
+                segments.append(segment)
+                emit(segment)
+            if conditioned:
+                previous = ''.join(segment.text for segment in window)
+        return segments, len(samples) / SAMPLE_RATE
+
+
+class FasterWhisperBackend(AsrBackend):
+    name = 'faster_whisper'
+
+    @classmethod
+    def available(cls):
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def __init__(self, model_path, log=print_log, compute_type=None, cpu_threads=None, device=None):
+        """
+        model_path 为 openai-whisper 的 .pt 文件时先转换为CTranslate2模型（只转换一次），也可直接指定转换好的目录；
+        CTranslate2 只支持 CPU / CUDA，配置为 mps 时使用CPU
+        """
+        super().__init__(model_path, log)
+        self.device = select_device('asr', device, supported=('cpu', 'cuda'))
+        from faster_whisper import WhisperModel
+
+        compute_type = compute_type or asr_compute_type
+        model_dir = ct2_model_dir(model_path, compute_type)
+        if not os.path.isdir(model_dir):
+            log(f"首次使用，正在把 {model_path} 转换为CTranslate2模型（{compute_type}）...")
+            convert_whisper_checkpoint(model_path, model_dir, compute_type)
+            log(f"模型已转换：{model_dir}")
+        # 推理线程数，0 为 CTranslate2 默认
+        self.cpu_threads = asr_cpu_threads if cpu_threads is None else cpu_threads
+        with timer('asr.load_model'):
+            self.model = WhisperModel(model_dir, device=self.device, compute_type=compute_type,
+                                      cpu_threads=self.cpu_threads)
+
+    def _transcribe(self, audio_path, language, initial_prompt, beam_size, vad, options, emit):
+        segments, info = self.model.transcribe(
+            audio_path,
+            language=language,
+            initial_prompt=initial_prompt,
+            beam_size=max(1, beam_size or 1),
+            # Silero VAD 跳过静音、纯音乐段
+            vad_filter=vad,
+            **options
+        )
+        # segments 是生成器，遍历时才真正识别，每识别出一段即回调
+        results = []
+        for segment in segments:
+            results.append(AsrSegment(segment.start, segment.end, segment.text))
+            emit(results[-1])
+        return results, info.duration
+
+
+def ct2_model_dir(model_path, compute_type):
+    """CTranslate2模型目录：config.asr_ct2_model_path，未配置时为 .pt 文件旁的 <名称>_ct2_<精度>；本身是目录时直接使用"""
+    if asr_ct2_model_path:
+        return asr_ct2_model_path
+    if os.path.isdir(model_path):
+        return model_path
+    stem = os.path.splitext(model_path)[0] if model_path.endswith('.pt') else model_path
+    return f"{stem}_ct2_{compute_type}"
+
+
+def convert_whisper_checkpoint(model_path, output_dir, compute_type='int8'):
+    """
+    openai-whisper 的 .pt 模型转换为 CTranslate2 模型
+
+    先用 transformers 的转换脚本转为 HuggingFace 格式（临时目录），分词器与特征提取配置取自 openai/whisper-<名称>
+    （HuggingFace 缓存或网络），再由 CTranslate2 转换并量化
+    """
+    import shutil
+    import tempfile
+    from ctranslate2.converters import TransformersConverter
+    from transformers import WhisperFeatureExtractor, WhisperTokenizerFast
+    from transformers.models.whisper.convert_openai_to_hf import convert_openai_whisper_to_tfms
+
+    size = os.path.splitext(os.path.basename(model_path))[0]
+    hf_dir = tempfile.mkdtemp(prefix='whisper_hf_')
+    try:
+        with timer('asr.convert_model'):
+            convert_openai_whisper_to_tfms(model_path, hf_dir)
+            WhisperTokenizerFast.from_pretrained(f"openai/whisper-{size}").save_pretrained(hf_dir)
+            WhisperFeatureExtractor.from_pretrained(f"openai/whisper-{size}").save_pretrained(hf_dir)
+            # 先写临时目录，中断时不留下不完整的模型
+            temp_dir = output_dir + '.tmp'
+            TransformersConverter(hf_dir, copy_files=['tokenizer.json', 'preprocessor_config.json']) \
+                .convert(temp_dir, quantization=compute_type, force=True)
+            os.replace(temp_dir, output_dir)
+    finally:
+        shutil.rmtree(hf_dir, ignore_errors=True)
+    return output_dir
+
+
+ASR_BACKENDS = {backend.name: backend for backend in (WhisperBackend, FasterWhisperBackend)}
+
+
+def available_backends():
+    """当前环境可用的后端名称"""
+    return [name for name, backend in ASR_BACKENDS.items() if backend.available()]
+
+
+def load_asr_backend(model_path, name=None, log=print_log, chunk_workers=None, warm_up=None, parallel=1, **kwargs):
+    """
+    加载识别后端（加载失败时抛出异常），name 为None时使用 config.asr_backend；kwargs 传给后端（如 device='cuda'）
+
+    chunk_workers 为None时按 config.asr_chunk_workers：大于0时加载这么多个模型实例，返回分段并行识别的后端，
+    各实例平分本进程的线程预算（见 model_runtime.py）；parallel 为同一进程中同时识别的后端个数（如批量识别的识别线程数），
+    同样参与平分；warm_up 为None时按 config.model_warmup，加载后先识别一段合成音频
+    """
+    name = name or asr_backend
+    if name not in ASR_BACKENDS:
+        raise ValueError(f"未知的语音识别后端: {name}，可选：{', '.join(ASR_BACKENDS)}")
+    if not ASR_BACKENDS[name].available():
+        raise ValueError(f"语音识别后端 {name} 不可用（缺少依赖），可用：{', '.join(available_backends())}")
+    chunk_workers = asr_chunk_workers if chunk_workers is None else chunk_workers
+    instances = max(1, parallel) * max(1, chunk_workers)
+    if instances > 1:
+        configure_threads(thread_budget(), parallel=instances)
+    if name == 'faster_whisper' and not asr_cpu_threads:
+        # CTranslate2 不受 torch 线程数影响，按本进程的线程预算 / 同时推理的实例数设置
+        kwargs.setdefault('cpu_threads', thread_budget(instances))
+    if chunk_workers <= 0:
+        backend = ASR_BACKENDS[name](model_path, log=log, **kwargs)
+    else:
+        from video.asr_chunking import ChunkedBackend
+        backend = ChunkedBackend([ASR_BACKENDS[name](model_path, log=log, **kwargs) for _ in range(chunk_workers)],
+                                 log=log)
+    if model_warmup if warm_up is None else warm_up:
+        warm_up_asr(backend)
+    return backend
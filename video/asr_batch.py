@@ -0,0 +1,197 @@
+"""
+批量语音识别：目录下的音视频文件按流水线处理
+
+- 一个线程用ffmpeg（moviepy）依次提取16kHz单声道音频，提取好的音频放入有界队列
+- 若干识别线程（每个线程一个模型实例）从队列取音频识别，第N个文件识别时第N+1个文件的音频已在提取
+- 已有文字稿的文件跳过；每个文件记录音频时长、提取与识别耗时，结束时汇总吞吐量
+- 同一目录下名称相同、扩展名不同的文件（如 d.mp3 与 d.mp4）输出名带上扩展名，互不覆盖
+
+队列长度等于识别线程数，提取不会领先识别太多（临时音频文件不会堆积）。
+"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from file.file_utils import print_log
+from metrics import timer, count
+from video.asr_backends import wav_duration
+from video.subtitles import SUBTITLE_FORMATS, SubtitleWriter, timed_output_path
+
+# 队列结束标记
+_DONE = object()
+
+
+class FileStats:
+    """单个文件的处理结果：status 为 done / skipped / failed，耗时单位为秒"""
+    __slots__ = ('path', 'status', 'audio_seconds', 'extract_seconds', 'transcribe_seconds', 'error')
+
+    def __init__(self, path, status, audio_seconds=0.0, extract_seconds=0.0, transcribe_seconds=0.0, error=None):
+        self.path = path
+        self.status = status
+        self.audio_seconds = audio_seconds
+        self.extract_seconds = extract_seconds
+        self.transcribe_seconds = transcribe_seconds
+        self.error = error
+
+    @property
+    def rtf(self):
+        return self.transcribe_seconds / self.audio_seconds if self.audio_seconds else None
+
+
+def output_names(files):
+    """
+    各文件的输出名称：默认为不带扩展名的文件名，同一目录下有同名文件时为带扩展名的文件名
+
+    返回 {文件路径: 输出名称}
+    """
+    groups = {}
+    for path in files:
+        path = Path(path)
+        groups.setdefault((str(path.parent), path.stem.lower()), []).append(path)
+    return {str(path): path.name if len(paths) > 1 else path.stem for paths in groups.values() for path in paths}
+
+
+def transcript_path(media_path, name=None):
+    """文字稿保存在音视频所在目录的 doc 子目录：doc/<名称>_语音识别.txt，name 为None时为不带扩展名的文件名"""
+    path = Path(media_path)
+    return os.path.join(path.parent, 'doc', (name or path.stem) + "_语音识别.txt")
+
+
+def extract_audio(media_path, wav_path):
+    """提取音轨为16kHz单声道WAV（音视频文件均可）"""
+    from moviepy.audio.io.AudioFileClip import AudioFileClip
+    with timer('asr.extract_audio'):
+        with AudioFileClip(media_path) as audio:
+            audio.write_audiofile(
+                wav_path,
+                logger=None,
+                codec="pcm_s16le",
+                fps=16000,  # whisper仅需16k采样率，不用原视频高采样
+                ffmpeg_params=['-ac', '1'],
+            )
+
+
+def _save_text(path, text):
+    """识别结果为空或很短（无人声）时也保存，下次批量识别时据此跳过"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text or '')
+
+
+def run_asr_batch(files, models, transcribe_options=None, skip_existing=True, formats=(), log=print_log):
+    """
+    流水线识别 files，返回与 files 顺序相同的 [FileStats, ...]
+
+    models 为已加载的识别后端，每个对应一个识别线程；transcribe_options 传给 transcribe（提示词、阈值等）；
+    formats 中的 srt / vtt 字幕与文字稿一起写入 doc 目录（边识别边写）
+    """
+    transcribe_options = transcribe_options or {}
+    names = output_names(files)
+    stats = [None] * len(files)
+    pending = []
+    for index, path in enumerate(files):
+        if skip_existing and os.path.exists(transcript_path(path, names[str(path)])):
+            stats[index] = FileStats(path, 'skipped')
+            count('asr.batch_skipped')
+        else:
+            pending.append(index)
+    if len(pending) < len(files):
+        log(f"已有文字稿，跳过 {len(files) - len(pending)} 个文件")
+
+    temp_dir = tempfile.mkdtemp(prefix='asr_batch_')
+    extracted = queue.Queue(maxsize=len(models))
+    finished = [0]
+    lock = threading.Lock()
+
+    def report(index):
+        with lock:
+            finished[0] += 1
+            done = finished[0]
+        _log_file(stats[index], f"({done}/{len(pending)}) ", log)
+
+    def extract_all():
+        try:
+            for index in pending:
+                path = files[index]
+                wav_path = os.path.join(temp_dir, f"{index:05d}.wav")
+                start = time.perf_counter()
+                try:
+                    extract_audio(path, wav_path)
+                except Exception as e:
+                    stats[index] = FileStats(path, 'failed', error=f"提取音频失败: {e}")
+                    report(index)
+                    continue
+                extracted.put((index, wav_path, time.perf_counter() - start))
+        finally:
+            for _ in models:
+                extracted.put(_DONE)
+
+    def transcribe_all(model):
+        while True:
+            item = extracted.get()
+            if item is _DONE:
+                return
+            index, wav_path, extract_seconds = item
+            path = files[index]
+            text_path = transcript_path(path, names[str(path)])
+            # 字幕与文字稿同在 doc 目录：doc/<名称>.srt
+            base_path = os.path.join(os.path.dirname(text_path), names[str(path)])
+            start = time.perf_counter()
+            try:
+                os.makedirs(os.path.dirname(base_path), exist_ok=True)
+                with ExitStack() as stack:
+                    writers = [stack.enter_context(SubtitleWriter(timed_output_path(base_path, fmt)))
+                               for fmt in formats if fmt in SUBTITLE_FORMATS]
+                    on_segment = (lambda segment: [w.write(segment) for w in writers]) if writers else None
+                    result = model.transcribe(wav_path, on_segment=on_segment, **transcribe_options)
+                _save_text(text_path, result.text)
+                stats[index] = FileStats(path, 'done', result.audio_seconds or 0.0, extract_seconds,
+                                         time.perf_counter() - start)
+            except Exception as e:
+                stats[index] = FileStats(path, 'failed', wav_duration(wav_path) or 0.0, extract_seconds,
+                                         time.perf_counter() - start, str(e))
+            finally:
+                if os.path.exists(wav_path):
+                    os.remove(wav_path)
+            report(index)
+
+    threads = [threading.Thread(target=extract_all, daemon=True)]
+    threads += [threading.Thread(target=transcribe_all, args=(model,), daemon=True) for model in models]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return stats
+
+
+def _log_file(stats, prefix, log):
+    name = os.path.basename(stats.path)
+    if stats.status == 'failed':
+        log(f"{prefix}{name} 失败：{stats.error}")
+        return
+    rtf = stats.rtf
+    log(f"{prefix}{name}：音频 {stats.audio_seconds:.0f}s，提取 {stats.extract_seconds:.1f}s，"
+        f"识别 {stats.transcribe_seconds:.1f}s，实时率 {'-' if rtf is None else f'{rtf:.2f}'}")
+
+
+def format_batch_summary(stats, wall_seconds):
+    """批量识别汇总：成功/跳过/失败数，音频总时长与吞吐量（每秒处理的音频秒数）"""
+    done = [item for item in stats if item.status == 'done']
+    skipped = sum(item.status == 'skipped' for item in stats)
+    failed = [item for item in stats if item.status == 'failed']
+    audio_seconds = sum(item.audio_seconds for item in done)
+    lines = [f"成功 {len(done)} 个，跳过 {skipped} 个，失败 {len(failed)} 个，总耗时 {wall_seconds:.1f}s"]
+    if done and wall_seconds > 0:
+        lines.append(f"音频共 {audio_seconds / 60:.1f} 分钟，吞吐量 {audio_seconds / wall_seconds:.2f} 音频秒/秒"
+                     f"（提取 {sum(item.extract_seconds for item in done):.1f}s，"
+                     f"识别 {sum(item.transcribe_seconds for item in done):.1f}s，与提取重叠进行）")
+    lines += [f"失败：{item.path}：{item.error}" for item in failed]
+    return lines
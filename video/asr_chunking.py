@@ -0,0 +1,192 @@
+"""
+长音频分段并行识别
+
+直播录像中常有大段静音、背景音乐，整段交给 Whisper 时仍按30秒窗口逐段顺序解码。分段模式：
+- 能量VAD：按30ms帧计算能量（dB），高于噪声底（低分位数）一定幅度的帧视为语音，
+  合并间隔很短的语音段、去掉过短的段、前后留少量余量，超过 max_chunk 秒的段在能量最低处切开。
+  阈值不高于响亮帧（高分位数）以下 VAD_CEILING_DB：响度平稳的音频（持续讲话、垫着背景音乐）噪声底很高，
+  只按噪声底会把全部帧判为静音；检出的语音远少于非静音时长时退回整段识别（仍按 max_chunk 切开）
+- 各语音段写成16kHz单声道WAV，由多个模型实例（每个线程一个）并行识别
+- 结果时间戳加上语音段的起点，按时间顺序合并
+
+各段独立识别（相当于 condition_on_previous_text=False），段首的上下文提示只有 initial_prompt。
+能量VAD不区分语音与音乐，纯音乐段仍会交给模型（由 no_speech_threshold 过滤）。
+"""
+import os
+import queue
+import shutil
+import tempfile
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import asr_vad_min_silence, asr_max_chunk_seconds
+from file.file_utils import print_log
+from metrics import timer, count
+from video.asr_backends import AsrBackend, AsrSegment, _ignore_segment
+
+# Whisper 输入采样率
+SAMPLE_RATE = 16000
+# VAD帧长（毫秒）
+FRAME_MS = 30
+# 噪声底取帧能量的该分位数；高于噪声底 VAD_MARGIN_DB 且高于 VAD_MIN_DB 的帧视为语音
+NOISE_PERCENTILE = 10
+VAD_MARGIN_DB = 12
+VAD_MIN_DB = -50
+# 阈值上限：响亮帧（LOUD_PERCENTILE 分位数）以下 VAD_CEILING_DB
+LOUD_PERCENTILE = 95
+VAD_CEILING_DB = 20
+# 检出的语音不足非静音（高于 VAD_MIN_DB）时长的该比例时，退回整段识别
+SPEECH_FALLBACK_RATIO = 0.5
+# 过短的语音段（秒）视为噪声；语音段前后保留的余量（秒）
+MIN_SPEECH_SECONDS = 0.3
+SPEECH_PAD_SECONDS = 0.2
+
+_SAMPLE_TYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def load_wav(path):
+    """读取WAV为16kHz单声道 float32 数组（-1~1）"""
+    with wave.open(path, 'rb') as audio:
+        channels, width, rate = audio.getnchannels(), audio.getsampwidth(), audio.getframerate()
+        frames = audio.readframes(audio.getnframes())
+    if width not in _SAMPLE_TYPES:
+        raise ValueError(f"不支持的WAV采样位数: {width * 8}bit")
+    samples = np.frombuffer(frames, dtype=_SAMPLE_TYPES[width]).astype(np.float32)
+    if width == 1:
+        samples = samples - 128
+    samples /= float(2 ** (8 * width - 1))
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # 线性插值重采样（提取音频时已指定16kHz的不会走到这里）
+        positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+def write_wav(path, samples):
+    """float32 数组写为16kHz单声道 pcm_s16le WAV"""
+    with wave.open(path, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(SAMPLE_RATE)
+        audio.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+def frame_energy_db(samples, frame_length):
+    """每帧的平均能量（dBFS）"""
+    frames = len(samples) // frame_length
+    if frames == 0:
+        return np.zeros(0, dtype=np.float64)
+    power = np.mean(samples[:frames * frame_length].reshape(frames, frame_length).astype(np.float64) ** 2, axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def _runs(mask):
+    """布尔数组中连续为True的区间 [(起, 止), ...]（止不含）"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(samples, min_silence=None, max_chunk=None):
+    """
+    能量VAD，返回语音段 [(起点秒, 终点秒), ...]
+
+    间隔短于 min_silence 秒的语音段合并；长于 max_chunk 秒的段在能量最低的帧处切开；
+    检出的语音远少于非静音时长时（VAD不可靠）返回覆盖整段音频的分段，全是静音时返回空列表
+    """
+    min_silence = asr_vad_min_silence if min_silence is None else min_silence
+    max_chunk = asr_max_chunk_seconds if max_chunk is None else max_chunk
+    frame_length = SAMPLE_RATE * FRAME_MS // 1000
+    energy = frame_energy_db(samples, frame_length)
+    if len(energy) == 0:
+        return []
+    threshold = min(np.percentile(energy, NOISE_PERCENTILE) + VAD_MARGIN_DB,
+                    np.percentile(energy, LOUD_PERCENTILE) - VAD_CEILING_DB)
+    threshold = max(threshold, VAD_MIN_DB)
+    frame_seconds = FRAME_MS / 1000
+
+    merged = []
+    for start, end in _runs(energy > threshold):
+        if merged and (start - merged[-1][1]) * frame_seconds < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    merged = [[start, end] for start, end in merged if (end - start) * frame_seconds >= MIN_SPEECH_SECONDS]
+
+    active_frames = int(np.count_nonzero(energy > VAD_MIN_DB))
+    if active_frames == 0:
+        return []
+    if sum(end - start for start, end in merged) < SPEECH_FALLBACK_RATIO * active_frames:
+        merged = [[0, len(energy)]]
+
+    pad = int(round(SPEECH_PAD_SECONDS / frame_seconds))
+    max_frames = max(1, int(max_chunk / frame_seconds))
+    segments = []
+    for start, end in merged:
+        start, end = max(0, start - pad), min(len(energy), end + pad)
+        # 过长的段在后半个窗口内能量最低处切开，尽量不切断句子
+        while end - start > max_frames:
+            window = energy[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            segments.append((start, cut))
+            start = cut
+        segments.append((start, end))
+    return [(float(start * frame_seconds), float(end * frame_seconds)) for start, end in segments]
+
+
+class ChunkedBackend(AsrBackend):
+    """
+    分段并行识别：与单个后端相同的 transcribe 接口，内部按语音段分给多个模型实例并行识别
+
+    backends 为同一后端的多个实例，每个实例同一时间只处理一个语音段
+    """
+
+    def __init__(self, backends, log=print_log):
+        super().__init__(backends[0].model_path, log)
+        self.name = f"{backends[0].name}_chunked"
+        self.device = backends[0].device
+        self.backends = backends
+        self._idle = queue.Queue()
+        for backend in backends:
+            self._idle.put(backend)
+
+    def _transcribe_chunk(self, path, offset, language, initial_prompt, beam_size, vad, options):
+        backend = self._idle.get()
+        try:
+            segments, _ = backend._transcribe(path, language, initial_prompt, beam_size, vad, options,
+                                              _ignore_segment)
+        finally:
+            self._idle.put(backend)
+        return [AsrSegment(segment.start + offset, segment.end + offset, segment.text) for segment in segments]
+
+    def _transcribe(self, audio_path, language, initial_prompt, beam_size, vad, options, emit):
+        samples = load_wav(audio_path)
+        audio_seconds = len(samples) / SAMPLE_RATE
+        with timer('asr.vad'):
+            speech = detect_speech(samples)
+        speech_seconds = sum(end - start for start, end in speech)
+        self.log(f"语音段 {len(speech)} 个，共 {speech_seconds:.0f}s / {audio_seconds:.0f}s，"
+                 f"{len(self.backends)} 个模型并行识别")
+        count('asr.chunks', len(speech))
+
+        temp_dir = tempfile.mkdtemp(prefix='asr_chunks_')
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.backends)) as executor:
+                futures = []
+                for index, (start, end) in enumerate(speech):
+                    path = os.path.join(temp_dir, f"{index:05d}.wav")
+                    write_wav(path, samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)])
+                    futures.append(executor.submit(self._transcribe_chunk, path, start, language,
+                                                   initial_prompt, beam_size, vad, options))
+                # 按语音段顺序取结果，前面的段识别完即回调，不必等全部完成
+                segments = []
+                for future in futures:
+                    for segment in future.result():
+                        segments.append(segment)
+                        emit(segment)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        return segments, audio_seconds
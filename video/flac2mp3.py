@@ -2,6 +2,8 @@ import os
 import subprocess
 import ffmpeg
 
+from metrics import timer
+
 
 def convert_audio_to_mp3(input_path, output_path, bitrate="320k"):
     """
@@ -11,6 +13,9 @@ def convert_audio_to_mp3(input_path, output_path, bitrate="320k"):
         input_path (str): 输入音频文件路径（flac/ogg）
         output_path (str): 输出 mp3 文件路径
         bitrate (str): mp3 比特率，默认 320k（高质量）
+
+    Returns:
+        bool: 转换成功返回True，失败返回False
     """
     try:
         # 检查输入文件是否存在
@@ -23,17 +28,20 @@ def convert_audio_to_mp3(input_path, output_path, bitrate="320k"):
             os.makedirs(output_dir)
 
         # 使用 ffmpeg 转换格式
-        (
-            ffmpeg
-            .input(input_path)
-            .output(output_path, audio_bitrate=bitrate)
-            .overwrite_output()  # 覆盖已存在的输出文件
-            .run(quiet=True)  # 静默运行，不输出冗余日志
-        )
+        with timer('audio.convert'):
+            (
+                ffmpeg
+                .input(input_path)
+                .output(output_path, audio_bitrate=bitrate)
+                .overwrite_output()  # 覆盖已存在的输出文件
+                .run(quiet=True)  # 静默运行，不输出冗余日志
+            )
         print(f"✅ 转换成功：{input_path} -> {output_path}")
+        return True
 
     except Exception as e:
         print(f"❌ 转换失败：{input_path}，错误：{str(e)}")
+        return False
 
 
 def batch_convert_folder(input_folder, output_folder, bitrate="320k"):
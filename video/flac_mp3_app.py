@@ -1,10 +1,13 @@
+import logging
 import os
-import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
 import ffmpeg
 
+from ui.job_dispatcher import get_dispatcher
+from ui.log_panel import LogPanel
+
 
 class AudioConverterGUI:
     def __init__(self, root):
@@ -22,6 +25,10 @@ class AudioConverterGUI:
         # 创建界面组件
         self.create_widgets()
 
+        # 日志统一交给主窗口的调度器刷新
+        self.dispatcher = get_dispatcher(root)
+        self.channel = self.dispatcher.register(root, on_log=self.log_panel.append)
+
     def create_widgets(self):
         # ========== 输入选择区域 ==========
         frame_input = ttk.LabelFrame(self.root, text="输入选择", padding=(10, 5))
@@ -61,18 +68,13 @@ class AudioConverterGUI:
         frame_log = ttk.LabelFrame(self.root, text="转换日志", padding=(10, 5))
         frame_log.pack(fill="both", expand=True, padx=20, pady=10)
 
-        # 滚动条
-        scrollbar = ttk.Scrollbar(frame_log)
-        scrollbar.pack(side="right", fill="y")
-
-        # 日志文本框
-        self.log_text = tk.Text(frame_log, wrap="word", yscrollcommand=scrollbar.set, height=15)
-        self.log_text.pack(fill="both", expand=True)
-        scrollbar.config(command=self.log_text.yview)
-
         # 清空日志按钮
         ttk.Button(frame_log, text="清空日志", command=self.clear_log).pack(side="bottom", pady=5)
 
+        # 日志控件
+        self.log_panel = LogPanel(frame_log, height=15, spool_name="audio_convert")
+        self.log_panel.pack(fill="both", expand=True)
+
     def select_input_file(self):
         """选择单个输入文件"""
         file_path = filedialog.askopenfilename(
@@ -95,15 +97,13 @@ class AudioConverterGUI:
         if dir_path:
             self.output_path.set(dir_path)
 
-    def log(self, message):
-        """添加日志信息"""
-        self.log_text.insert("end", f"{message}\n")
-        self.log_text.see("end")  # 自动滚动到最后
-        self.root.update_idletasks()  # 刷新界面
+    def log(self, message, level=logging.INFO):
+        """添加日志信息（线程安全）"""
+        self.dispatcher.log(self.channel, message, level)
 
     def clear_log(self):
         """清空日志"""
-        self.log_text.delete(1.0, "end")
+        self.log_panel.clear()
 
     def start_conversion(self):
         """开始转换（放到子线程执行，避免界面卡死）"""
@@ -135,12 +135,7 @@ class AudioConverterGUI:
         self.log("-" * 50)
 
         # 子线程执行转换
-        conversion_thread = threading.Thread(
-            target=self.run_conversion,
-            args=(input_target, output_folder, self.bitrate.get()),
-            daemon=True
-        )
-        conversion_thread.start()
+        self.dispatcher.submit(self.run_conversion, input_target, output_folder, self.bitrate.get())
 
     def stop_conversion(self):
         """停止转换"""
@@ -162,19 +157,19 @@ class AudioConverterGUI:
                 self.log("-" * 50)
                 self.log("===== 转换完成 =====")
         except Exception as e:
-            self.log(f"转换出错：{str(e)}")
+            self.log(f"转换出错：{str(e)}", logging.ERROR)
         finally:
             # 恢复按钮状态
             self.is_converting = False
-            self.root.after(0, lambda: self.convert_btn.config(state="normal"))
-            self.root.after(0, lambda: self.stop_btn.config(state="disabled"))
+            self.dispatcher.call(lambda: self.convert_btn.config(state="normal"))
+            self.dispatcher.call(lambda: self.stop_btn.config(state="disabled"))
 
     def convert_single_file(self, input_path, output_folder, bitrate):
         """转换单个文件"""
         try:
             # 检查文件格式
             if not input_path.lower().endswith((".flac", ".ogg")):
-                self.log(f"❌ 不支持的格式：{input_path}")
+                self.log(f"❌ 不支持的格式：{input_path}", logging.WARNING)
                 return
 
             # 构建输出路径
@@ -191,7 +186,7 @@ class AudioConverterGUI:
             )
             self.log(f"✅ 转换成功：{file_name}")
         except Exception as e:
-            self.log(f"❌ 转换失败：{os.path.basename(input_path)} - {str(e)}")
+            self.log(f"❌ 转换失败：{os.path.basename(input_path)} - {str(e)}", logging.ERROR)
 
     def batch_convert_folder(self, input_folder, output_folder, bitrate):
         """批量转换目录"""
@@ -229,10 +224,10 @@ class AudioConverterGUI:
                             .overwrite_output()
                             .run(quiet=True)
                         )
-                        self.log(f"✅ [{file_count}] {file}")
+                        self.log(f"✅ [{file_count}] {file}", logging.DEBUG)
                         success_count += 1
                     except Exception as e:
-                        self.log(f"❌ [{file_count}] {file} - {str(e)}")
+                        self.log(f"❌ [{file_count}] {file} - {str(e)}", logging.ERROR)
 
         # 输出统计信息
         self.log("-" * 50)
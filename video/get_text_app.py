@@ -1,19 +1,17 @@
+import logging
 import os
 import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-import threading
-import warnings
-
-# 第三方库导入
-from moviepy.video.io.VideoFileClip import VideoFileClip
-import speech_recognition as sr
-import whisper
-import cv2
-import easyocr
+
 import time
 
+from config import easyocr_model_path, whisper_model_path
+from ui.job_dispatcher import get_dispatcher
+from ui.log_panel import LogPanel
+from video.video_text import VideoTextExtractor, merge_transcript
+
 
 class VideoToTextApp:
     def __init__(self, root):
@@ -22,16 +20,23 @@ class VideoToTextApp:
         self.root.geometry("800x600")
         self.root.resizable(True, True)
 
-        # 初始化变量
-        self.model = None
+        # 初始化变量：语音识别、画面识别各在一个工作进程中加载模型（加载完成后才赋给 extractor）
+        self.extractor = None
+        self._loading_extractor = None
+        self.closed = False
         self.selected_file = None
         self.processing = False
 
         # 创建UI组件
         self._create_widgets()
 
-        # 预加载whisper模型（后台线程）
+        # 日志统一交给主窗口的调度器刷新
+        self.dispatcher = get_dispatcher(root)
+        self.channel = self.dispatcher.register(root, on_log=self.log_panel.append)
+
+        # 预加载whisper、EasyOCR模型（后台线程）
         self._load_model_in_background()
+        root.bind("<Destroy>", self._on_destroy, add="+")
 
     def _create_widgets(self):
         # 1. 顶部选择文件区域
@@ -69,14 +74,9 @@ class VideoToTextApp:
         frame_log = ttk.LabelFrame(self.root, text="处理日志")
         frame_log.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        # 滚动条
-        scrollbar = ttk.Scrollbar(frame_log)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        # 文本框
-        self.log_text = tk.Text(frame_log, yscrollcommand=scrollbar.set, wrap=tk.WORD)
-        self.log_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        scrollbar.config(command=self.log_text.yview)
+        # 日志控件
+        self.log_panel = LogPanel(frame_log, spool_name="video_text")
+        self.log_panel.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         # 布局权重设置
         frame_select.columnconfigure(1, weight=1)
@@ -92,27 +92,46 @@ class VideoToTextApp:
         if file_path:
             self.selected_file = file_path
             self.file_var.set(file_path)
-            if self.model and not self.processing:
+            if self.extractor and not self.processing:
                 self.process_btn.config(state=tk.NORMAL)
             self._log(f"已选择文件: {file_path}")
 
     def _load_model_in_background(self):
-        """后台加载whisper模型"""
+        """后台启动识别进程并加载模型"""
 
         def load_model():
+            extractor = VideoTextExtractor(whisper_model_path, easyocr_model_path, log=self._log)
+            # 加载过程中关闭窗口时由 _on_destroy 终止
+            self._loading_extractor = extractor
             try:
-                self.model = self._load_whisper_with_mps("/Users/tyrtao/AI/文字识别/语音识别/whisper/medium.pt")
-                self.model_status_var.set("模型加载完成（CPU模式）")
-                self._log("Whisper模型加载完成")
+                backend = extractor.start()
+                if self.closed:
+                    extractor.close(wait=False)
+                    return
+                self.extractor = extractor
+                self.dispatcher.call(self.model_status_var.set, f"模型加载完成（{backend}）")
+                self._log("语音识别、画面识别模型加载完成")
                 if self.selected_file:
-                    self.process_btn.config(state=tk.NORMAL)
+                    self.dispatcher.call(lambda: self.process_btn.config(state=tk.NORMAL))
             except Exception as e:
-                self.model_status_var.set("模型加载失败")
-                self._log(f"模型加载出错: {str(e)}")
-                messagebox.showerror("错误", f"模型加载失败: {str(e)}")
+                extractor.close(wait=False)
+                if self.closed:
+                    return
+                self.dispatcher.call(self.model_status_var.set, "模型加载失败")
+                self._log(f"模型加载出错: {str(e)}", logging.ERROR)
+                self.dispatcher.call(messagebox.showerror, "错误", f"模型加载失败: {str(e)}")
 
         # 启动后台线程加载模型
-        threading.Thread(target=load_model, daemon=True).start()
+        self.dispatcher.submit(load_model)
+
+    def _on_destroy(self, event):
+        """窗口关闭时终止识别进程（含正在加载模型、正在进行的识别），释放模型占用的内存"""
+        if event.widget is not self.root:
+            return
+        self.closed = True
+        for extractor in {self.extractor, self._loading_extractor} - {None}:
+            extractor.close(wait=False)
+        self.extractor = self._loading_extractor = None
 
     def _start_processing(self):
         """开始处理视频（后台线程）"""
@@ -126,141 +145,38 @@ class VideoToTextApp:
         # 后台线程处理，避免界面卡死
         def process():
             try:
-                # 1. 音频转文字
-                self._log("提取音频并转换为文字...")
-                audio_text = self._mp4_to_text(self.selected_file, self.model)
-                self._log(f"音频识别结果: {audio_text[:50]}...")
-
-                # 2. 视频画面文字识别
-                self._log("识别视频画面中的文字...")
-                video_texts = self._video_text_recognition(self.selected_file)
-                self._log(f"画面识别到 {len(video_texts)} 条文字")
+                # 1. 语音与画面文字同时识别
+                self._log("同时识别语音与画面文字...")
+                speech, frame_texts = self.extractor.extract(self.selected_file)
 
-                # 3. 保存结果
+                # 2. 按时间合并后保存
                 save_path = os.path.join(
                     Path(self.selected_file).parent,
                     Path(self.selected_file).stem + "_识别结果.txt"
                 )
-                self._save_text_to_file(save_path, audio_text + "\n\n=== 画面识别文字 ===\n" + "\n".join(video_texts))
+                self._save_text_to_file(save_path, merge_transcript(speech, frame_texts))
                 self._log(f"结果已保存至: {save_path}")
                 self._log(f"处理完成！\n结果已保存至:\n{save_path}")
 
                 # messagebox.showinfo("成功", f"处理完成！\n结果已保存至:\n{save_path}")
             except Exception as e:
-                self._log(f"处理出错: {str(e)}")
+                self._log(f"处理出错: {str(e)}", logging.ERROR)
                 # messagebox.showerror("错误", f"处理失败: {str(e)}")
             finally:
                 self.processing = False
-                self.process_btn.config(state=tk.NORMAL)
+                self.dispatcher.call(lambda: self.process_btn.config(state=tk.NORMAL))
 
-        threading.Thread(target=process, daemon=True).start()
+        self.dispatcher.submit(process)
 
-    def _log(self, msg):
-        """日志输出"""
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {msg}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+    def _log(self, msg, level=logging.INFO):
+        """日志输出（线程安全）"""
+        self.dispatcher.log(self.channel, f"[{time.strftime('%H:%M:%S')}] {msg}", level)
 
     def _clear_log(self):
         """清空日志"""
-        self.log_text.delete(1.0, tk.END)
+        self.log_panel.clear()
         self._log("日志已清空")
 
-    # 核心功能函数（复用原有逻辑）
-    def _load_whisper_with_mps(self, model_path_or_size="base"):
-        """加载whisper模型（兼容CPU）"""
-
-        # 过滤FP16警告
-        def filter_fp16_warning(message, category, filename, lineno, file=None, line=None):
-            if "FP16 is not supported on CPU; using FP32 instead" in str(message):
-                return
-            warnings.showwarning(message, category, filename, lineno, file, line)
-
-        warnings.showwarning = filter_fp16_warning
-
-        self._log("未检测到MPS支持，使用CPU运行")
-        device = "cpu"
-        model = whisper.load_model(model_path_or_size, device=device)
-        return model
-
-    def _mp4_to_text(self, mp4_path, model):
-        """音频转文字"""
-        if not os.path.exists(mp4_path) or not mp4_path.lower().endswith('.mp4'):
-            raise ValueError("请提供有效的MP4文件路径")
-
-        with VideoFileClip(mp4_path) as video:
-            audio = video.audio
-            temp_audio_path = os.path.join(Path(mp4_path).parent, Path(mp4_path).stem + ".wav")
-            audio.write_audiofile(temp_audio_path, logger=None)
-
-        result = model.transcribe(
-            temp_audio_path,
-            language="zh",
-            fp16=False,
-            initial_prompt="以下是简体中文的语音内容，识别结果请使用简体中文输出，避免使用繁体字。",
-            verbose=False
-        )
-        text = result["text"]
-
-        # 清理临时文件
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-
-        return text
-
-    def _video_text_recognition(self, video_path, lang=['ch_sim', 'en']):
-        """视频画面文字识别"""
-        results = []
-
-        reader = easyocr.Reader(lang
-                                , model_storage_directory='/Users/tyrtao/AI/文字识别/easyOCR'  # 你的模型存放目录
-                                , download_enabled=False  # 禁用自动下载,
-                                , gpu=False
-                                )  # 若有GPU可设为True
-
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"无法打开视频：{video_path}")
-
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps
-        self._log(f"视频信息：时长{duration:.1f}秒，帧率{fps:.1f}")
-
-        sample_interval = max(1, int(fps * 1.5))
-        max_size = 640
-        seen_texts = set()
-        frame_count = 0
-
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_count % sample_interval == 0:
-                h, w = frame.shape[:2]
-                if max(h, w) > max_size:
-                    scale = max_size / max(h, w)
-                    frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
-
-                frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                try:
-                    ocr_result = reader.readtext(frame_gray, detail=1)
-                    for _, text, score in ocr_result:
-                        if score > 0.6 and text.strip():
-                            text_clean = text.strip().lower()
-                            if text_clean not in seen_texts:
-                                seen_texts.add(text_clean)
-                                results.append(text.strip())
-                                self._log(f"画面识别到：{text.strip()}")
-                except Exception as e:
-                    self._log(f"模型加载出错: {str(e)}")
-            frame_count += 1
-
-        cap.release()
-        cv2.destroyAllWindows()
-        return results
-
     def _save_text_to_file(self, file_path, text):
         """保存文字到文件"""
         if not text or len(text) <= 20:
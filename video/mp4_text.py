@@ -2,57 +2,77 @@ import os
 import sys
 from pathlib import Path
 
-from config import video_target_path, wav_text_path
+from config import video_target_path, wav_text_path, easyocr_model_path, whisper_model_path, ocr_cascade
 from file.file_utils import get_non_hidden_files_video
+from img.ocr_cascade import cascade_readtext
+from img.ocr_runtime import create_reader
+from metrics import timer, count
+from video.asr_backends import load_asr_backend
 
 from moviepy.video.io.VideoFileClip import VideoFileClip  # 直接导入视频处理类
 import speech_recognition as sr
 
-import whisper
-import warnings
-
 import cv2
-import easyocr
 import time
 from datetime import timedelta
 
 
-def mp4_to_text(mp4_path, model):
+def transcribe_mp4(mp4_path, model):
     """
-    将MP4视频文件转换为文本（修复moviepy导入问题）
+    提取MP4视频中的音频并转换为文本，出错时抛出异常
+    """
+    return transcribe_mp4_result(mp4_path, model).text
+
+
+def transcribe_mp4_result(mp4_path, model, on_segment=None):
+    """
+    同 transcribe_mp4，返回带分段时间戳的 AsrResult；on_segment(分段) 在识别出每一段时调用（用于边识别边写字幕）
     """
     # 检查文件是否存在
     if not os.path.exists(mp4_path) or not mp4_path.lower().endswith('.mp4'):
         raise ValueError("请提供有效的MP4文件路径")
 
-    try:
-        # 1. 提取音频（使用直接导入的VideoFileClip）
-        _mp4_path = Path(mp4_path)
-        with VideoFileClip(mp4_path) as video:  # 使用with语句确保资源正确释放
-            audio = video.audio
+    # 1. 提取音频（使用直接导入的VideoFileClip）
+    _mp4_path = Path(mp4_path)
+    with VideoFileClip(mp4_path) as video:  # 使用with语句确保资源正确释放
+        audio = video.audio
 
-            # 保存为临时WAV文件
-            temp_audio_path = os.path.join(_mp4_path.parent, _mp4_path.stem + ".wav")
-            audio.write_audiofile(temp_audio_path, logger=None)
+        # 保存为临时WAV文件
+        temp_audio_path = os.path.join(_mp4_path.parent, _mp4_path.stem + ".wav")
+        with timer('asr.extract_audio'):
+            audio.write_audiofile(temp_audio_path, logger=None, codec="pcm_s16le",
+                                  fps=16000)  # whisper仅需16k采样率，分段识别时也不必重采样
 
-        # 2. 音频转文本
-        print("正在将音频转换为文本...", temp_audio_path)
+    # 2. 音频转文本
+    print("正在将音频转换为文本...", temp_audio_path)
 
+    try:
+        # 识别后端见 video/asr_backends.py（config.asr_backend）
         result = model.transcribe(
-            temp_audio_path
-            , language="zh"
-            , fp16=False,  # 避免MPS/CPU的FP16兼容问题
+            temp_audio_path,
+            language="zh",
             initial_prompt="以下是简体中文的语音内容，识别结果请使用简体中文输出，避免使用繁体字。",  # 提示模型优先简体
-            verbose=False  # 关闭转录过程中的冗余日志（如"Detected language: zh"）
-        )  # 指定中文
-        text = result["text"]
-
+            on_segment=on_segment,
+        )
+        print(result.summary())
+    finally:
         # 清理临时文件
         if os.path.exists(temp_audio_path):
             os.remove(temp_audio_path)
 
-        return text
+    return result
+
+
+def mp4_to_text(mp4_path, model):
+    """
+    将MP4视频文件转换为文本（修复moviepy导入问题），出错时返回错误信息
+    """
+    # 检查文件是否存在
+    if not os.path.exists(mp4_path) or not mp4_path.lower().endswith('.mp4'):
+        raise ValueError("请提供有效的MP4文件路径")
 
+    try:
+        return transcribe_mp4(mp4_path, model)
     except sr.UnknownValueError:
         return "无法识别音频内容"
     except sr.RequestError as e:
@@ -61,51 +81,12 @@ def mp4_to_text(mp4_path, model):
         return f"处理过程出错: {str(e)}"
 
 
-def load_whisper_with_mps(model_path_or_size="base"):
+def load_whisper_with_mps(model_path_or_size="base", backend=None, chunk_workers=None):
     """
-    兼容所有Python版本：解决MPS稀疏张量错误 + 消除FP16警告
+    加载语音识别后端（config.asr_backend，可用 backend 指定 whisper / faster_whisper），返回 AsrBackend；
+    chunk_workers 大于0时为分段并行识别（默认 config.asr_chunk_workers）
     """
-
-    # ------------------- 修复1：兼容Python版本的警告过滤 -------------------
-    # 直接根据警告字符串内容过滤，不依赖WarningMessage的message属性
-    def filter_fp16_warning(message, category, filename, lineno, file=None, line=None):
-        # 仅过滤"FP16 is not supported on CPU; using FP32 instead"警告
-        if "FP16 is not supported on CPU; using FP32 instead" in str(message):
-            return  # 忽略该警告
-        # 其他警告正常显示
-        warnings.showwarning(message, category, filename, lineno, file, line)
-
-    # 替换默认的警告显示函数
-    warnings.showwarning = filter_fp16_warning
-
-    # ------------------- 修复2：MPS稀疏张量问题 -------------------
-    # 检测MPS可用性
-    # if not torch.backends.mps.is_available():
-    print("未检测到MPS支持，使用CPU运行")
-    device = "cpu"
-    model = whisper.load_model(model_path_or_size, device=device)
-    return model
-
-    # print("检测到MPS支持，禁用稀疏张量以适配GPU")
-    # device = "mps"
-    #
-    # # 1. 先在CPU加载模型（避免MPS直接加载稀疏张量报错）
-    # model = whisper.load_model(model_path_or_size, device="cpu")
-    #
-    # # 2. 稀疏张量转密集张量（绕过MPS不支持的操作）
-    # for name, module in model.named_modules():
-    #     # 处理模型权重
-    #     if hasattr(module, "weight") and isinstance(module.weight, torch.Tensor):
-    #         if module.weight.is_sparse:
-    #             module.weight = torch.nn.Parameter(module.weight.to_dense())
-    #     # 处理模型缓冲（如语言模型的偏置项）
-    #     for buf_name, buf in module.named_buffers():
-    #         if isinstance(buf, torch.Tensor) and buf.is_sparse:
-    #             setattr(module, buf_name, buf.to_dense())
-    #
-    # # 3. 迁移模型到MPS设备
-    # model = model.to(device)
-    # return model
+    return load_asr_backend(model_path_or_size, name=backend, log=print, chunk_workers=chunk_workers)
 
 
 def save_text_to_file(file_path, text):
@@ -118,20 +99,27 @@ def save_text_to_file(file_path, text):
     print(f"文本已保存至: {file_path}")
 
 
-def video_text_recognition(video_path, lang=['ch_sim', 'en']):
+def video_text_recognition(video_path, lang=['ch_sim', 'en'], reader=None):
     """
     使用EasyOCR识别视频中的文字
     :param video_path: 视频文件路径
     :param lang: 识别语言（中文简体+英文）
+    :param reader: 已初始化的EasyOCR阅读器，批量处理时复用，为空则新建
+    """
+    return [text for _, text in video_text_timeline(video_path, lang, reader)]
+
+
+def video_text_timeline(video_path, lang=['ch_sim', 'en'], reader=None, on_text=None):
+    """
+    同 video_text_recognition，返回 [(首次出现的秒数, 文字), ...]
+    :param on_text: 每个采样帧中每条有效文字（不去重）都会调用 on_text(dict)，
+                    包含 time、frame、text、score、box（原视频分辨率的四个顶点），用于边识别边写JSONL
     """
     results = []
     # 1. 初始化EasyOCR阅读器（首次运行会下载模型，约1GB）
     # 若需离线使用，提前下载模型：https://github.com/JaidedAI/EasyOCR/blob/master/README.md#model-download
-    reader = easyocr.Reader(lang
-                            , model_storage_directory='/Users/tyrtao/AI/文字识别/easyOCR'  # 你的模型存放目录
-                            , download_enabled=False  # 禁用自动下载,
-                            , gpu=False
-                            )  # 若有GPU可设为True
+    if reader is None:
+        reader = create_reader(lang, easyocr_model_path)
 
     # 2. 打开视频
     cap = cv2.VideoCapture(video_path)
@@ -163,6 +151,7 @@ def video_text_recognition(video_path, lang=['ch_sim', 'en']):
             if frame_count % sample_interval == 0:
                 # 优化1：压缩图像（降低分辨率）
                 h, w = frame.shape[:2]
+                scale = 1.0
                 if max(h, w) > max_size:
                     scale = max_size / max(h, w)
                     frame = cv2.resize(frame, (int(w * scale), int(h * scale)))
@@ -170,16 +159,25 @@ def video_text_recognition(video_path, lang=['ch_sim', 'en']):
                 # 优化2：转为灰度图（减少计算量，不影响OCR精度）
                 frame_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
-                # 执行识别（仅返回文字和置信度）
-                ocr_result = reader.readtext(frame_gray, detail=1)
+                # 执行识别（仅返回文字和置信度）；两级识别时只识别候选文字区域
+                if ocr_cascade['video']:
+                    ocr_result = cascade_readtext(reader, frame_gray)
+                else:
+                    with timer('ocr.readtext'):
+                        ocr_result = reader.readtext(frame_gray, detail=1)
+                count('video.frames_sampled')
 
                 # 提取有效文字（过滤低置信度）
-                for _, text, score in ocr_result:
+                for bbox, text, score in ocr_result:
                     if score > 0.6 and text.strip():  # 提高置信度阈值，减少无效计算
+                        if on_text is not None:
+                            on_text({'time': round(frame_count / fps, 3), 'frame': frame_count, 'text': text.strip(),
+                                     'score': round(float(score), 4),
+                                     'box': [[round(float(x) / scale, 1), round(float(y) / scale, 1)] for x, y in bbox]})
                         text_clean = text.strip().lower()
                         if text_clean not in seen_texts:
                             seen_texts.add(text_clean)
-                            results.append(text.strip())
+                            results.append((frame_count / fps, text.strip()))
                             print(f"识别到：{text.strip()}")
         except Exception as e:
             print(e)
@@ -239,7 +237,8 @@ if __name__ == "__main__":
         print(target_path + '不是目录')
         sys.exit(0)
 
-    model = load_whisper_with_mps("/Users/tyrtao/AI/文字识别/语音识别/whisper/medium.pt")
+    # 语音识别与画面文字识别在两个进程中同时进行，结果按时间合并
+    from video.video_text import VideoTextExtractor, merge_transcript
 
     try:
         file_cache = get_non_hidden_files_video(target_path)
@@ -247,20 +246,20 @@ if __name__ == "__main__":
             print('=======未发现任何文件=======')
             sys.exit(0)
 
-        for file_path in file_cache:
-            try:
-                print('正在处理视频文件:', file_path)
-                path = Path(file_path)
-
-                text = mp4_to_text(file_path, model)
-                print('语音识别结果:', text)
+        with VideoTextExtractor(whisper_model_path) as extractor:
+            print('语音识别后端:', extractor.start())
+            for file_path in file_cache:
+                try:
+                    print('正在处理视频文件:', file_path)
+                    path = Path(file_path)
 
-                results = video_text_recognition(file_path)
-                print('视频识别结果:', text)
+                    speech, frame_texts = extractor.extract(file_path)
+                    text = merge_transcript(speech, frame_texts)
+                    print('识别结果:', text)
 
-                save_text_to_file(os.path.join(path.parent, path.stem + '.txt'), text + '\r\n' + '\r\n'.join(results))
+                    save_text_to_file(os.path.join(path.parent, path.stem + '.txt'), text)
 
-            except Exception as e:
-                print(f"处理图片时出错: {str(e)}")
+                except Exception as e:
+                    print(f"处理视频时出错: {str(e)}")
     except ValueError as e:
         print(e)
@@ -0,0 +1,104 @@
+"""
+带时间的识别结果输出：语音字幕（SRT / VTT）与画面文字（JSONL，每行一条：时间、帧号、文字、置信度、文字框）
+
+识别过程中每得到一段就写入并刷新文件，长视频处理到一半时已有的部分即可使用（也可据此定位某句话出现的位置）；
+识别失败且还没写入任何内容时删除文件，不留下只有文件头的空字幕。
+各格式的文件与文字稿放在一起：<视频名>.srt、<视频名>.vtt、<视频名>_画面.jsonl
+"""
+import json
+import os
+
+# 语音字幕格式；画面文字只输出 JSONL
+SUBTITLE_FORMATS = ('srt', 'vtt')
+FRAME_TEXT_FORMAT = 'jsonl'
+TIMED_FORMATS = SUBTITLE_FORMATS + (FRAME_TEXT_FORMAT,)
+
+
+def format_subtitle_time(seconds, separator=','):
+    """秒数转为 时:分:秒,毫秒（SRT 用逗号，VTT 用句点）"""
+    milliseconds = int(round(max(0.0, seconds) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{milliseconds:03d}"
+
+
+def timed_output_path(base_path, fmt):
+    """base_path 为不带扩展名的路径"""
+    if fmt == FRAME_TEXT_FORMAT:
+        return f"{base_path}_画面.jsonl"
+    return f"{base_path}.{fmt}"
+
+
+def parse_timed_formats(value):
+    """逗号分隔的格式列表（命令行参数），未知格式时抛出 ValueError"""
+    formats = [fmt.strip().lower() for fmt in value.split(',') if fmt.strip()] if value else []
+    unknown = [fmt for fmt in formats if fmt not in TIMED_FORMATS]
+    if unknown:
+        raise ValueError(f"未知的输出格式: {', '.join(unknown)}（可选：{', '.join(TIMED_FORMATS)}）")
+    return formats
+
+
+class SubtitleWriter:
+    """逐段写入SRT/VTT字幕（格式按扩展名），每段写完即刷新"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fmt = path.rsplit('.', 1)[-1].lower()
+        if self.fmt not in SUBTITLE_FORMATS:
+            raise ValueError(f"不支持的字幕格式: {path}")
+        self.index = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        if self.fmt == 'vtt':
+            self._file.write("WEBVTT\n\n")
+            self._file.flush()
+
+    def write(self, segment):
+        """segment 为 AsrSegment（start、end、text）"""
+        text = segment.text.strip()
+        if not text:
+            return
+        self.index += 1
+        separator = ',' if self.fmt == 'srt' else '.'
+        timing = (f"{format_subtitle_time(segment.start, separator)} --> "
+                  f"{format_subtitle_time(max(segment.end, segment.start), separator)}")
+        header = f"{self.index}\n" if self.fmt == 'srt' else ''
+        self._file.write(f"{header}{timing}\n{text}\n\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and self.index == 0:
+            os.remove(self.path)
+
+
+class FrameTextWriter:
+    """逐条写入画面文字JSONL，每条写完即刷新"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, item):
+        """item: {'time': 秒, 'frame': 帧号, 'text': 文字, 'score': 置信度, 'box': [[x, y], ...]}（原视频分辨率坐标）"""
+        self.count += 1
+        self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and self.count == 0:
+            os.remove(self.path)
@@ -0,0 +1,164 @@
+"""
+视频文字提取：语音识别与画面文字识别在两个独立进程中同时进行，结果按时间合并
+
+两者互不依赖：Whisper 主要占用矩阵计算，画面识别还要解码视频、做 EasyOCR 检测。原来先跑完语音再识别画面，
+现在各自在常驻的工作进程中加载一次模型（spawn 启动，不继承界面线程），CPU 线程按 config.video_text_threads 分配，
+避免两边都按全部核数开线程互相争抢。
+
+结果为按时间排序的文字稿：
+    [0:00:05] 语音：……
+    [0:00:06] 画面：……
+同时按 config.video_text_outputs 在视频旁边边识别边写出语音字幕（SRT/VTT）与画面文字（JSONL），见 video/subtitles.py
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import timedelta
+
+from config import whisper_model_path, easyocr_model_path, video_text_threads, video_text_outputs
+from file.file_utils import print_log
+from model_runtime import configure_threads
+from video.subtitles import SUBTITLE_FORMATS, FRAME_TEXT_FORMAT, SubtitleWriter, FrameTextWriter, timed_output_path
+
+# 工作进程中已加载的模型，每个进程只加载一次
+_MODELS = {}
+
+# 自动分配线程时语音识别所占的比例（解码计算量更大）
+ASR_THREAD_SHARE = 2 / 3
+
+
+def split_thread_budget(asr_threads=None, ocr_threads=None):
+    """返回 (语音识别线程数, 画面识别线程数)；为0或None时按CPU核数自动分配"""
+    asr_threads = video_text_threads['asr'] if asr_threads is None else asr_threads
+    ocr_threads = video_text_threads['ocr'] if ocr_threads is None else ocr_threads
+    cores = os.cpu_count() or 2
+    if not asr_threads:
+        asr_threads = max(1, round(cores * ASR_THREAD_SHARE) if not ocr_threads else cores - ocr_threads)
+    if not ocr_threads:
+        ocr_threads = max(1, cores - asr_threads)
+    return asr_threads, ocr_threads
+
+
+def _init_asr(model_path, backend, chunk_workers, threads):
+    configure_threads(threads)
+    from video.asr_backends import load_asr_backend
+    # faster_whisper 的 cpu_threads 按这里设置的线程预算（分段识别时各实例平分）
+    _MODELS['asr'] = load_asr_backend(model_path, name=backend, chunk_workers=chunk_workers)
+
+
+def _init_ocr(model_dir, runtime, threads):
+    configure_threads(threads)
+    from img.ocr_runtime import create_reader
+    _MODELS['reader'] = create_reader(model_dir=model_dir, runtime=runtime, threads=threads)
+
+
+def _asr_ready():
+    model = _MODELS['asr']
+    return f"{model.name}，{model.device.upper()}"
+
+
+def _ocr_ready():
+    return True
+
+
+def _run_asr(video_path, formats):
+    from video.mp4_text import transcribe_mp4_result
+    base_path = os.path.splitext(video_path)[0]
+    with ExitStack() as stack:
+        writers = [stack.enter_context(SubtitleWriter(timed_output_path(base_path, fmt)))
+                   for fmt in formats if fmt in SUBTITLE_FORMATS]
+
+        def on_segment(segment):
+            for writer in writers:
+                writer.write(segment)
+
+        result = transcribe_mp4_result(video_path, _MODELS['asr'], on_segment=on_segment if writers else None)
+    return [(segment.start, segment.text.strip()) for segment in result.segments], result.summary()
+
+
+def _run_ocr(video_path, formats):
+    from video.mp4_text import video_text_timeline
+    if FRAME_TEXT_FORMAT not in formats:
+        return video_text_timeline(video_path, reader=_MODELS['reader'])
+    with FrameTextWriter(timed_output_path(os.path.splitext(video_path)[0], FRAME_TEXT_FORMAT)) as writer:
+        return video_text_timeline(video_path, reader=_MODELS['reader'], on_text=writer.write)
+
+
+def format_timestamp(seconds):
+    return str(timedelta(seconds=int(seconds)))
+
+
+def merge_transcript(speech, frame_texts):
+    """语音分段与画面文字（均为 [(秒数, 文字), ...]）按时间合并为文字稿，同一时刻语音在前"""
+    lines = [(start, 0, '语音', text) for start, text in speech if text]
+    lines += [(start, 1, '画面', text) for start, text in frame_texts if text]
+    lines.sort(key=lambda line: line[:2])
+    return "\n".join(f"[{format_timestamp(start)}] {source}：{text}" for start, _, source, text in lines)
+
+
+class VideoTextExtractor:
+    """
+    常驻的语音识别、画面识别工作进程各一个，extract() 同时识别同一个视频
+
+    用法：
+        with VideoTextExtractor() as extractor:
+            speech, frame_texts = extractor.extract(video_path)
+    """
+
+    def __init__(self, asr_model=whisper_model_path, ocr_model_dir=easyocr_model_path, asr_backend=None,
+                 chunk_workers=None, ocr_runtime=None, asr_threads=None, ocr_threads=None, log=print_log):
+        self.log = log
+        self.asr_threads, self.ocr_threads = split_thread_budget(asr_threads, ocr_threads)
+        context = multiprocessing.get_context('spawn')
+        self._asr = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_asr,
+                                        initargs=(asr_model, asr_backend, chunk_workers, self.asr_threads))
+        self._ocr = ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_ocr,
+                                        initargs=(ocr_model_dir, ocr_runtime, self.ocr_threads))
+
+    def start(self):
+        """启动工作进程并等待模型加载完成（加载失败时抛出异常），返回语音识别后端的描述"""
+        self.log(f"加载模型：语音识别 {self.asr_threads} 线程，画面识别 {self.ocr_threads} 线程")
+        asr_future, ocr_future = self._asr.submit(_asr_ready), self._ocr.submit(_ocr_ready)
+        ocr_future.result()
+        return asr_future.result()
+
+    def extract(self, video_path, formats=None):
+        """
+        同时识别语音与画面文字，返回 (语音分段 [(秒数, 文字), ...], 画面文字 [(秒数, 文字), ...])
+
+        formats 为边识别边写出的带时间文件（srt / vtt / jsonl），None 时按 config.video_text_outputs
+        """
+        formats = video_text_outputs if formats is None else formats
+        futures = {self._asr.submit(_run_asr, video_path, formats): 'asr',
+                   self._ocr.submit(_run_ocr, video_path, formats): 'ocr'}
+        speech, frame_texts = [], []
+        for future in as_completed(futures):
+            if futures[future] == 'asr':
+                speech, summary = future.result()
+                self.log(f"语音识别完成：{len(speech)} 段，{summary}")
+            else:
+                frame_texts = future.result()
+                self.log(f"画面识别完成：{len(frame_texts)} 条文字")
+        if formats:
+            base_path = os.path.splitext(video_path)[0]
+            self.log("带时间的结果：" + "、".join(timed_output_path(base_path, fmt) for fmt in formats))
+        return speech, frame_texts
+
+    def close(self, wait=True):
+        """
+        结束工作进程；wait=False 时直接终止工作进程（界面关闭时使用）：
+        shutdown 不会中断进行中的任务，不终止的话进程会带着模型一直运行到当前视频识别完
+        """
+        for executor in (self._asr, self._ocr):
+            # shutdown 之后执行器不再保留进程列表，先取出
+            processes = [] if wait else list((executor._processes or {}).values())
+            executor.shutdown(wait=wait, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
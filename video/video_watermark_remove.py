@@ -9,23 +9,25 @@ from tqdm import tqdm
 
 from config import logo_path
 from file.file_utils import get_non_hidden_files_video
+from metrics import timer, timed, count
 from pathlib import Path
 
 
 class VideoProcessor:
-    def __init__(self, input_video, logo_path, watermark_size=(150, 150)):
+    def __init__(self, input_video, logo_path, watermark_size=(150, 150), output_path=None):
         """
         初始化视频处理器
         :param input_video: 输入视频路径
         :param logo_path: 要添加的logo路径
         :param watermark_size: 水印大小 (宽度, 高度)，默认150x150
+        :param output_path: 输出视频路径，默认在原文件名后添加"_logo"
         """
         self.input_path = input_video
         self.logo_path = logo_path
         self.watermark_size = watermark_size
 
-        # 自动生成输出文件名
-        self.output_path = self._generate_output_path(input_video)
+        # 未指定时自动生成输出文件名
+        self.output_path = output_path if output_path else self._generate_output_path(input_video)
 
         # 验证输入文件
         if not os.path.exists(input_video):
@@ -115,6 +117,7 @@ class VideoProcessor:
 
         return frame
 
+    @timed('video.frame_process')
     def remove_watermark_from_frame(self, frame):
         """去除右上角水印"""
         if frame is None:
@@ -141,6 +144,7 @@ class VideoProcessor:
         # 添加logo
         return self.add_logo_to_frame(repaired_frame)
 
+    @timed('video.extract_audio')
     def extract_audio_from_video(self):
         print("提取音频中...")
         try:
@@ -168,23 +172,28 @@ class VideoProcessor:
         processed_frames = 0
         with tqdm(total=self.total_frames, unit="帧") as pbar:
             while processed_frames < self.total_frames:
-                ret, frame = self.cap.read()
+                with timer('video.decode_frame'):
+                    ret, frame = self.cap.read()
                 if not ret:
                     break
 
                 try:
                     processed_frame = self.remove_watermark_from_frame(frame)
-                    out.write(processed_frame)
+                    with timer('video.encode_frame'):
+                        out.write(processed_frame)
                 except Exception as e:
                     raise RuntimeError(f"处理第{processed_frames}帧失败：{str(e)}")
 
                 processed_frames += 1
                 pbar.update(1)
 
+        count('video.frames', processed_frames)
+
         out.release()
         self.cap.release()
         print(f"处理完成{processed_frames}帧")
 
+    @timed('video.mux')
     def merge_video_and_audio(self):
         print(f"合并音视频中，输出文件：{self.output_path}")
         ffmpeg_cmd = (
@@ -204,6 +213,7 @@ class VideoProcessor:
                     print(f"警告：无法删除临时文件{temp_file}")
 
     def run(self):
+        """执行完整流程，成功返回True"""
         try:
             print(f"输入视频：{self.input_path}")
             print(f"输出视频：{self.output_path}")
@@ -211,8 +221,10 @@ class VideoProcessor:
             self.process_video_frames()
             self.merge_video_and_audio()
             print(f"处理完成！输出文件已保存至：{self.output_path}")
+            return True
         except Exception as e:
             print(f"处理失败：{str(e)}")
+            return False
         finally:
             self.clean_temp_files()
 